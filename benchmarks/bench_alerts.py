@@ -0,0 +1,58 @@
+"""
+check_alerts over the full history vs. the tail only evaluation, and repeated calls (memoized).
+    python benchmarks/bench_alerts.py --bars 500
+"""
+import argparse
+import os
+import sys
+import timeit
+from contextlib import redirect_stdout
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from models.stocks import Stock  # noqa: E402
+
+
+def synthetic_json(bars: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1.5, bars))
+    return {'t': (1_600_000_000 + 86_400 * np.arange(bars)).tolist(), 'o': close.tolist(),
+            'h': (close + rng.uniform(0, 1.5, bars)).tolist(), 'l': (close - rng.uniform(0, 1.5, bars)).tolist(),
+            'c': close.tolist(), 'v': rng.integers(1_000, 100_000, bars).tolist()}
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=500)
+    parser.add_argument("--recent", type=int, default=2, help="bars after the cutoff")
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+    data = synthetic_json(args.bars)
+    start_time = data['t'][-args.recent - 1]
+
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        stocks = [Stock("TEST.US", data, tail_alerts=True) for _ in range(2 * args.repeat + 1)]
+
+    def full():
+        stock = stocks.pop()
+        stock.add_alerts()
+
+    def tail():
+        stocks.pop().recent_alerts(start_time)
+
+    full_time = min(timeit.repeat(full, number=1, repeat=args.repeat))
+    tail_time = min(timeit.repeat(tail, number=1, repeat=args.repeat))
+    cached = stocks.pop()
+    cached.recent_alerts(start_time)
+    cached_time = min(timeit.repeat(lambda: cached.recent_alerts(start_time), number=1, repeat=args.repeat))
+
+    print(f"{args.bars} bars, {args.recent} after the cutoff")
+    print(f"full history add_alerts: {full_time * 1000:8.3f} ms")
+    print(f"tail only:               {tail_time * 1000:8.3f} ms ({full_time / tail_time:.1f}x)")
+    print(f"repeated call (memo):    {cached_time * 1000:8.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,34 @@
+"""
+Backtest of the default alert rules over many tickers, the panel engine in chunks and optionally in processes.
+    python benchmarks/bench_backtest.py --tickers 2000 --bars 1000 --workers 4
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from bench_panel import synthetic_frames  # noqa: E402
+from models.stocks.backtest import backtest, report  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--bars", type=int, default=1000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--chunk-size", type=int, default=250)
+    args = parser.parse_args()
+    frames = synthetic_frames(args.tickers, args.bars)
+
+    start = time.perf_counter()
+    trades = backtest(frames, max_workers=args.workers, chunk_size=args.chunk_size)
+    elapsed = time.perf_counter() - start
+    print(f"{args.tickers} tickers x {args.bars} bars: {len(trades)} trades in {elapsed:.2f}s "
+          f"({elapsed / args.tickers * 1000:.2f} ms per ticker)")
+    print(report(trades).round(3).to_string())
+
+
+if __name__ == "__main__":
+    main()
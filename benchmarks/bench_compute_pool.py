@@ -0,0 +1,44 @@
+"""
+Stock construction + check_alerts in one process vs. the shared memory process pool, for 1, 2, 4... workers.
+    python benchmarks/bench_compute_pool.py --tickers 1000 --bars 500
+The speedup is bounded by the cores of the box (os.cpu_count()).
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from bench_panel import synthetic_frames  # noqa: E402
+from models.stocks.compute_pool import check_one, check_stocks  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=1000)
+    parser.add_argument("--bars", type=int, default=500)
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count())
+    args = parser.parse_args()
+    frames = synthetic_frames(args.tickers, args.bars)
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        sequential = [name for name, df in frames.items() if check_one(name, df.copy())]
+    base = time.perf_counter() - start
+    print(f"{args.tickers} tickers x {args.bars} bars, {os.cpu_count()} cpus")
+    print(f"one process:  {base:8.3f} s")
+
+    workers = 1
+    while workers <= args.max_workers:
+        start = time.perf_counter()
+        results = check_stocks(frames, max_workers=workers)
+        elapsed = time.perf_counter() - start
+        assert [result['stock'] for result in results] == sequential
+        print(f"{workers:3d} workers: {elapsed:8.3f} s  speedup {base / elapsed:5.2f}x")
+        workers *= 2
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+StockDB ingest and query times: the full history of a watchlist, the daily run (a new bar per ticker, only the tail is
+written), the latest alert of every ticker and the history of one ticker.
+    python benchmarks/bench_database.py --tickers 200 --bars 500
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from bench_panel import synthetic_frames  # noqa: E402
+from models.storage import StockDB  # noqa: E402
+from models.stocks import Stock  # noqa: E402
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--bars", type=int, default=500)
+    args = parser.parse_args()
+    frames = synthetic_frames(args.tickers, args.bars + 1)
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        history = [Stock(name, df.iloc[:-1].copy()) for name, df in frames.items()]
+        today = [Stock(name, df.copy()) for name, df in frames.items()]
+
+    with tempfile.TemporaryDirectory() as folder:
+        db = StockDB.from_url(os.path.join(folder, "stocks.db"))
+        rows, seconds = timed(lambda: db.ingest(history))
+        print(f"full ingest    {rows:8d} bars  {seconds * 1000:8.1f} ms")
+        rows, seconds = timed(lambda: db.ingest(today))
+        print(f"daily ingest   {rows:8d} bars  {seconds * 1000:8.1f} ms")
+        alerts, seconds = timed(db.latest_alerts)
+        print(f"latest alerts  {len(alerts):8d} rows  {seconds * 1000:8.1f} ms")
+        df, seconds = timed(lambda: db.load(history[0].stock_name))
+        print(f"load one       {len(df):8d} bars  {seconds * 1000:8.1f} ms")
+        db.close()
+
+
+if __name__ == "__main__":
+    main()
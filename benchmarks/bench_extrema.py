@@ -0,0 +1,61 @@
+"""
+Rolling highs/lows: the sliding_window_view max/min (O(n * window)) against the van Herk/Gil-Werman kernel of
+models/stocks/extrema.py (O(n)) on a panel, and the Stock ichimoku against ta.ichimoku on one ticker.
+    python benchmarks/bench_extrema.py --tickers 500 --bars 2500
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from bench_panel import synthetic_frames  # noqa: E402
+from models.stocks import extrema  # noqa: E402
+
+
+def best(function, repeat: int = 3) -> float:
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start)
+    return min(times)
+
+
+def sliding(values: np.ndarray, window: int, reduce) -> np.ndarray:
+    out = np.full_like(values, np.nan)
+    out[:, window - 1:] = reduce(sliding_window_view(values, window, axis=1), axis=-1)
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=2500)
+    args = parser.parse_args()
+    rng = np.random.default_rng(0)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, (args.tickers, args.bars)), axis=1))
+    high, low = close * 1.01, close * 0.99
+
+    print(f"panel {args.tickers} x {args.bars}")
+    for windows in ((9, 26, 52), (200,)):
+        old = best(lambda: [(sliding(high, w, np.max), sliding(low, w, np.min)) for w in windows])
+        new = best(lambda: extrema.rolling_extrema(high, low, windows))
+        print(f"  highs/lows {str(windows):12s} sliding {old * 1000:8.1f} ms  extrema {new * 1000:8.1f} ms  "
+              f"{old / new:5.1f}x")
+
+    import pandas_ta as ta
+    df = next(iter(synthetic_frames(1, args.bars).values()))
+    old = best(lambda: ta.ichimoku(df['High'], df['Low'], df['Close']), repeat=10)
+    new = best(lambda: extrema.ichimoku(df['High'].to_numpy(), df['Low'].to_numpy()), repeat=10)
+    both = best(lambda: extrema.ichimoku(df['High'].to_numpy(), df['Low'].to_numpy(), forward=True), repeat=10)
+    print(f"one ticker ichimoku: ta.ichimoku {old * 1000:6.2f} ms  extrema {new * 1000:6.2f} ms  {old / new:5.1f}x "
+          f"(with the prediction {both * 1000:.2f} ms)")
+
+
+if __name__ == "__main__":
+    main()
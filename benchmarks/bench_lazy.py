@@ -0,0 +1,45 @@
+"""
+Eager Stock (calculate_all + add_alerts) vs. lazy Stock (only the indicators of the rules) for a MACD only scan
+and for the default rules.
+    python benchmarks/bench_lazy.py --tickers 200 --bars 500
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from bench_panel import synthetic_frames  # noqa: E402
+from models.stocks import Stock  # noqa: E402
+from models.stocks.alerts import default_rules  # noqa: E402
+
+
+def scan(frames: dict, **options) -> float:
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for name, df in frames.items():
+            stock = Stock(name, df.copy(), **options)
+            stock.check_alerts(stock)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--bars", type=int, default=500)
+    args = parser.parse_args()
+    frames = synthetic_frames(args.tickers, args.bars)
+    macd_only = [rule for rule in default_rules() if rule.name.startswith("MACD")]
+
+    print(f"{args.tickers} tickers x {args.bars} bars, ms per ticker")
+    for label, rules in (("MACD only", macd_only), ("default rules", None)):
+        eager = scan(frames, rules=rules)
+        lazy = scan(frames, rules=rules, lazy=True)
+        print(f"{label:14s} eager {eager / args.tickers * 1000:7.2f}  lazy {lazy / args.tickers * 1000:7.2f}"
+              f"  {eager / lazy:5.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Bytes per ticker of Stock.df (memory_usage(deep=True)) with the default dtypes and with compact=True.
+    python benchmarks/bench_memory.py --tickers 50 --bars 500
+"""
+import argparse
+import os
+import sys
+from contextlib import redirect_stdout
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from bench_panel import synthetic_frames  # noqa: E402
+from models.stocks import Stock  # noqa: E402
+
+
+def bytes_per_ticker(frames: dict, **options) -> float:
+    total = 0
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for name, df in frames.items():
+            total += Stock(name, df.copy(), **options).df.memory_usage(deep=True).sum()
+    return total / len(frames)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=50)
+    parser.add_argument("--bars", type=int, default=500)
+    args = parser.parse_args()
+    frames = synthetic_frames(args.tickers, args.bars)
+
+    default = bytes_per_ticker(frames)
+    compact = bytes_per_ticker(frames, compact=True)
+    print(f"{args.tickers} tickers x {args.bars} bars, KB per ticker")
+    print(f"default {default / 1024:8.1f}  compact {compact / 1024:8.1f}  {default / compact:4.1f}x smaller")
+
+
+if __name__ == "__main__":
+    main()
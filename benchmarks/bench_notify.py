@@ -0,0 +1,45 @@
+"""
+Notification cost of a run: alerts of N tickers through the dedup state and the batching, the messages sent with the
+SNS size limit (a message per alert before), and the second run of the same bars (everything is a duplicate).
+    python benchmarks/bench_notify.py --tickers 5000
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from models.notify import AlertState, FileChannel, Notifier, SNSChannel, alerts_from_frame  # noqa: E402
+from models.storage import LocalBackend  # noqa: E402
+
+
+def alert_frame(tickers: int, day: str = "2024-05-02") -> pd.DataFrame:
+    rng = np.random.default_rng(0)
+    rules = np.array(["MACD UP", "RSI 30", "Supertrend UP", "MACD UP, RSI 30"], dtype=object)
+    return pd.DataFrame({'stock': [f"t{i}.us" for i in range(tickers)], 'date': pd.Timestamp(day),
+                         'close': rng.uniform(1, 500, tickers), 'alert_types': rules[rng.integers(0, 4, tickers)]})
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=5000)
+    args = parser.parse_args()
+    df = alert_frame(args.tickers)
+    with tempfile.TemporaryDirectory() as folder:
+        sink = FileChannel(os.path.join(folder, "sent.jsonl"), max_bytes=SNSChannel.max_bytes)
+        for run in ("first", "second"):
+            start = time.perf_counter()
+            alerts = alerts_from_frame(df)
+            report = Notifier([sink], AlertState(LocalBackend(folder))).notify(alerts)['file']
+            seconds = time.perf_counter() - start
+            print(f"{run:6s} run  {len(alerts):6d} alerts  {report['messages']:4d} messages "
+                  f"({report['duplicates']} duplicates)  {seconds * 1000:8.1f} ms")
+
+
+if __name__ == "__main__":
+    main()
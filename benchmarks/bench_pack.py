@@ -0,0 +1,62 @@
+"""
+The indicator pack (ADX, Aroon, Bollinger, Stochastic, Williams %R, CCI, MFI, OBV, ROC, STDEV) for one ticker: a
+pandas_ta call plus a pd.concat per indicator vs. the fused IndicatorPack, and the pack over a panel of tickers.
+    python benchmarks/bench_pack.py --bars 500 --tickers 200
+"""
+import argparse
+import os
+import sys
+import timeit
+import warnings
+
+import pandas as pd
+
+warnings.simplefilter("ignore")
+import pandas_ta as ta  # noqa: E402
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from bench_panel import synthetic_frames  # noqa: E402
+from models.stocks.pack import indicator_pack  # noqa: E402
+from models.stocks.panel import OHLCV_COLUMNS, Panel  # noqa: E402
+
+
+def separate_calls(df: pd.DataFrame) -> pd.DataFrame:
+    """One pandas_ta call and one concat per indicator, the way _calculate_supertrend/_calculate_sma were written"""
+    high, low, close, volume = df['high'], df['low'], df['close'], df['volume']
+    for frame in (ta.adx(high, low, close, length=14), ta.aroon(high, low, length=14),
+                  ta.bbands(close, length=20, lower_std=2.0, upper_std=2.0), ta.stoch(high, low, close),
+                  ta.willr(high, low, close, length=14), ta.cci(high, low, close, length=14),
+                  ta.mfi(high, low, close, volume, length=14), ta.obv(close, volume), ta.roc(close, length=10),
+                  ta.stdev(close, length=20)):
+        df = pd.concat([df, frame], axis=1)
+    return df
+
+
+def fused(df: pd.DataFrame) -> pd.DataFrame:
+    values = indicator_pack(df['high'], df['low'], df['close'], df['volume'])
+    return pd.concat([df, pd.DataFrame(values, index=df.index)], axis=1)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=500)
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--repeat", type=int, default=10)
+    args = parser.parse_args()
+    frames = synthetic_frames(args.tickers, args.bars)
+    df = next(iter(frames.values())).rename(columns=OHLCV_COLUMNS)
+
+    separate = min(timeit.repeat(lambda: separate_calls(df), number=1, repeat=args.repeat))
+    pack = min(timeit.repeat(lambda: fused(df), number=1, repeat=args.repeat))
+    print(f"one ticker, {args.bars} bars")
+    print(f"pandas_ta calls {separate * 1000:8.2f} ms  fused pack {pack * 1000:8.2f} ms  {separate / pack:4.1f}x faster")
+
+    panel = Panel.from_frames(frames)
+    seconds = min(timeit.repeat(lambda: indicator_pack(panel.high, panel.low, panel.close, panel.volume), number=1,
+                                repeat=3))
+    print(f"{args.tickers} tickers as a panel {seconds * 1000:8.1f} ms, {seconds / args.tickers * 1000:6.2f} ms per ticker")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+"""
+Per Stock loop vs. the panel engine on synthetic tickers.
+    python benchmarks/bench_panel.py --tickers 500 --bars 500
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from models.stocks import Stock  # noqa: E402
+from models.stocks.panel import Panel, alert_rows  # noqa: E402
+
+
+def synthetic_frames(tickers: int, bars: int, seed: int = 0) -> dict:
+    rng = np.random.default_rng(seed)
+    dates = pd.date_range("2022-01-03", periods=bars, freq="B")
+    frames = {}
+    for i in range(tickers):
+        close = 100 + np.cumsum(rng.normal(0, 1.5, bars))
+        open_ = close + rng.normal(0, 0.5, bars)
+        frames[f"T{i}.US"] = pd.DataFrame({
+            "Date": dates, "Open": open_, "High": np.maximum(open_, close) + rng.uniform(0, 1.5, bars),
+            "Low": np.minimum(open_, close) - rng.uniform(0, 1.5, bars), "Close": close,
+            "Volume": rng.integers(1_000, 100_000, bars).astype(float)})
+    return frames
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=500)
+    parser.add_argument("--bars", type=int, default=500)
+    args = parser.parse_args()
+    frames = synthetic_frames(args.tickers, args.bars)
+
+    start = time.perf_counter()
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for name, df in frames.items():
+            Stock(name, df.copy()).add_alerts()
+    per_stock = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rows = alert_rows(Panel.from_frames(frames))
+    panel = time.perf_counter() - start
+
+    print(f"{args.tickers} tickers x {args.bars} bars")
+    print(f"per Stock loop: {per_stock:8.3f} s")
+    print(f"panel engine:   {panel:8.3f} s ({len(rows)} alert rows)")
+    print(f"speedup:        {per_stock / panel:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+"""
+Throughput and latency of the streaming AlertService: many tickers, every bar closes for all of them together.
+    python benchmarks/bench_service.py --tickers 2000 --bars 300
+"""
+import argparse
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from bench_panel import synthetic_frames  # noqa: E402
+from models.service import AlertService, FeedAdapter  # noqa: E402
+
+
+class MemoryFeed(FeedAdapter):
+    def __init__(self, batches: list):
+        super().__init__()
+        self.batches = batches
+
+    async def __aiter__(self):
+        for batch in self.batches:
+            yield batch
+            await asyncio.sleep(0)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=2000)
+    parser.add_argument("--bars", type=int, default=300)
+    args = parser.parse_args()
+    frames = synthetic_frames(args.tickers, args.bars)
+    columns = {"Open": "open", "High": "high", "Low": "low", "Close": "close", "Volume": "volume"}
+    records = {name: df.rename(columns=columns).to_dict('records') for name, df in frames.items()}
+    batches = [[{**records[name][i], 'stock': name, 'timestamp': i} for name in frames] for i in range(args.bars)]
+
+    alerts = []
+    service = AlertService(MemoryFeed(batches), notify=alerts.extend)
+    start = time.perf_counter()
+    stats = asyncio.run(service.run())
+    elapsed = time.perf_counter() - start
+    print(f"{args.tickers} tickers x {args.bars} bars in {elapsed:.1f}s: {stats['bars'] / elapsed:,.0f} bars/s, "
+          f"{len(alerts)} alerts")
+    print(f"latency per bar close (all the tickers) {stats['latency_ms']}, "
+          f"per bar {elapsed / stats['bars'] * 1e6:.1f}us")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+"""
+Cold start cost: import time of app and of the heavy modules (each one in a fresh interpreter, like a new Lambda
+container) and the time to answer a wrong pass from a cold process.
+    python benchmarks/bench_startup.py
+"""
+import os
+import re
+import subprocess
+import sys
+
+APP_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "stock_alerts")
+MODULES = ["app", "json", "pytz", "numpy", "pandas", "pandas_ta", "requests", "yfinance", "boto3", "pyarrow",
+           "models.stocks", "models.storage", "models.stock_requests"]
+
+
+def import_time(module: str) -> float:
+    """Cumulative import time in ms reported by python -X importtime"""
+    result = subprocess.run([sys.executable, "-X", "importtime", "-c", f"import {module}"], cwd=APP_DIR,
+                            capture_output=True, text=True)
+    for line in result.stderr.splitlines()[::-1]:
+        match = re.match(r"import time:\s+\d+ \|\s+(\d+) \| (\S+)$", line)
+        if match and match.group(2) == module:
+            return int(match.group(1)) / 1000
+    return float("nan")
+
+
+def cold_reject() -> str:
+    code = ("import time; start = time.perf_counter(); import app; "
+            "app.lambda_handler({'pass': 'wrong'}, None); print(f'{(time.perf_counter() - start) * 1000:.1f}')")
+    result = subprocess.run([sys.executable, "-c", code], cwd=APP_DIR, capture_output=True, text=True)
+    return result.stdout.strip().splitlines()[-1]
+
+
+def main():
+    print(f"{'module':24s} import ms")
+    for module in MODULES:
+        print(f"{module:24s} {import_time(module):9.1f}")
+    print(f"cold 'Wrong pass' answer (import + handler): {cold_reject()} ms")
+
+
+if __name__ == "__main__":
+    main()
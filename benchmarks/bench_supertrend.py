@@ -0,0 +1,54 @@
+"""
+The three default supertrends: pandas_ta.supertrend calls vs. the shared kernel used by Stock.
+    python benchmarks/bench_supertrend.py --bars 500
+"""
+import argparse
+import os
+import sys
+import timeit
+
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from models.stocks.supertrend import supertrend  # noqa: E402
+
+PARAMS = ((10, 1), (11, 2), (12, 3))
+
+
+def pandas_ta_version(df: pd.DataFrame) -> pd.DataFrame:
+    """What Stock._calculate_supertrend did before"""
+    frames = [ta.supertrend(df['high'], df['low'], df['close'], length=length, multiplier=float(multiplier))
+              for length, multiplier in PARAMS]
+    return pd.concat([df] + frames, axis=1)
+
+
+def kernel_version(df: pd.DataFrame) -> pd.DataFrame:
+    for name, values in supertrend(df['high'], df['low'], df['close'], PARAMS).items():
+        df[name] = values
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bars", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=20)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    close = 100 + np.cumsum(rng.normal(0, 1.5, args.bars))
+    df = pd.DataFrame({"high": close + rng.uniform(0, 1.5, args.bars), "low": close - rng.uniform(0, 1.5, args.bars),
+                       "close": close})
+
+    old = min(timeit.repeat(lambda: pandas_ta_version(df.copy()), number=1, repeat=args.repeat))
+    new = min(timeit.repeat(lambda: kernel_version(df.copy()), number=1, repeat=args.repeat))
+    print(f"{args.bars} bars, 3 supertrends")
+    print(f"pandas_ta x3 + concat: {old * 1000:8.2f} ms")
+    print(f"shared kernel:         {new * 1000:8.2f} ms")
+    print(f"speedup:               {old / new:8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
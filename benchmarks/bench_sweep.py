@@ -0,0 +1,51 @@
+"""
+Parameter sweep with the shared intermediates (IndicatorCache) vs. computing all the indicators per grid point.
+    python benchmarks/bench_sweep.py --tickers 200 --bars 500
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from bench_panel import synthetic_frames  # noqa: E402
+from models.stocks.alerts import AlertPlan, default_rules  # noqa: E402
+from models.stocks.backtest import report, simulate  # noqa: E402
+from models.stocks.panel import Panel, compute_panel  # noqa: E402
+from models.stocks.sweep import grid_points, sweep  # noqa: E402
+
+GRID = {'macd': [(12, 26, 9), (8, 21, 5)], 'rsi': [7, 14, 21],
+        'supertrends': [((10, 1), (11, 2), (12, 3)), ((10, 1.5), (11, 2.5), (12, 3.5))]}
+
+
+def recompute(frames: dict):
+    """The naive sweep: every indicator again for every grid point (only the supertrends can vary here)"""
+    panel = Panel.from_frames(frames)
+    for params in grid_points(GRID):
+        supertrends = params['supertrends']
+        indicators = compute_panel(panel, supertrends=supertrends)
+        report(simulate(panel, AlertPlan(default_rules(supertrends)), indicators), by=('stock',))
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=200)
+    parser.add_argument("--bars", type=int, default=500)
+    args = parser.parse_args()
+    frames = synthetic_frames(args.tickers, args.bars)
+    points = len(grid_points(GRID))
+
+    start = time.perf_counter()
+    recompute(frames)
+    naive = time.perf_counter() - start
+    start = time.perf_counter()
+    table = sweep(frames, GRID)
+    shared = time.perf_counter() - start
+    print(f"{args.tickers} tickers x {args.bars} bars x {points} grid points")
+    print(f"recompute {naive:.2f}s  shared {shared:.2f}s  {naive / shared:.1f}x")
+    print(table[table['rank'] == 1].head().to_string())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""
+WindowDataset: build from the indicator frames, append a day, one epoch in order and shuffled, and the peak RSS
+(the synthetic frames are made before, their memory is in the RSS).
+    python benchmarks/bench_windows.py --tickers 1000 --bars 2500
+"""
+import argparse
+import os
+import resource
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "..", "stock_alerts"))
+
+from models.training import FEATURES, WindowDataset  # noqa: E402
+
+
+def frames(tickers: int, bars: int, start: int = 0):
+    dates = pd.bdate_range("2015-01-01", periods=bars + 1)
+    for i in range(tickers):
+        rng = np.random.default_rng(i)
+        df = pd.DataFrame(rng.normal(size=(bars + 1, len(FEATURES))), columns=list(FEATURES))
+        df['close'] = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, bars + 1)))
+        df.insert(0, 'date', dates)
+        yield f"t{i}.us", df.iloc[start:bars + start]
+
+
+def timed(function):
+    start = time.perf_counter()
+    result = function()
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--tickers", type=int, default=1000)
+    parser.add_argument("--bars", type=int, default=2500)
+    parser.add_argument("--window", type=int, default=60)
+    parser.add_argument("--batch", type=int, default=256)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as folder:
+        ds = WindowDataset(folder, window=args.window)
+        history, today = dict(frames(args.tickers, args.bars)), dict(frames(args.tickers, args.bars, start=1))
+        rows, seconds = timed(lambda: ds.append_stocks(history))
+        size = sum(os.path.getsize(os.path.join(folder, name)) for name in os.listdir(folder))
+        print(f"build          {rows:9d} rows   {seconds * 1000:9.1f} ms  {size / 2 ** 20:8.1f} MB on disk")
+        rows, seconds = timed(lambda: ds.append_stocks(today))
+        print(f"append a day   {rows:9d} rows   {seconds * 1000:9.1f} ms")
+        print(f"windows        {len(ds):9d}  ({len(ds) * args.window * len(FEATURES) * 4 / 2 ** 30:.1f} GB if copied)")
+
+        for shuffle in (False, True):
+            reopened = WindowDataset(folder)
+            # x.sum() reads every value of the batch, like the training step would
+            count, seconds = timed(lambda: sum(len(x) + 0 * int(x.sum() > 0)
+                                               for x, y, _ in reopened.batches(args.batch, shuffle=shuffle, seed=0)))
+            print(f"epoch {'shuffled' if shuffle else 'in order':9s}{count:9d} windows {seconds * 1000:9.1f} ms")
+    print(f"peak RSS       {resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024:9.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
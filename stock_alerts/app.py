@@ -3,19 +3,70 @@ from __future__ import annotations
 import json
 import os
 import time
-from datetime import datetime
+from datetime import datetime, timedelta
+from functools import lru_cache
+from typing import TYPE_CHECKING
 
-import boto3
-import pytz
-import yfinance
+# pandas, pandas_ta, yfinance, boto3... are imported in the functions that use them: a cold start pays only for the
+# code it runs (a wrong pass is answered before any of them is loaded) and the warm invocations have them cached
+if TYPE_CHECKING:
+    import pandas as pd
+    from models import storage
+    from models.stocks import Stock
 
-from models import stock_requests, stocks
-from models.stocks import Stock
 
-eet_tz = pytz.timezone('Europe/Bucharest')
+@lru_cache(maxsize=None)
+def eet_tz():
+    import pytz
+    return pytz.timezone('Europe/Bucharest')
 
 
-def yield_stocks(stock_list: list, from_time: int | None = None, to_time: int | None = None, granularity: str = "1D") \
+def download_stock(stock: str, from_time: int | None = None, to_time: int | None = None, granularity: str = "1D",
+                   limiters: dict | None = None, start: datetime | None = None):
+    """
+    Downloads one stock, first from yfinance and if it fails from stooq.
+    :param limiters: Optional {source: RateLimiter}, every source request waits for its own limiter
+    :param start: Download only from this date (what is missing from the cache), None for the full history
+    :return: stock data in pd.Dataframe format
+    """
+    import yfinance
+    from models import stock_requests
+    from models.metrics import stage
+    from models.stocks import intraday
+
+    limiters = limiters or {}
+    granularity = intraday.normalize_granularity(granularity)
+    if start is not None and intraday.is_intraday(granularity):
+        start -= timedelta(days=1)  # the cache is in UTC, yfinance reads start in the exchange time
+    print(f"Downloading {stock}")
+    if "." in stock:
+        try:  # Try yfinance
+            if "yfinance" in limiters:
+                limiters["yfinance"].wait()
+            with stage('download', stock=stock, source='yfinance'):
+                if start is not None:
+                    stock_data = yfinance.Ticker(stock.split(".")[0]).history(
+                        start=start, interval=granularity, raise_errors=True)
+                elif from_time is None or to_time is None:
+                    stock_data = yfinance.Ticker(stock.split(".")[0]).history(
+                        period=intraday.history_period(granularity), interval=granularity, raise_errors=True)
+            stock_data.reset_index(inplace=True)
+        except Exception as e:  # failed use stooq
+            print(f"Failed yfinance request {e}, fallback to stooq")
+            if "stooq" in limiters:
+                limiters["stooq"].wait()
+            with stage('download', stock=stock, source='stooq'):
+                result = stock_requests.fetch_stooq(stock, start_date=start, interval=granularity)
+            if not result.ok:
+                raise stock_requests.DownloadError(result)
+            stock_data = result.data
+    else:  # this can be used for other kind of sources:
+        raise ValueError(f"No source for {stock}")
+    return stock_data
+
+
+def yield_stocks(stock_list: list, from_time: int | None = None, to_time: int | None = None, granularity: str = "1D",
+                 max_workers: int = 1, rate_limits: dict | None = None, cache: storage.OHLCVStore | None = None) \
         -> tuple:
     """
     Yields stock data from online structure in json/dict format.
@@ -23,28 +74,44 @@ def yield_stocks(stock_list: list, from_time: int | None = None, to_time: int |
     :param from_time: Timestamp
     :param to_time: Timestamp
     :param granularity: String: Must be in the yfinance format
+    :param max_workers: More than 1 downloads concurrently, the stocks are yielded in completion order
+    :param rate_limits: Requests per second for each source, e.g. {"yfinance": 5, "stooq": 2}
+    :param cache: OHLCVStore, when given only the bars missing from it are downloaded
     :return: [1]- name of stock, [2] - stock data in json/dict/pd.Dataframe format
     """
+    from models import stock_requests
+    from models.metrics import stage
+
+    limiters = stock_requests.make_limiters(rate_limits)
+
+    def download_missing(stock, start):
+        try:
+            return download_stock(stock, from_time, to_time, granularity, limiters, start)
+        except stock_requests.DownloadError as e:
+            print(f"ERROR downloading {stock} due to {e}")
+            return None  # the cached history is used
+
+    def download(stock):
+        if cache is None:
+            return download_stock(stock, from_time, to_time, granularity, limiters)
+        with stage('cache_fetch', stock=stock):  # the download of the missing bars is in it
+            data = cache.fetch(stock, download_missing)
+        if data is None:
+            raise ValueError(f"No data and no cache for {stock}")
+        return data
+
+    if max_workers > 1:
+        yield from stock_requests.download_concurrently(stock_list, download, max_workers=max_workers)
+        return
+
     for stock in stock_list:
         try:
-            print(f"Downloading {stock}")
-            if "." in stock:
-                try:  # Try yfinance
-                    if from_time is None or to_time is None:
-                        stock_data = yfinance.Ticker(stock.split(".")[0]).history(
-                            period="2y", interval=granularity, raise_errors=True)
-                    stock_data.reset_index(inplace=True)
-                except Exception as e:  # failed use stooq
-                    print(f"Failed yfinance request {e}, fallback to stooq")
-                    stock_data = stock_requests.download_stooq(stock)
-            else:  # this can be used for other kind of sources:
-                pass
-            yield stock, stock_data
+            yield stock, download(stock)
         except Exception as e:
             print(f"ERROR downloading {stock} due to {e}")
 
 
-def check_alert(stock_obj: stocks.Stock) -> Stock | None:
+def check_alert(stock_obj: Stock) -> Stock | None:
     """
     Will read the stock_obj look at it's last 5 records, and if there are any alerts it will save return it as a short
     :param stock_obj:
@@ -53,10 +120,10 @@ def check_alert(stock_obj: stocks.Stock) -> Stock | None:
     # print(f"Checking -> {stock_obj.stock_name} {stock_obj} {stock_obj.df}")
     try:
         if stock_obj.check_alerts(stock_obj):
-            print(
-                f"""{stock_obj.df.iloc[-5:][['date', 'close', 'histogram',
-                                             'alert_type', 'sma20', 'SUPERTd_10_1.0', 'SUPERTd_10_1.0', 'SUPERTd_11_2.0']]}"""
-            )
+            columns = ['date', 'close', 'histogram', 'alert_type', 'sma20', 'SUPERTd_10_1.0', 'SUPERTd_11_2.0']
+            import pandas as pd
+            with pd.option_context('display.max_columns', None):
+                print(f"""{stock_obj.df.iloc[-5:][[col for col in columns if col in stock_obj.df.columns]]}""")
             return stock_obj
     except Exception as e:
         print(f"ERROR checking {stock_obj.stock_name} due to {e}")
@@ -110,6 +177,7 @@ def lambda_handler(event, context):
     file_type = os.getenv("FILE_TYPE", "csv")
     topic_arn = os.getenv("TOPIC_ARN")
     bucket_name = os.getenv("BUCKET_NAME")
+    ohlcv_cache = os.getenv("OHLCV_CACHE")  # s3://bucket/prefix or a local folder
 
     # Check how the event is coming!
     event = event.get("body", event)
@@ -128,40 +196,245 @@ def lambda_handler(event, context):
             },
         }
 
-    alerts = message = "No alerts"
+    from models.stocks import alerts as alert_rules
+    try:
+        rules = alert_rules.rules_from_event(event.get('alert_rules'))
+    except (ValueError, KeyError, TypeError) as e:
+        return {
+            "statusCode": 400,
+            "headers": {
+                "Content-Type": "application/json",
+            },
+            "body": {
+                "message": f"Wrong alert_rules: {e}",
+            },
+        }
+    if event.get('params') and event.get('engine', os.getenv("ENGINE", "stock")) == "panel":
+        return {
+            "statusCode": 400,
+            "headers": {
+                "Content-Type": "application/json",
+            },
+            "body": {
+                "message": "Wrong params: the panel engine computes only the default indicator settings, "
+                           "use the stock engine",
+            },
+        }
+
+    from models.metrics import measure, profiled
+    # the stages are always timed (a few records per stock), the profilers and the EMF lines are opt in
+    with measure() as timer, profiled(event.get('profile', os.getenv("PROFILE"))) as profile:
+        shard_size = int(event.get('shard_size', os.getenv("SHARD_SIZE", 0)))
+        if shard_size and not event.get('worker') and len(event['stock_list']) > shard_size:
+            # coordinator: the shards are scanned by parallel workers, here only one message and one export
+            from models import fanout
+            function_name = os.getenv("AWS_LAMBDA_FUNCTION_NAME")
+            dispatcher = fanout.LambdaDispatcher(function_name) if function_name else fanout.LocalDispatcher(run_worker)
+            alerts, alert_df, errors = fanout.reduce_results(dispatcher.map(fanout.shard_events(event, shard_size)))
+            if errors:
+                print(f"ERROR failed shards {errors}")
+            worker = False
+        else:
+            alerts, alert_df = scan_stocks(event, rules, ohlcv_cache)
+            worker = bool(event.get('worker'))
+
+        message = "No alerts"
+        if alerts and not worker:
+            message = notify_and_save(alerts, alert_df, topic_arn, bucket_name, key_prefix, file_type)
+
+    report_timings(timer, profile, event.get('metrics', os.getenv("METRICS", "")) not in ("", "0", "false", False),
+                   context)
+    if worker:
+        from models import fanout
+        return fanout.worker_result(event, alerts, alert_df)
+    return build_result(event, message, alerts or "No alerts", start_time, timer.summary())
+
+
+def report_timings(timer, profile, emf: bool, context=None):
+    """
+    Print the profiles and, when emf, the stage timings as CloudWatch EMF lines (the Lambda log turns them into
+    metrics, no API call)
+    """
+    for mode, text in profile.report().items():
+        print(f"PROFILE {mode}:\n{text if isinstance(text, str) else json.dumps(text, indent=1)}")
+    if emf:
+        dimensions = {'FunctionName': context.function_name} if getattr(context, 'function_name', None) else {}
+        for line in timer.emf(**dimensions):
+            print(line)
+
+
+def run_worker(event: dict) -> dict:
+    """One shard in a local process (LocalDispatcher)"""
+    return lambda_handler(event, None)
+
+
+def scan_stocks(event: dict, rules: list | None, ohlcv_cache: str | None) -> tuple:
+    """
+    Download and check all the event['stock_list']
+    :return: ([{stock: alert_types}, ...], DataFrame with the alerted rows, the list of the alerted Stock frames
+        (stock engine) or None)
+    """
+    import pandas as pd
+    from models import stocks, storage, training
+    from models.stocks import Stock, alerts as alert_rules, compute_pool, intraday, panel
+
+    granularity = intraday.normalize_granularity(event.get('granularity') or os.getenv("GRANULARITY", "1d"))
+    engine = event.get('engine', os.getenv("ENGINE", "stock"))
+    compute_workers = int(event.get('compute_workers', os.getenv("COMPUTE_WORKERS", 1)))
+    sequential = engine != "panel" and compute_workers <= 1  # the only path that keeps the Stock objects
+    database = os.getenv("DATABASE")  # sqlite:///path, the bars, indicators and alerts of the stock engine
+    if database and not sequential:
+        print(f"WARNING: DATABASE is only written by the stock engine with compute_workers 1, "
+              f"not saved with engine {engine} and compute_workers {compute_workers}")
+        database = None
+    db = storage.StockDB.from_url(database, interval=granularity,
+                                  history_days=intraday.history_days(granularity)) if database else None
+    dataset_dir = os.getenv("DATASET")  # folder of the LSTM/GRU training windows, the stock engine appends the new days
+    if dataset_dir and not sequential:
+        print(f"WARNING: DATASET is only appended by the stock engine with compute_workers 1, "
+              f"not appended with engine {engine} and compute_workers {compute_workers}")
+        dataset_dir = None
+    dataset = training.WindowDataset(os.path.join(dataset_dir, granularity)) if dataset_dir else None
+    cache = None
+    if ohlcv_cache and ohlcv_cache.startswith("sqlite:"):
+        cache = db if ohlcv_cache == database else storage.StockDB.from_url(
+            ohlcv_cache, interval=granularity, history_days=intraday.history_days(granularity))
+    elif ohlcv_cache:
+        # one cache per interval, the intraday history is as long as yfinance serves it
+        cache = storage.OHLCVStore(storage.backend_from_url(ohlcv_cache),
+                                   prefix="ohlcv" if granularity == "1d" else f"ohlcv-{granularity}",
+                                   history_days=intraday.history_days(granularity))
+    downloads = yield_stocks(event['stock_list'], granularity=granularity,
+                             max_workers=int(event.get('max_workers', os.getenv("MAX_WORKERS", 1))),
+                             rate_limits=event.get('rate_limits'), cache=cache)
+
+    # intraday: at most `bars` bars per ticker and the coarser `timeframes` resampled from the same download, the
+    # bars start every bar size from the UTC epoch + `timeframe_offset` seconds (1800: the US session hours)
+    offset = int(event.get('timeframe_offset', os.getenv("TIMEFRAME_OFFSET", 0)))
+    downloads = intraday.expand_timeframes(downloads, granularity, event.get('timeframes') or (),
+                                           int(event.get('bars', os.getenv("MAX_BARS", intraday.MAX_BARS))),
+                                           as_json=sequential, offset=offset)
+
+    def by_timeframe() -> dict:
+        frames = {}
+        for stock, timeframe, data in downloads:
+            if data is not None and len(data) > 0:
+                frames.setdefault(timeframe, {})[stock] = data
+        return frames
+
+    if engine == "panel":
+        # all the tickers computed together as numpy arrays
+        alert_dfs = [panel.alert_rows(panel.Panel.from_frames(frames), plan=alert_rules.AlertPlan(rules),
+                                      since=intraday.cutoff(timeframe, offset=offset) if intraday.is_intraday(timeframe)
+                                      else Stock._find_time())
+                     for timeframe, frames in by_timeframe().items()]
+        if not alert_dfs:
+            return [], None
+        alert_df = pd.concat(alert_dfs, ignore_index=True)
+        return [{row.stock: row.alert_types} for row in alert_df.itertuples()], alert_df
+
     # catch everything if is the case:
+    tail_alerts = str(event.get('tail_alerts', os.getenv("TAIL_ALERTS", ""))).lower() in ("1", "true", "yes")
+    lazy = str(event.get('lazy', os.getenv("LAZY_INDICATORS", ""))).lower() in ("1", "true", "yes")
+    compact = str(event.get('compact', os.getenv("COMPACT_DF", ""))).lower() in ("1", "true", "yes")
+    if compute_workers > 1:
+        # the Stock objects are built in a process pool, only the last row of the alerted ones comes back
+        results = [result for timeframe, frames in by_timeframe().items()
+                   for result in compute_pool.check_stocks(frames, max_workers=compute_workers, rules=rules,
+                                                           tail_alerts=tail_alerts, lazy=lazy, compact=compact,
+                                                           granularity=timeframe, offset=offset,
+                                                           params=event.get('params'))]
+        if not results:
+            return [], None
+        return [{result['stock']: result['alert_types']} for result in results], \
+            pd.DataFrame([result['row'] for result in results])
+
     stock_objects = []
-    for stock in yield_stocks(event['stock_list']):
-        stock = stocks.Stock(stock[0], stock[1])
-        alert_obj = check_alert(stock)
-        stock_objects.append(alert_obj) if alert_obj else None
-
-    if len(stock_objects) > 0:
-        alerts = [
-            {stock.stock_name: stock.df.iloc[-1]['alert_type']} for stock in stock_objects
-        ]
-        message = (
-            f"""At {datetime.now(eet_tz)} have the following: {alerts}""")
-
-        # Send SMS to Topic
-        if topic_arn:
-            sns_client = boto3.client('sns')
-            response = sns_client.publish(
-                TopicArn=topic_arn,
-                Message=message
-            )
-            print(f"INFO: SENT SMS {response}")
+    params = event.get('params') or {}  # {ticker: indicator settings}, e.g. sweep.best_params
+    try:
+        for name, timeframe, data in downloads:
+            stock = stocks.Stock(name, data, granularity=timeframe, rules=rules, tail_alerts=tail_alerts, lazy=lazy,
+                                 compact=compact, params=params.get(name), offset=offset)
+            alert_obj = check_alert(stock)
+            stock_objects.append(alert_obj) if alert_obj else None
+            if db is not None:
+                db.save_stock(stock)  # only the bars from the last stored one
+            if dataset is not None and timeframe == granularity:
+                stock.ensure(dataset.features)
+                dataset.append(stock.stock_name, stock.export_frame(), write_manifest=False)
+        if dataset is not None:
+            dataset.save()
+    finally:
+        if db is not None:
+            db.close()
+
+    if not stock_objects:
+        return [], None
+    alerts = [{stock.stock_name: stock.df.iloc[-1]['alert_types']} for stock in stock_objects]
+    return alerts, [obj.export_frame() for obj in stock_objects]  # no concat, the exports write them one by one
+
+
+def notify_and_save(alerts: list, df: pd.DataFrame | list, topic_arn: str | None, bucket_name: str | None,
+                    key_prefix: str, file_type: str) -> str:
+    """
+    Send the new alerts to the channels (SNS topic, email, webhook, file, see notify.channels_from_env) and save the
+    alerted rows in the bucket (when they are configured)
+    :param df: the alerted rows, or the list of the frames of the alerted stocks (stock engine)
+    :return: the message
+    """
+    now = datetime.now(eet_tz())
+    message = (
+        f"""At {now} have the following: {alerts}""")
 
+    from models import notify, stocks, storage
+
+    from models.metrics import stage
+
+    # the channels send in threads while the rows are saved, the alerts already sent for the same bar are skipped
+    channels = notify.channels_from_env(topic_arn)
+    notifier = None
+    if channels:
+        state_url = os.getenv("ALERT_STATE")  # s3://bucket/prefix or a folder, by default next to the saved alerts
+        state = notify.AlertState.from_url(state_url) if state_url else \
+            notify.AlertState(storage.S3Backend(bucket_name), key=f"{key_prefix}/_sent.json") if bucket_name else None
+        notifier = notify.Notifier(channels, state)
+
+    try:
+        if notifier is not None:
+            try:
+                notifier.submit(notify.alerts_from_frame(df), when=now)
+            except Exception as e:  # an unreadable state must not stop the alerts (the baseline just published)
+                print(f"ERROR reading the alert state {notifier.state} due to {e}, sending without deduplication")
+                notifier.state = None
+                notifier.submit(notify.alerts_from_frame(df), when=now)
         # Save to bucket
-        if bucket_name:
-            stocks.save_stocks_to_s3(stock_objects,
+        if bucket_name and file_type == "parquet":
+            # only the rows after the last saved ones, partitioned by month and stock
+            log = storage.AlertLog(storage.S3Backend(bucket_name), prefix=key_prefix,
+                                   compression=os.getenv("COMPRESSION", "snappy"))
+            with stage('s3_save'):
+                keys = log.append(df)
+            print(f"INFO: Saved {len(keys)} files for {len(alerts)} alerts in s3://{bucket_name}/{key_prefix}/")
+        elif bucket_name:
+            with stage('s3_save'):
+                stocks.save_df_to_s3(df,
                                      bucket=bucket_name,
                                      key=f"{key_prefix}-{datetime.now().strftime('%Y-%m-%d_%H%M')}",
                                      file_type=file_type
                                      )
-            print(f"INFO: Saved {len(stock_objects)} in "
+            print(f"INFO: Saved {len(alerts)} in "
                   f"https://{bucket_name}.s3.us-east-1.amazonaws.com/{key_prefix}-{datetime.now().strftime('%Y-%m-%d_%H%M')}.csv")
+    finally:
+        if notifier is not None:
+            print(f"INFO: notifications {notifier.wait()}")
+    return message
 
+
+def build_result(event: dict, message: str, alerts, start_time: float, timings: dict | None = None) -> dict:
+    """
+    API Gateway Lambda Proxy Output with the summary of the run
+    :param timings: StageTimer.summary() of the run
+    """
     result = {
         "statusCode": 200,
         "headers": {
@@ -170,11 +443,13 @@ def lambda_handler(event, context):
         "body": {
             "message": message,
             "event": {
-                "time": str(datetime.now(eet_tz)),
+                "time": str(datetime.now(eet_tz())),
                 "alerts": alerts,
                 "granularity": event.get('granularity'),
                 "stock_list": event.get('stock_list'),
-                "execution_time_seconds": int(time.time() - start_time)
+                "execution_time_seconds": int(time.time() - start_time),
+                "execution_time_ms": round((time.time() - start_time) * 1000, 3),
+                "timings": timings or {},
             }
             # "location": ip.text.replace("\n", "")
         },
@@ -0,0 +1 @@
+from .dispatch import LambdaDispatcher, LocalDispatcher, reduce_results, shard, shard_events, worker_result
@@ -0,0 +1,132 @@
+from __future__ import annotations
+
+import json
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache
+from io import StringIO
+from typing import Callable
+
+import pandas as pd
+
+from ..notify import last_alerted_rows
+
+
+def shard(items: list, shard_size: int) -> list:
+    """[1, 2, 3, 4, 5], 2 -> [[1, 2], [3, 4], [5]]"""
+    shard_size = max(1, int(shard_size))
+    return [items[i:i + shard_size] for i in range(0, len(items), shard_size)]
+
+
+def shard_events(event: dict, shard_size: int) -> list:
+    """The coordinator event split in worker events, same options with a part of the stock_list"""
+    return [{**event, 'stock_list': stock_list, 'worker': True, 'shard': i}
+            for i, stock_list in enumerate(shard(event['stock_list'], shard_size))]
+
+
+def worker_result(event: dict, alerts: list, df: pd.DataFrame | list | None) -> dict:
+    """
+    What a worker sends back to the coordinator, JSON only. Lambda payloads are max 6MB: the stock engine gives the
+    whole history of the alerted stocks (a list of frames), only the last alerted row of each stock is sent (what the
+    notifications use, like the compute_pool rows).
+    """
+    frames = [frame for frame in (df if isinstance(df, list) else [df]) if frame is not None and len(frame)]
+    df = pd.concat([last_alerted_rows(frame) for frame in frames], ignore_index=True) if frames else None
+    return {
+        "statusCode": 200,
+        "body": {
+            "shard": event.get('shard'),
+            "alerts": alerts,
+            "rows": df.to_json(orient="split", date_format="iso") if df is not None and len(df) else None,
+        },
+    }
+
+
+def _error_result(event: dict, error) -> dict:
+    return {"statusCode": 500, "body": {"shard": event.get('shard'), "error": str(error)}}
+
+
+def reduce_results(results: list) -> tuple:
+    """
+    Merge the worker results in one list of alerts and one DataFrame (for one SNS message and one export).
+    Returns (alerts, df or None, errors), errors are the failed shards as {shard: message}
+    """
+    alerts, frames, errors = [], [], {}
+    for result in sorted(results, key=lambda r: r["body"].get("shard") or 0):
+        body = result["body"]
+        if result.get("statusCode") != 200:
+            errors[body.get("shard")] = body.get("error") or body.get("message")
+            continue
+        alerts.extend(body.get("alerts") or [])
+        if body.get("rows"):
+            frames.append(pd.read_json(StringIO(body["rows"]), orient="split"))
+    return alerts, pd.concat(frames, ignore_index=True) if frames else None, errors
+
+
+class LocalDispatcher:
+    """
+    Runs the worker events in a local process pool, used in tests and when running the app on a normal box.
+    :param worker: a picklable worker(event) -> dict, e.g. app.lambda_handler without the context
+    """
+
+    def __init__(self, worker: Callable, max_workers: int | None = None):
+        self.worker = worker
+        self.max_workers = max_workers
+
+    def map(self, events: list) -> list:
+        if not events:
+            return []
+        with ProcessPoolExecutor(max_workers=self.max_workers or len(events)) as executor:
+            futures = [(event, executor.submit(self.worker, event)) for event in events]
+            results = []
+            for event, future in futures:
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    print(f"ERROR shard {event.get('shard')} failed due to {e}")
+                    results.append(_error_result(event, e))
+            return results
+
+
+@lru_cache(maxsize=None)
+def _lambda_client():
+    import boto3
+    from botocore.config import Config
+    # the default read timeout (60s) is shorter than a worker can run
+    return boto3.client("lambda", config=Config(read_timeout=900, retries={"max_attempts": 0}))
+
+
+class LambdaDispatcher:
+    """
+    Invokes one Lambda per worker event, all of them at the same time.
+    The invocations are synchronous (RequestResponse) from threads, the coordinator needs the results to reduce them,
+    so the wall clock time is about the time of the slowest shard.
+    """
+
+    def __init__(self, function_name: str, client=None, max_workers: int = 32):
+        self.function_name = function_name
+        self._client = client
+        self.max_workers = max_workers
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = _lambda_client()
+        return self._client
+
+    def _invoke(self, event: dict) -> dict:
+        try:
+            response = self.client.invoke(FunctionName=self.function_name, InvocationType="RequestResponse",
+                                          Payload=json.dumps(event, default=str).encode("utf-8"))
+            payload = json.loads(response["Payload"].read())
+            if response.get("FunctionError"):
+                return _error_result(event, payload.get("errorMessage", payload))
+            return payload
+        except Exception as e:
+            print(f"ERROR invoking shard {event.get('shard')} due to {e}")
+            return _error_result(event, e)
+
+    def map(self, events: list) -> list:
+        if not events:
+            return []
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(events))) as executor:
+            return list(executor.map(self._invoke, events))
@@ -0,0 +1,2 @@
+from .profiling import Profile, profiled
+from .stages import StageTimer, active, measure, stage
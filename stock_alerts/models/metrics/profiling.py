@@ -0,0 +1,61 @@
+from __future__ import annotations
+
+import cProfile
+import io
+import pstats
+import tracemalloc
+from contextlib import contextmanager
+
+MODES = ("cprofile", "tracemalloc")
+
+
+class Profile:
+    """What profiled() captured, report() is a dict for the logs/the result"""
+
+    def __init__(self, modes: tuple, top: int):
+        self.modes = modes
+        self.top = top
+        self.profiler = cProfile.Profile() if "cprofile" in modes else None
+        self.snapshot = None
+        self.peak_bytes = None
+
+    def report(self) -> dict:
+        out = {}
+        if self.profiler is not None:
+            stream = io.StringIO()
+            stats = pstats.Stats(self.profiler, stream=stream).strip_dirs().sort_stats("cumulative")
+            stats.print_stats(self.top)
+            out["cprofile"] = stream.getvalue()
+        if self.snapshot is not None:
+            out["tracemalloc"] = {
+                "peak_mb": round(self.peak_bytes / 2 ** 20, 3),
+                "top": [f"{stat.traceback[0].filename}:{stat.traceback[0].lineno} {stat.size / 2 ** 10:.1f} KiB "
+                        f"in {stat.count} blocks" for stat in self.snapshot.statistics("lineno")[:self.top]],
+            }
+        return out
+
+
+@contextmanager
+def profiled(modes=None, top: int = 25):
+    """
+    cProfile and/or tracemalloc around the block, modes as the event/env give them: "cprofile",
+    "cprofile,tracemalloc" or a list. Nothing is done for no modes.
+    """
+    if isinstance(modes, str):
+        modes = modes.split(",")
+    modes = tuple(m.strip() for m in modes or () if m.strip() in MODES)
+    profile = Profile(modes, top)
+    tracing = "tracemalloc" in modes and not tracemalloc.is_tracing()
+    if tracing:
+        tracemalloc.start()
+    if profile.profiler is not None:
+        profile.profiler.enable()
+    try:
+        yield profile
+    finally:
+        if profile.profiler is not None:
+            profile.profiler.disable()
+        if tracing:
+            profile.snapshot = tracemalloc.take_snapshot()
+            profile.peak_bytes = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
@@ -0,0 +1,125 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+NAMESPACE = "StockAlerts"
+EMF_MAX_VALUES = 100  # values of one metric in one EMF line
+
+_active = None  # the StageTimer of the running invocation, None when nothing is measured
+_NOTHING = nullcontext()
+
+
+class StageTimer:
+    """
+    Durations of the pipeline stages (download, rename, calculate_*, add_alerts, check_alerts, s3_save, ...),
+    recorded with tags (stock, source, ...). Thread safe, the downloads run in threads.
+    """
+
+    def __init__(self):
+        self.records = []  # (stage, seconds, tags)
+        self.started = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def record(self, name: str, seconds: float, **tags):
+        with self._lock:
+            self.records.append((name, seconds, tags))
+
+    @contextmanager
+    def stage(self, name: str, **tags):
+        start = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            tags['error'] = type(e).__name__
+            raise
+        finally:
+            self.record(name, time.perf_counter() - start, **tags)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    def summary(self) -> dict:
+        """{stage: {'count', 'total_ms', 'max_ms'}}, the downloads also per source"""
+        out = {}
+        for name, seconds, tags in self.records:
+            keys = [name] + ([f"{name}:{tags['source']}"] if 'source' in tags else [])
+            for key in keys:
+                stats = out.setdefault(key, {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0})
+                stats['count'] += 1
+                stats['total_ms'] += seconds * 1000
+                stats['max_ms'] = max(stats['max_ms'], seconds * 1000)
+        return {key: {**stats, 'total_ms': round(stats['total_ms'], 3), 'max_ms': round(stats['max_ms'], 3)}
+                for key, stats in out.items()}
+
+    def by_stock(self) -> dict:
+        """{stock: {stage: ms}}, the time spent on each ticker"""
+        out = {}
+        for name, seconds, tags in self.records:
+            if 'stock' in tags:
+                stages = out.setdefault(tags['stock'], {})
+                stages[name] = round(stages.get(name, 0.0) + seconds * 1000, 3)
+        return out
+
+    def emf(self, namespace: str = NAMESPACE, **dimensions) -> list:
+        """
+        CloudWatch Embedded Metric Format lines: one per stage (and source) with the Duration values in ms, one
+        with the total and one plain JSON line per stock with its breakdown (a property, not a metric dimension).
+        :param dimensions: Added to every metric, e.g. FunctionName
+        """
+        groups = {}
+        for name, seconds, tags in self.records:
+            key = (name, tags.get('source'), 'error' in tags)
+            groups.setdefault(key, []).append(round(seconds * 1000, 3))
+
+        timestamp = int(time.time() * 1000)
+        lines = []
+        for (name, source, failed), values in sorted(groups.items(), key=lambda item: str(item[0])):
+            stage = {'Stage': name, **({'Source': source} if source else {})}
+            for i in range(0, len(values), EMF_MAX_VALUES):
+                lines.append(_emf_line(namespace, timestamp, {**dimensions, **stage},
+                                       {'Duration': (values[i:i + EMF_MAX_VALUES], 'Milliseconds'),
+                                        ('Errors' if failed else 'Count'): (len(values[i:i + EMF_MAX_VALUES]),
+                                                                            'Count')}))
+        lines.append(_emf_line(namespace, timestamp, {**dimensions, 'Stage': 'total'},
+                               {'Duration': (round(self.elapsed * 1000, 3), 'Milliseconds')}))
+        for stock, stages in sorted(self.by_stock().items()):
+            lines.append(json.dumps({'type': 'stock_timing', 'stock': stock, **dimensions, 'stages_ms': stages}))
+        return lines
+
+
+def _emf_line(namespace: str, timestamp: int, dimensions: dict, metrics: dict) -> str:
+    return json.dumps({
+        '_aws': {'Timestamp': timestamp,
+                 'CloudWatchMetrics': [{'Namespace': namespace, 'Dimensions': [list(dimensions)],
+                                        'Metrics': [{'Name': name, 'Unit': unit}
+                                                    for name, (_, unit) in metrics.items()]}]},
+        **dimensions,
+        **{name: value for name, (value, _) in metrics.items()},
+    })
+
+
+def stage(name: str, **tags):
+    """
+    `with stage("download", stock=..., source="yfinance"):` times the block in the active StageTimer,
+    a shared no-op when none is active (the cost is one global lookup)
+    """
+    return _NOTHING if _active is None else _active.stage(name, **tags)
+
+
+def active() -> StageTimer | None:
+    return _active
+
+
+@contextmanager
+def measure(timer: StageTimer | None = None):
+    """Make timer (a new one by default) the active one for the block"""
+    global _active
+    previous, _active = _active, timer or StageTimer()
+    try:
+        yield _active
+    finally:
+        _active = previous
@@ -0,0 +1,3 @@
+from .channels import Channel, EmailChannel, FileChannel, SNSChannel, WebhookChannel, channels_from_env
+from .dispatch import Notifier, alerts_from_frame, batches, last_alerted_rows
+from .state import AlertState
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import json
+import os
+import threading
+
+
+class Channel:
+    """
+    Where the alert messages go. send raises on failure (the Notifier retries), a message is at most max_bytes of
+    UTF-8 text, the Notifier splits the alerts to fit.
+    """
+    name = "channel"
+    max_bytes = 64 * 1024
+
+    def send(self, subject: str, text: str):
+        raise NotImplementedError
+
+
+class SNSChannel(Channel):
+    """The SNS topic (SMS/email subscriptions), the client is the shared storage.aws_client"""
+    name = "sns"
+    max_bytes = 256 * 1024 - 1024  # the SNS limit, minus the attributes
+
+    def __init__(self, topic_arn: str, client=None):
+        self.topic_arn = topic_arn
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from ..storage import aws_client
+            self._client = aws_client('sns')
+        return self._client
+
+    def send(self, subject: str, text: str):
+        response = self.client.publish(TopicArn=self.topic_arn, Message=text, Subject=subject[:100])
+        print(f"INFO: SENT SMS {response.get('MessageId')}")
+
+
+class EmailChannel(Channel):
+    """Plain text email with SES, sender must be a verified identity"""
+    name = "email"
+    max_bytes = 512 * 1024
+
+    def __init__(self, sender: str, recipients: list, client=None):
+        self.sender = sender
+        self.recipients = list(recipients)
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            from ..storage import aws_client
+            self._client = aws_client('ses')
+        return self._client
+
+    def send(self, subject: str, text: str):
+        self.client.send_email(Source=self.sender, Destination={'ToAddresses': self.recipients},
+                               Message={'Subject': {'Data': subject}, 'Body': {'Text': {'Data': text}}})
+
+
+class WebhookChannel(Channel):
+    """POST {"subject", "text"} as JSON (Slack/Teams/Discord style incoming webhooks), the session keeps the
+    connection open between batches"""
+    name = "webhook"
+    max_bytes = 32 * 1024
+
+    def __init__(self, url: str, session=None, timeout: float = 10):
+        self.url = url
+        self.timeout = timeout
+        self._session = session
+
+    @property
+    def session(self):
+        if self._session is None:
+            from ..stock_requests import make_session
+            self._session = make_session(pool_size=4, headers={'Content-Type': 'application/json'})
+        return self._session
+
+    def send(self, subject: str, text: str):
+        self.session.post(self.url, data=json.dumps({'subject': subject, 'text': text}),
+                          timeout=self.timeout).raise_for_status()
+
+
+class FileChannel(Channel):
+    """One JSON line per message in a local file, for the tests and the runs on a normal box"""
+    name = "file"
+
+    def __init__(self, path: str, max_bytes: int = 64 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def send(self, subject: str, text: str):
+        with self._lock, open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps({'subject': subject, 'text': text}) + "\n")
+
+    def read(self) -> list:
+        try:
+            with open(self.path, encoding="utf-8") as f:
+                return [json.loads(line) for line in f]
+        except FileNotFoundError:
+            return []
+
+
+def channels_from_env(topic_arn: str | None = None) -> list:
+    """
+    The configured channels: TOPIC_ARN (SNS), ALERT_EMAIL_FROM + ALERT_EMAIL_TO (comma separated, SES),
+    WEBHOOK_URL and ALERT_FILE
+    """
+    channels = []
+    topic_arn = topic_arn or os.getenv("TOPIC_ARN")
+    if topic_arn:
+        channels.append(SNSChannel(topic_arn))
+    if os.getenv("ALERT_EMAIL_FROM") and os.getenv("ALERT_EMAIL_TO"):
+        channels.append(EmailChannel(os.getenv("ALERT_EMAIL_FROM"),
+                                     [to.strip() for to in os.getenv("ALERT_EMAIL_TO").split(",") if to.strip()]))
+    if os.getenv("WEBHOOK_URL"):
+        channels.append(WebhookChannel(os.getenv("WEBHOOK_URL")))
+    if os.getenv("ALERT_FILE"):
+        channels.append(FileChannel(os.getenv("ALERT_FILE")))
+    return channels
@@ -0,0 +1,166 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from ..metrics import stage
+from ..stock_requests import Backoff
+
+
+def last_alerted_rows(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    The last alerted row (alert_types or alert_type set) of every stock in df, by stock. The alert is not always on
+    the last bar (a quiet forming bar, yesterday's alert), a stock without alert columns gives its last row.
+    """
+    if df is None or df.empty:
+        return df
+    df = df.reset_index(drop=True)
+    flagged = np.zeros(len(df), dtype=bool)
+    for column in ('alert_types', 'alert_type'):
+        if column in df:
+            flagged |= (df[column].astype(object).fillna('').astype(str).str.strip() != '').to_numpy()
+    # the alerted bars sort after the others, so the tail of a stock is its last alerted bar (else its last bar)
+    order = pd.DataFrame({'flagged': flagged, 'date': pd.to_datetime(df['date'])})
+    last = order.sort_values(['flagged', 'date'], kind='stable').groupby(df['stock'].astype(object),
+                                                                         sort=True).tail(1).index
+    return df.loc[last]
+
+
+def alerts_from_frame(df: pd.DataFrame | list) -> list:
+    """
+    (ticker, rule, bar ts, date, close) of the last alerted bar of every stock in df (panel.alert_rows, the
+    compute_pool rows or the Stock.df, with stock and date columns, or a list of such frames), one per rule in
+    alert_types
+    """
+    if isinstance(df, list):
+        return [alert for frame in df for alert in alerts_from_frame(frame)]
+    rows = last_alerted_rows(df)
+    if rows is None or rows.empty:
+        return []
+    empty = pd.Series('', index=rows.index)
+    alerts = []
+    for ticker, date, types, alert_type, close in zip(rows['stock'].to_numpy(), pd.to_datetime(rows['date']),
+                                                      rows.get('alert_types', empty).to_numpy(),
+                                                      rows.get('alert_type', empty).to_numpy(),
+                                                      rows['close'].to_numpy() if 'close' in rows else
+                                                      np.full(len(rows), np.nan)):
+        rules = [rule.strip() for rule in (types if isinstance(types, str) else '').split(',') if rule.strip()] or \
+            [alert_type if isinstance(alert_type, str) and alert_type else 'alert']
+        date = pd.Timestamp(date)
+        for rule in rules:
+            alerts.append((ticker, rule, int(date.timestamp()), str(date), float(close)))
+    return alerts
+
+
+def format_lines(alerts: list) -> list:
+    """One line per ticker and bar: 'AAPL 2024-05-01 00:00:00 close 187.3: MACD UP, RSI 30'"""
+    grouped = {}
+    for ticker, rule, ts, date, close in alerts:
+        grouped.setdefault((ticker, ts, date, close), []).append((rule, (ticker, rule, ts, date, close)))
+    return [(f"{ticker} {date} close {close:.4g}: {', '.join(rule for rule, _ in items)}",
+             [alert for _, alert in items])
+            for (ticker, ts, date, close), items in grouped.items()]
+
+
+def batches(alerts: list, max_bytes: int, header: str) -> list:
+    """
+    [(text, alerts)] with every text at most max_bytes of UTF-8: the header and as many whole lines as fit
+    (a line longer than a message is cut)
+    """
+    out = []
+    text, size, members = header, len(header.encode("utf-8")), []
+    for line, line_alerts in format_lines(alerts):
+        line_size = len(line.encode("utf-8")) + 1
+        if members and size + line_size > max_bytes:
+            out.append((text, members))
+            text, size, members = header, len(header.encode("utf-8")), []
+        if size + line_size > max_bytes:
+            line = line.encode("utf-8")[:max(max_bytes - size - 1, 0)].decode("utf-8", "ignore")
+        text += "\n" + line
+        size += len(line.encode("utf-8")) + 1
+        members.extend(line_alerts)
+    if members:
+        out.append((text, members))
+    return out
+
+
+class Notifier:
+    """
+    Sends the alerts to the channels without duplicates: the ones already in the AlertState are skipped (per
+    channel), the others are coalesced in as few messages as fit the channel size and sent in threads with retries
+    (exponential backoff), so the run goes on (e.g. saving to S3) while they are sent. What fails after the retries
+    stays pending and is sent by the next run.
+        notifier = Notifier(channels_from_env(), state)
+        notifier.submit(alerts_from_frame(df))
+        ...
+        report = notifier.wait()
+    """
+
+    def __init__(self, channels: list, state=None, max_workers: int = 4, backoff: Backoff | None = None,
+                 sleep=time.sleep):
+        self.channels = list(channels)
+        self.state = state
+        self.backoff = backoff or Backoff(retries=3, base=0.5, cap=4.0)
+        self.sleep = sleep
+        self.max_workers = max_workers
+        self._executor = None
+        self._futures = []
+        self._lock = threading.Lock()  # the report is updated by the sending threads
+        self.report = {channel.name: {'sent': 0, 'messages': 0, 'failed': 0, 'duplicates': 0}
+                       for channel in self.channels}
+
+    def submit(self, alerts: list, subject: str = "Stock alerts", when: datetime | None = None) -> int:
+        """Queue the messages of the new alerts, returns how many messages"""
+        header = f"At {when or datetime.now()} have the following:"
+        queued = 0
+        for channel in self.channels:
+            pending = self.state.pending(alerts, channel.name) if self.state is not None else alerts
+            self.report[channel.name]['duplicates'] += len(alerts) - len(pending)
+            for text, members in batches(pending, channel.max_bytes, header):
+                if self._executor is None:
+                    self._executor = ThreadPoolExecutor(max_workers=self.max_workers,
+                                                        thread_name_prefix="notify")
+                self._futures.append(self._executor.submit(self._send, channel, subject, text, members))
+                queued += 1
+        return queued
+
+    def _send(self, channel, subject: str, text: str, alerts: list) -> bool:
+        for attempt in range(self.backoff.retries + 1):
+            if attempt:
+                self.sleep(self.backoff.delay(attempt - 1))
+            try:
+                with stage('notify', channel=channel.name):
+                    channel.send(subject, text)
+            except Exception as e:
+                print(f"ERROR sending {len(alerts)} alerts to {channel.name} (attempt {attempt + 1}) due to {e}")
+                continue
+            if self.state is not None:
+                self.state.mark(alerts, channel.name)
+            with self._lock:
+                self.report[channel.name]['sent'] += len(alerts)
+                self.report[channel.name]['messages'] += 1
+            return True
+        with self._lock:
+            self.report[channel.name]['failed'] += len(alerts)
+        return False
+
+    def wait(self, timeout: float | None = None) -> dict:
+        """Wait for the queued messages and save the state, {channel: {sent, messages, failed, duplicates}}"""
+        if self._futures:
+            wait(self._futures, timeout=timeout)
+            self._futures = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+        if self.state is not None:
+            self.state.save()
+        return self.report
+
+    def notify(self, alerts: list, **kwargs) -> dict:
+        self.submit(alerts, **kwargs)
+        return self.wait()
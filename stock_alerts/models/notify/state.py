@@ -0,0 +1,70 @@
+from __future__ import annotations
+
+import json
+import threading
+import time
+
+DAY = 24 * 60 * 60
+
+
+def alert_key(alert: tuple) -> str:
+    """(ticker, rule, bar ts, ...) -> 'ticker|rule|ts', the key of the state"""
+    ticker, rule, ts = alert[:3]
+    return f"{ticker}|{rule}|{ts}"
+
+
+class AlertState:
+    """
+    The alerts already delivered, {(ticker, rule, bar ts): {channel: sent time}}, as one JSON file in a storage
+    backend (local folder or S3), so a second run on the same bar sends nothing. Each channel is tracked on its own:
+    a failed webhook is sent again next run without sending the SNS message twice.
+    Entries older than keep_days (by sent time) are dropped when saving. Thread safe, the channels send in threads.
+    """
+
+    def __init__(self, backend, key: str = "alerts/_sent.json", keep_days: float = 14, clock=time.time):
+        self.backend = backend
+        self.key = key
+        self.keep_days = keep_days
+        self.clock = clock
+        self._sent = None  # read on first use
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> AlertState:
+        """s3://bucket/prefix or a local folder, the state is <prefix>/_sent.json"""
+        from ..storage import backend_from_url
+        return cls(backend_from_url(url), key="_sent.json", **kwargs)
+
+    def _load(self) -> dict:
+        if self._sent is None:
+            data = self.backend.read_bytes(self.key)
+            self._sent = json.loads(data) if data else {}
+        return self._sent
+
+    def pending(self, alerts: list, channel: str) -> list:
+        """The alerts not delivered to channel yet"""
+        with self._lock:
+            sent = self._load()
+            return [alert for alert in alerts if channel not in sent.get(alert_key(alert), {})]
+
+    def mark(self, alerts: list, channel: str):
+        now = self.clock()
+        with self._lock:
+            sent = self._load()
+            for alert in alerts:
+                sent.setdefault(alert_key(alert), {})[channel] = now
+
+    def save(self):
+        with self._lock:
+            if self._sent is None:
+                return
+            oldest = self.clock() - self.keep_days * DAY
+            self._sent = {key: channels for key, channels in self._sent.items() if max(channels.values()) >= oldest}
+            self.backend.write_bytes(self.key, json.dumps(self._sent, sort_keys=True).encode("utf-8"))
+
+    def __len__(self):
+        with self._lock:
+            return len(self._load())
+
+    def __repr__(self):
+        return f"AlertState({self.backend}, {self.key})"
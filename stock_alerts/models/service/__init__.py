@@ -0,0 +1,2 @@
+from .feeds import BarBuilder, FeedAdapter, FileReplayFeed, QueueFeed
+from .service import AlertService, ServiceStats
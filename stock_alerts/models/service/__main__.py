@@ -0,0 +1,39 @@
+"""
+The alert service on a replayed file, from the stock_alerts folder:
+    python -m models.service bars.csv --speed 60 --tickers aapl.us msft.us
+The alerts are sent to TOPIC_ARN when it is set, else printed.
+"""
+import argparse
+import asyncio
+import json
+import os
+
+from ..stocks.alerts import rules_from_event
+from .feeds import FileReplayFeed
+from .service import AlertService
+
+
+def publish(alerts: list):
+    from ..storage import aws_client
+    aws_client('sns').publish(TopicArn=os.environ["TOPIC_ARN"],
+                              Message=f"Alerts: {[{alert['stock']: alert['alert_types']} for alert in alerts]}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("path", help="csv/parquet/jsonl of bars or ticks")
+    parser.add_argument("--speed", type=float, default=0, help="0 as fast as possible, 1 real time")
+    parser.add_argument("--granularity", default="1m", help="bar size when the file has ticks")
+    parser.add_argument("--tickers", nargs="*")
+    parser.add_argument("--rules", help="alert_rules as in the Lambda event (json)")
+    parser.add_argument("--stats-every", type=float, default=10)
+    args = parser.parse_args()
+
+    service = AlertService(FileReplayFeed(args.path, args.speed, args.granularity),
+                           rules=rules_from_event(json.loads(args.rules)) if args.rules else None,
+                           notify=publish if os.getenv("TOPIC_ARN") else None, stats_every=args.stats_every)
+    print(f"INFO: {asyncio.run(service.run(args.tickers))}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+from __future__ import annotations
+
+import asyncio
+import time
+
+import pandas as pd
+
+from ..stocks.intraday import bar_seconds
+
+PRICES = ('open', 'high', 'low', 'close', 'volume')
+
+
+class FeedAdapter:
+    """
+    Where the bars come from. subscribe() the tickers, then `async for bars in feed` gives lists of closed bars
+    {'stock', 'timestamp', 'open', 'high', 'low', 'close', 'volume'} (the bars that closed together, e.g. all the
+    tickers of one minute). An adapter for a websocket/broker feed only has to implement these.
+    """
+
+    def __init__(self):
+        self.tickers = None  # None is all the tickers of the feed
+
+    async def subscribe(self, tickers):
+        self.tickers = set(tickers)
+
+    def wants(self, stock: str) -> bool:
+        return self.tickers is None or stock in self.tickers
+
+    def __aiter__(self):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+
+class BarBuilder:
+    """
+    Ticks (stock, timestamp, price, size) to closed bars of one granularity. A bar is closed by the first tick of the
+    next bar or by flush(now) when its time is over and no tick came.
+    """
+
+    def __init__(self, granularity: str = "1m"):
+        self.seconds = bar_seconds(granularity)
+        self.bars = {}  # stock -> the forming bar
+
+    def add(self, stock: str, timestamp: float, price: float, size: float = 0.0) -> dict | None:
+        """Returns the bar this tick closed, if any"""
+        start = int(timestamp // self.seconds * self.seconds)
+        bar = self.bars.get(stock)
+        if bar is not None and bar['timestamp'] == start:
+            bar['high'] = max(bar['high'], price)
+            bar['low'] = min(bar['low'], price)
+            bar['close'] = price
+            bar['volume'] += size
+            return None
+        if bar is not None and start < bar['timestamp']:  # late tick of a closed bar
+            return None
+        self.bars[stock] = {'stock': stock, 'timestamp': start, 'open': price, 'high': price, 'low': price,
+                            'close': price, 'volume': size}
+        return bar
+
+    def flush(self, now: float) -> list:
+        """The forming bars whose time is over at `now`"""
+        closed = [bar for bar in self.bars.values() if bar['timestamp'] + self.seconds <= now]
+        for bar in closed:
+            del self.bars[bar['stock']]
+        return closed
+
+
+class QueueFeed(FeedAdapter):
+    """Bars pushed by another task (put), e.g. a callback based client. close() ends the iteration."""
+
+    _END = object()
+
+    def __init__(self, maxsize: int = 0):
+        super().__init__()
+        self.queue = asyncio.Queue(maxsize)
+
+    async def put(self, bars: list):
+        await self.queue.put(bars)
+
+    async def close(self):
+        await self.queue.put(self._END)
+
+    async def __aiter__(self):
+        while True:
+            bars = await self.queue.get()
+            if bars is self._END:
+                return
+            bars = [bar for bar in bars if self.wants(bar['stock'])]
+            if bars:
+                yield bars
+
+
+class FileReplayFeed(FeedAdapter):
+    """
+    Replays a csv/parquet/json lines file of bars (stock, timestamp, open, high, low, close, volume) or of ticks
+    (stock, timestamp, price, size), in timestamp order, the rows with the same timestamp come as one list.
+    :param speed: 0 as fast as possible, 1 in real time, 60 one minute of the file per second...
+    :param granularity: The bar size when the file has ticks
+    """
+
+    def __init__(self, path: str, speed: float = 0.0, granularity: str = "1m"):
+        super().__init__()
+        self.path = path
+        self.speed = speed
+        self.granularity = granularity
+
+    def _read(self) -> pd.DataFrame:
+        if self.path.endswith(".parquet"):
+            df = pd.read_parquet(self.path)
+        elif self.path.endswith((".json", ".jsonl")):
+            df = pd.read_json(self.path, lines=True)
+        else:
+            df = pd.read_csv(self.path)
+        if self.tickers is not None:
+            df = df[df['stock'].isin(self.tickers)]
+        return df.sort_values('timestamp', kind='stable')
+
+    async def __aiter__(self):
+        df = self._read()
+        ticks = 'price' in df.columns
+        builder = BarBuilder(self.granularity) if ticks else None
+        columns = [column for column in (['stock', 'timestamp', 'price', 'size'] if ticks else
+                                         ['stock', 'timestamp', *PRICES]) if column in df.columns]
+        start, first, bucket = time.monotonic(), None, None
+        for timestamp, group in df.groupby('timestamp', sort=False):
+            if self.speed:
+                first = timestamp if first is None else first
+                delay = (timestamp - first) / self.speed - (time.monotonic() - start)
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            rows = group[columns].to_dict('records')
+            if ticks:
+                # the bars of the tickers without a tick in the new bar time are closed by the clock
+                bars = builder.flush(timestamp) if timestamp // builder.seconds != bucket else []
+                bucket = timestamp // builder.seconds
+                bars += [bar for bar in (builder.add(row['stock'], row['timestamp'], row['price'], row.get('size', 0))
+                                         for row in rows) if bar is not None]
+            else:
+                bars = rows
+            if bars:
+                yield bars
+            await asyncio.sleep(0)  # let the notifications run
+        if ticks:
+            bars = builder.flush(float('inf'))
+            if bars:
+                yield bars
+
+    def __repr__(self):
+        return f"FileReplayFeed({self.path}, speed={self.speed})"
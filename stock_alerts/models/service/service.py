@@ -0,0 +1,182 @@
+from __future__ import annotations
+
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Callable
+
+import numpy as np
+
+from ..stocks.alerts import AlertPlan
+from ..stocks.streaming import IndicatorStream
+from .feeds import PRICES, FeedAdapter
+
+nan = math.nan
+
+
+class ServiceStats:
+    """Throughput and latency counters, the latency is from a list of bars received to its alerts dispatched"""
+
+    def __init__(self, window: int = 10_000):
+        self.started = time.monotonic()
+        self.bars = 0
+        self.batches = 0
+        self.alerts = 0
+        self.errors = 0
+        self.latencies = deque(maxlen=window)  # seconds, of the last `window` batches
+        self.max_latency = 0.0
+
+    def record(self, bars: int, alerts: int, latency: float):
+        self.bars += bars
+        self.batches += 1
+        self.alerts += alerts
+        self.latencies.append(latency)
+        self.max_latency = max(self.max_latency, latency)
+
+    def snapshot(self) -> dict:
+        elapsed = time.monotonic() - self.started
+        latencies = np.array(self.latencies) * 1000 if self.latencies else np.zeros(1)
+        return {"bars": self.bars, "batches": self.batches, "alerts": self.alerts, "errors": self.errors,
+                "bars_per_second": round(self.bars / elapsed, 1) if elapsed else 0.0,
+                "latency_ms": {"p50": round(float(np.percentile(latencies, 50)), 3),
+                               "p99": round(float(np.percentile(latencies, 99)), 3),
+                               "max": round(self.max_latency * 1000, 3)}}
+
+
+class TickerState:
+    """The indicators of one ticker and its last bars of the columns the rules look at"""
+
+    __slots__ = ("stream", "rows", "timestamp")
+
+    def __init__(self, stream: IndicatorStream, window: int):
+        self.stream = stream
+        self.rows = deque(maxlen=window)
+        self.timestamp = None
+
+
+class AlertService:
+    """
+    Long running alerts. The bars of a FeedAdapter advance the IndicatorStream of their ticker (O(1) per bar) and
+    the alert rules are evaluated for the bars that closed together in one numpy pass over (tickers x lookback)
+    arrays, the same rules as Stock.add_alerts.
+    The alerts go to notify(alerts) without waiting for it: a coroutine function runs as a task, a plain function
+    (e.g. an SNS publish) in the default executor.
+    """
+
+    def __init__(self, feed: FeedAdapter, rules: list | None = None, notify: Callable | None = None,
+                 stream_options: dict | None = None, stats_every: float = 0):
+        """
+        :param stream_options: IndicatorStream parameters
+        :param stats_every: Print the counters every that many seconds, 0 never
+        """
+        self.feed = feed
+        self.plan = AlertPlan(rules)
+        self.notify = notify or _print_alerts
+        self.stream_options = stream_options or {}
+        self.stats_every = stats_every
+        self.tickers = {}
+        produced = IndicatorStream(**self.stream_options).update({'high': nan, 'low': nan, 'close': nan})
+        self.columns = sorted(self.plan.columns & (set(PRICES) | set(produced)))
+        self.window = self.plan.lookback + 1
+        self.stats = ServiceStats()
+        self._pending = set()
+
+    def state(self, stock: str) -> TickerState:
+        state = self.tickers.get(stock)
+        if state is None:
+            state = self.tickers[stock] = TickerState(IndicatorStream(**self.stream_options), self.window)
+        return state
+
+    def warm_up(self, stock: str, df):
+        """Run the history of a ticker (a Stock.df or any frame with lower case prices) through it, no alerts"""
+        state = self.state(stock)
+        for bar in df[[column for column in PRICES if column in df.columns]].to_dict('records'):
+            self._advance(state, bar)
+
+    def _advance(self, state: TickerState, bar: dict):
+        values = {**bar, **state.stream.update(bar)}
+        state.rows.append(tuple(values.get(column, nan) for column in self.columns))
+
+    def process(self, bars: list) -> list:
+        """
+        Advance the tickers with these closed bars and evaluate the rules on them.
+        :return: the alerts [{'stock', 'timestamp', 'close', 'alert_type', 'alert_types'}, ...]
+        """
+        updated = []
+        for bar in bars:
+            state = self.state(bar['stock'])
+            if state.timestamp is not None and bar['timestamp'] <= state.timestamp:
+                continue  # sent again or late, the indicators already moved on
+            self._advance(state, bar)
+            state.timestamp = bar['timestamp']
+            updated.append((bar, state))
+        if not updated or not self.columns:
+            return []
+
+        window = np.full((len(updated), self.window, len(self.columns)), nan)
+        for i, (_, state) in enumerate(updated):
+            window[i, self.window - len(state.rows):] = state.rows
+        masks = self.plan.evaluate({column: window[:, :, j] for j, column in enumerate(self.columns)})
+        last = {name: mask[:, -1] for name, mask in masks.items()}
+        codes = self.plan.codes(last, (len(updated),))
+        codes[np.isnan(window[:, -1]).any(axis=1)] = 0  # like the dropna of add_alerts, not before the warm up
+
+        alerts = []
+        for i in np.flatnonzero(codes):
+            bar = updated[i][0]
+            alerts.append({'stock': bar['stock'], 'timestamp': bar['timestamp'], 'close': bar['close'],
+                           'alert_type': self.plan.names[codes[i] - 1],
+                           'alert_types': ', '.join(name for name, mask in last.items() if mask[i])})
+        return alerts
+
+    async def run(self, tickers: list | None = None) -> dict:
+        """
+        Consume the feed until it ends (or the task is cancelled), the pending notifications are awaited.
+        :return: the stats snapshot
+        """
+        if tickers is not None:
+            await self.feed.subscribe(tickers)
+        printed = time.monotonic()
+        try:
+            async for bars in self.feed:
+                received = time.perf_counter()
+                try:
+                    alerts = self.process(bars)
+                except Exception as e:
+                    print(f"ERROR processing {len(bars)} bars due to {e}")
+                    self.stats.errors += 1
+                    continue
+                if alerts:
+                    self._dispatch(alerts)
+                self.stats.record(len(bars), len(alerts), time.perf_counter() - received)
+                if self.stats_every and time.monotonic() - printed >= self.stats_every:
+                    printed = time.monotonic()
+                    print(f"INFO: {len(self.tickers)} tickers {self.stats.snapshot()}")
+        finally:
+            if self._pending:
+                await asyncio.gather(*self._pending, return_exceptions=True)
+            await self.feed.close()
+        return self.stats.snapshot()
+
+    def _dispatch(self, alerts: list):
+        loop = asyncio.get_running_loop()
+        if asyncio.iscoroutinefunction(self.notify):
+            task = loop.create_task(self.notify(alerts))
+        else:
+            task = asyncio.ensure_future(loop.run_in_executor(None, self.notify, alerts))
+        self._pending.add(task)
+        task.add_done_callback(self._notified)
+
+    def _notified(self, task: asyncio.Future):
+        self._pending.discard(task)
+        if not task.cancelled() and task.exception() is not None:
+            self.stats.errors += 1
+            print(f"ERROR notifying due to {task.exception()}")
+
+    def __repr__(self):
+        return f"AlertService({self.feed}, {len(self.tickers)} tickers)"
+
+
+def _print_alerts(alerts: list):
+    print(f"ALERTS {[{alert['stock']: alert['alert_types']} for alert in alerts]}")
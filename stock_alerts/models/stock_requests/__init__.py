@@ -1 +1,3 @@
-from .stooq import download_stooq
+from .pool import RateLimiter, download_concurrently, make_limiters
+from .session import Backoff, CircuitBreaker, DownloadError, FetchResult, HttpClient, make_session
+from .stooq import STOOQ_INTERVALS, download_stooq, fetch_stooq, stooq_client
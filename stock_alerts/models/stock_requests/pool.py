@@ -0,0 +1,74 @@
+from __future__ import annotations
+
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Callable, Iterable, Iterator
+
+
+class RateLimiter:
+    """
+    Thread safe limiter for one data source (yfinance, stooq...).
+    It spaces the calls so that at most `rate` requests per second go out, no matter how many workers are waiting.
+    A rate of None/0 means no limit.
+    """
+
+    def __init__(self, rate: float | None = None):
+        self.interval = 1.0 / rate if rate else 0.0
+        self._lock = threading.Lock()
+        self._next_time = 0.0
+
+    def wait(self):
+        """Block until the next request for this source is allowed"""
+        if not self.interval:
+            return
+        with self._lock:
+            now = time.monotonic()
+            sleep_for = self._next_time - now
+            self._next_time = max(now, self._next_time) + self.interval
+        if sleep_for > 0:
+            time.sleep(sleep_for)
+
+
+def make_limiters(rate_limits: dict | None = None) -> dict:
+    """
+    Build one RateLimiter per source from a dict like {"yfinance": 5, "stooq": 2} (requests per second).
+    """
+    return {source: RateLimiter(rate) for source, rate in (rate_limits or {}).items()}
+
+
+def download_concurrently(stock_list: Iterable, download: Callable, max_workers: int = 8) -> Iterator[tuple]:
+    """
+    Runs download(stock) for every stock in a bounded thread pool and yields (stock, data) in completion order,
+    so the caller can start computing while the other downloads are still in flight.
+    At most max_workers downloads are running and only a few more are queued, a long watchlist is submitted as the
+    workers free up. Failed downloads are printed and skipped, the same as the sequential yield_stocks.
+    """
+    max_workers = max(1, int(max_workers))
+    stocks_iter = iter(stock_list)
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="download") as executor:
+        in_flight = {}
+
+        def submit_next() -> bool:
+            try:
+                stock = next(stocks_iter)
+            except StopIteration:
+                return False
+            in_flight[executor.submit(download, stock)] = stock
+            return True
+
+        for _ in range(max_workers * 2):
+            if not submit_next():
+                break
+
+        while in_flight:
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                stock = in_flight.pop(future)
+                submit_next()
+                try:
+                    data = future.result()
+                except Exception as e:
+                    print(f"ERROR downloading {stock} due to {e}")
+                    continue
+                yield stock, data
@@ -0,0 +1,181 @@
+from __future__ import annotations
+
+import random
+import threading
+import time
+from typing import Callable
+
+import requests
+from requests.adapters import HTTPAdapter
+
+HEADERS = {
+    'Connection': 'keep-alive',
+    'Pragma': 'no-cache',
+    'Cache-Control': 'no-cache',
+    'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.131 Safari/537.36',
+    'Accept': '',
+    'Sec-Fetch-Site': 'same-site',
+    'Sec-Fetch-Mode': 'cors',
+    'Sec-Fetch-Dest': 'empty',
+    'Accept-Language': 'en-US'
+}
+
+
+def make_session(pool_size: int = 16, headers: dict | None = None) -> requests.Session:
+    """
+    Session with keep-alive connections, pool_size is how many connections per host are kept open
+    (as many as the download workers). The retries are done by HttpClient, not by urllib3.
+    """
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=4, pool_maxsize=pool_size, max_retries=0)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    session.headers.update(HEADERS if headers is None else headers)
+    return session
+
+
+class Backoff:
+    """
+    Exponential backoff with full jitter: the n-th retry waits random(0, min(cap, base * 2 ** n)) seconds,
+    so many workers failing together don't come back together.
+    """
+
+    def __init__(self, retries: int = 3, base: float = 0.5, cap: float = 8.0, rng: random.Random | None = None):
+        self.retries = retries
+        self.base = base
+        self.cap = cap
+        self.rng = rng or random.Random()
+
+    def delay(self, attempt: int) -> float:
+        return self.rng.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+
+class CircuitBreaker:
+    """
+    Stops calling a source that keeps failing. After `threshold` failures in a row the circuit opens and the calls
+    are refused for `reset_after` seconds, then one trial call is let through (half open): success closes it,
+    failure opens it again. Thread safe, one breaker is shared by all the download workers.
+    """
+
+    def __init__(self, threshold: int = 5, reset_after: float = 30.0, clock: Callable = time.monotonic):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.clock = clock
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if self.clock() - self.opened_at >= self.reset_after else "open"
+
+    def allow(self) -> bool:
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return True
+            return False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            if self._trial or self.failures >= self.threshold:
+                self.opened_at = self.clock()
+            self._trial = False
+
+
+class FetchResult:
+    """
+    Outcome of a request, no exceptions and no None: check `ok`, else `error` is one of
+    timeout, connection, http, circuit_open, parse, interval
+    """
+
+    def __init__(self, url: str, text: str | None = None, status: int | None = None, error: str | None = None,
+                 message: str = "", attempts: int = 0, elapsed: float = 0.0):
+        self.url = url
+        self.text = text
+        self.data = None  # parsed text, e.g. the DataFrame of fetch_stooq
+        self.status = status
+        self.error = error
+        self.message = message
+        self.attempts = attempts
+        self.elapsed = elapsed
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    def __repr__(self):
+        outcome = f"status={self.status}" if self.ok else f"error={self.error} {self.message}"
+        return f"FetchResult({self.url}, {outcome}, attempts={self.attempts})"
+
+
+class DownloadError(Exception):
+    """Raised by the callers that need the data, result is the failed FetchResult"""
+
+    def __init__(self, result: FetchResult):
+        super().__init__(repr(result))
+        self.result = result
+
+
+def _server_error(status: int | None) -> bool:
+    return status is not None and status >= 500
+
+
+class HttpClient:
+    """
+    Shared pooled session + retries with backoff for timeouts, connection errors and 5xx + circuit breaker.
+    4xx answers are not retried, asking again won't help.
+    """
+
+    def __init__(self, session: requests.Session | None = None, backoff: Backoff | None = None,
+                 breaker: CircuitBreaker | None = None, timeout: float = 30, sleep: Callable = time.sleep):
+        self.session = session or make_session()
+        self.backoff = backoff or Backoff()
+        self.breaker = breaker or CircuitBreaker()
+        self.timeout = timeout
+        self.sleep = sleep
+
+    def get(self, url: str, timeout: float | None = None) -> FetchResult:
+        timeout = self.timeout if timeout is None else timeout
+        start = time.perf_counter()
+        for attempt in range(self.backoff.retries + 1):
+            if attempt and self.breaker.state != "open":  # open: no backoff wait, allow() fails fast below
+                self.sleep(self.backoff.delay(attempt - 1))
+            if not self.breaker.allow():
+                return FetchResult(url, error="circuit_open", message="too many failures, not calling for now",
+                                   attempts=attempt, elapsed=time.perf_counter() - start)
+            result = self._get_once(url, timeout)
+            result.attempts = attempt + 1
+            if result.ok or result.error == "http" and not _server_error(result.status):
+                # the host answered, a 404 is our problem, not an outage
+                self.breaker.record_success()
+                break
+            self.breaker.record_failure()
+        result.elapsed = time.perf_counter() - start
+        return result
+
+    def _get_once(self, url: str, timeout: float) -> FetchResult:
+        try:
+            response = self.session.get(url, timeout=timeout)
+            response.raise_for_status()
+        except requests.exceptions.Timeout:
+            return FetchResult(url, error="timeout", message=f"timed out after {timeout}s")
+        except requests.exceptions.HTTPError as e:
+            status = e.response.status_code if e.response is not None else None
+            return FetchResult(url, status=status, error="http", message=str(e))
+        except requests.exceptions.RequestException as e:
+            return FetchResult(url, error="connection", message=str(e))
+        return FetchResult(url, text=response.text, status=response.status_code)
@@ -1,41 +1,59 @@
+from __future__ import annotations
+
+import threading
 from datetime import datetime, timedelta
 from io import StringIO
 
 import pandas as pd
-import requests
 
+from .session import FetchResult, HttpClient
 
-def download_stooq(stock: str, start_date: str = None, end_date: str = None,
-                   timeout_seconds: int = 30) -> pd.DataFrame:
+STOOQ_URL = "https://stooq.com/q/d/l/"
+STOOQ_INTERVALS = {"1d": "d", "1wk": "w", "1mo": "m"}  # the csv download has no intraday bars
+_client = None
+_client_lock = threading.Lock()
+
+
+def stooq_client() -> HttpClient:
+    """The client shared by all the stooq downloads (one connection pool and one circuit breaker)"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            _client = HttpClient()
+        return _client
+
+
+def fetch_stooq(stock: str, start_date: datetime = None, end_date: datetime = None, timeout_seconds: int = 30,
+                base_url: str = STOOQ_URL, client: HttpClient | None = None, interval: str = "1d") -> FetchResult:
     """
-    Stock data with timeout in seconds
+    Stock data from stooq, result.data is the DataFrame when result.ok
+    :param interval: 1d, 1wk or 1mo, other intervals fail with error "interval"
     """
     end_date = datetime.today() if end_date is None else end_date
     start_date = end_date - timedelta(days=2 * 365) if start_date is None else start_date
-    link = f'https://stooq.com/q/d/l/?s={stock}&d1={start_date.strftime("%Y%m%d")}&d2={end_date.strftime("%Y%m%d")}&i=d'
-
-    headers = {
-        'Connection': 'keep-alive',
-        'Pragma': 'no-cache',
-        'Cache-Control': 'no-cache',
-        'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/92.0.4515.131 Safari/537.36',
-        'Accept': '',
-        'Sec-Fetch-Site': 'same-site',
-        'Sec-Fetch-Mode': 'cors',
-        'Sec-Fetch-Dest': 'empty',
-        'Accept-Language': 'en-US'
-    }
-
-    try:
-        response = requests.get(link, headers=headers, timeout=timeout_seconds)
-        response.raise_for_status()
-        return pd.read_csv(StringIO(response.text))
-    except requests.exceptions.Timeout:
-        print(f"Request timed out after {timeout_seconds}")
-    except requests.exceptions.HTTPError as e:
-        print(f"HTTP error occured: {e}")
-    except Exception as e:
-        print(f"Request link error: {e}")
+    link = f'{base_url}?s={stock}&d1={start_date.strftime("%Y%m%d")}&d2={end_date.strftime("%Y%m%d")}'
+    if interval not in STOOQ_INTERVALS:
+        return FetchResult(link, error="interval", message=f"stooq has no {interval} bars")
+    link += f'&i={STOOQ_INTERVALS[interval]}'
+
+    result = (client or stooq_client()).get(link, timeout=timeout_seconds)
+    if result.ok:
+        try:
+            result.data = pd.read_csv(StringIO(result.text))
+        except Exception as e:
+            result.error, result.message = "parse", str(e)
+    return result
+
+
+def download_stooq(stock: str, start_date: str = None, end_date: str = None,
+                   timeout_seconds: int = 30, base_url: str = STOOQ_URL) -> pd.DataFrame | None:
+    """
+    Stock data with timeout in seconds, None when it fails (fetch_stooq says why)
+    """
+    result = fetch_stooq(stock, start_date, end_date, timeout_seconds, base_url)
+    if not result.ok:
+        print(f"ERROR stooq {stock}: {result.error} {result.message}")
+    return result.data
 
 
 if __name__ == "__main__":
@@ -0,0 +1,409 @@
+from __future__ import annotations
+
+import operator
+
+import numpy as np
+
+nan = np.nan
+
+
+class Expr:
+    """
+    Node of an alert condition. Conditions are built with col(), the helpers below and the usual operators
+    (> < >= <= == != & | ~) and evaluated on {column: numpy array} (time on the last axis).
+    Every node has a key, nodes with the same key are computed only once per evaluation (e.g. a shifted column used
+    by several rules).
+    """
+    key: tuple = ()
+
+    def columns(self) -> set:
+        return set()
+
+    def lookback(self) -> int:
+        """How many previous bars are needed to evaluate the last one"""
+        return max((child.lookback() for child in self.children()), default=0)
+
+    def children(self) -> tuple:
+        return ()
+
+    def compute(self, ctx: EvalContext):
+        raise NotImplementedError
+
+    def shift(self, periods: int = 1) -> Expr:
+        return Shift(self, periods)
+
+    def _compare(self, other, op: str) -> Expr:
+        return Compare(op, self, _wrap(other))
+
+    def __gt__(self, other):
+        return self._compare(other, 'gt')
+
+    def __lt__(self, other):
+        return self._compare(other, 'lt')
+
+    def __ge__(self, other):
+        return self._compare(other, 'ge')
+
+    def __le__(self, other):
+        return self._compare(other, 'le')
+
+    def __eq__(self, other):
+        return self._compare(other, 'eq')
+
+    def __ne__(self, other):
+        return self._compare(other, 'ne')
+
+    def __and__(self, other):
+        return Logical('and', (self, _wrap(other)))
+
+    def __or__(self, other):
+        return Logical('or', (self, _wrap(other)))
+
+    def __invert__(self):
+        return Logical('not', (self,))
+
+    __hash__ = object.__hash__
+
+    def __repr__(self):
+        return f"{type(self).__name__}{self.key}"
+
+
+class Col(Expr):
+    def __init__(self, name: str):
+        self.name = name
+        self.key = ('col', name)
+
+    def columns(self) -> set:
+        return {self.name}
+
+    def compute(self, ctx: EvalContext):
+        return ctx.column(self.name)
+
+
+class Const(Expr):
+    def __init__(self, value):
+        self.value = value
+        self.key = ('const', value)
+
+    def compute(self, ctx: EvalContext):
+        return self.value
+
+
+class Shift(Expr):
+    def __init__(self, expr: Expr, periods: int = 1):
+        self.expr, self.periods = expr, periods
+        self.key = ('shift', expr.key, periods)
+
+    def columns(self) -> set:
+        return self.expr.columns()
+
+    def lookback(self) -> int:
+        return self.expr.lookback() + abs(self.periods)
+
+    def compute(self, ctx: EvalContext):
+        values = np.asarray(ctx.evaluate(self.expr), dtype='float64')
+        out = np.full_like(values, nan)
+        if self.periods > 0:
+            out[..., self.periods:] = values[..., :-self.periods]
+        else:
+            out[..., :self.periods] = values[..., -self.periods:]
+        return out
+
+
+class Compare(Expr):
+    OPS = {'gt': operator.gt, 'lt': operator.lt, 'ge': operator.ge, 'le': operator.le, 'eq': operator.eq,
+           'ne': operator.ne}
+
+    def __init__(self, op: str, left: Expr, right: Expr):
+        self.op, self.left, self.right = op, left, right
+        self.key = ('cmp', op, left.key, right.key)
+
+    def columns(self) -> set:
+        return self.left.columns() | self.right.columns()
+
+    def children(self) -> tuple:
+        return self.left, self.right
+
+    def compute(self, ctx: EvalContext):
+        with np.errstate(invalid='ignore'):
+            return self.OPS[self.op](ctx.evaluate(self.left), ctx.evaluate(self.right))
+
+
+class Logical(Expr):
+    def __init__(self, op: str, exprs: tuple):
+        self.op, self.exprs = op, tuple(exprs)
+        self.key = ('logic', op) + tuple(expr.key for expr in self.exprs)
+
+    def columns(self) -> set:
+        return set().union(*(expr.columns() for expr in self.exprs))
+
+    def children(self) -> tuple:
+        return self.exprs
+
+    def compute(self, ctx: EvalContext):
+        values = [ctx.evaluate(expr) for expr in self.exprs]
+        if self.op == 'not':
+            return ~values[0]
+        reduce = np.logical_and if self.op == 'and' else np.logical_or
+        result = values[0]
+        for value in values[1:]:
+            result = reduce(result, value)
+        return result
+
+
+class MinOf(Expr):
+    """Row minimum skipping NaN, like df[[...]].min(axis=1)"""
+
+    def __init__(self, exprs: tuple):
+        self.exprs = tuple(exprs)
+        self.key = ('min',) + tuple(expr.key for expr in self.exprs)
+
+    def columns(self) -> set:
+        return set().union(*(expr.columns() for expr in self.exprs))
+
+    def children(self) -> tuple:
+        return self.exprs
+
+    def compute(self, ctx: EvalContext):
+        values = [ctx.evaluate(expr) for expr in self.exprs]
+        result = values[0]
+        for value in values[1:]:
+            result = np.fmin(result, value)
+        return result
+
+
+def _wrap(value) -> Expr:
+    return value if isinstance(value, Expr) else Const(value)
+
+
+# Helpers for writing rules
+def col(name: str) -> Col:
+    return Col(name)
+
+
+def _as_expr(value) -> Expr:
+    """a string is a column, a number a constant"""
+    return col(value) if isinstance(value, str) else _wrap(value)
+
+
+def _previous(expr: Expr) -> Expr:
+    return expr if isinstance(expr, Const) else expr.shift(1)
+
+
+def crosses_above(expr: Expr | str, level) -> Expr:
+    """expr goes over level (number or column) on this bar"""
+    expr, level = _as_expr(expr), _as_expr(level)
+    return (expr > level) & (_previous(expr) < _previous(level))
+
+
+def crosses_below(expr: Expr | str, level) -> Expr:
+    """expr goes under level (number or column) on this bar"""
+    expr, level = _as_expr(expr), _as_expr(level)
+    return (expr < level) & (_previous(expr) > _previous(level))
+
+
+def turned(expr: Expr | str, to, was) -> Expr:
+    """expr == to on this bar and expr == was on the previous bar (e.g. a supertrend direction change)"""
+    expr = _as_expr(expr)
+    return (expr == to) & (expr.shift(1) == was)
+
+
+def all_of(*exprs: Expr) -> Expr:
+    return Logical('and', exprs)
+
+
+def any_of(*exprs: Expr) -> Expr:
+    return Logical('or', exprs)
+
+
+def min_of(*exprs: Expr) -> Expr:
+    return MinOf(exprs)
+
+
+class Rule:
+    """
+    A named alert. direction: 1 buy signal, -1 sell signal, 0 only watch (used by the backtests)
+    """
+
+    def __init__(self, name: str, condition: Expr, direction: int = 0):
+        self.name = name
+        self.condition = condition
+        self.direction = direction
+
+    @property
+    def columns(self) -> set:
+        return self.condition.columns()
+
+    def __repr__(self):
+        return f"Rule({self.name})"
+
+
+def default_rules(supertrends: tuple = ((10, 1), (11, 2), (12, 3))) -> list:
+    """
+    The alerts of Stock.add_alerts, in their priority order (when more match on the same bar, the last one is the
+    alert_type).
+    """
+    directions = [col(f"SUPERTd_{length}_{float(multiplier)}") for length, multiplier in supertrends]
+    trends = [col(f"SUPERT_{length}_{float(multiplier)}") for length, multiplier in supertrends]
+    any_turned_up = any_of(*(turned(d, 1, -1) for d in directions))
+    st_value = min_of(*trends)
+    isa, isb = col('ISA_9'), col('ISB_26')
+    return [
+        Rule('MACD UP', crosses_above('histogram', 0), 1),
+        Rule('MACD DOWN', crosses_below('histogram', 0), -1),
+        Rule('RSI UP', crosses_above('rsi', 30), 1),
+        Rule('RSI WATCH', crosses_above('rsi', 70), 0),
+        Rule('RSI SECURE', crosses_below('rsi', 70), -1),
+        Rule('Supertrend WATCH', any_turned_up, 0),
+        Rule('Supertrend UP', all_of(*(d == 1 for d in directions)) & any_of(*(d.shift(1) == -1 for d in directions)),
+             1),
+        Rule('Supertrend DOWN',
+             all_of(*(d == -1 for d in directions)) & any_of(*(d.shift(1) == 1 for d in directions)), -1),
+        Rule('Supertrend + Ichimoku UP',
+             (isa < st_value) & (isb < st_value) & ((isa.shift(1) > st_value.shift(1)) |
+                                                    (isb.shift(1) > st_value.shift(1))), 1),
+        Rule('supertrend + sma20 UP', any_turned_up & (col('close') > col('sma20')), 1),
+    ]
+
+
+def pack_rules() -> list:
+    """
+    Alerts on the indicator pack (stocks.pack), not in the defaults: name them in alert_rules or pass them as rules,
+    only the pack columns they use are computed.
+    """
+    return [
+        Rule('ADX TREND', crosses_above('ADX_14', 25), 0),
+        Rule('Aroon UP', crosses_above('AROONOSC_14', 0), 1),
+        Rule('Aroon DOWN', crosses_below('AROONOSC_14', 0), -1),
+        Rule('Bollinger UP', crosses_above('close', 'BBL_20_2.0_2.0'), 1),
+        Rule('Bollinger DOWN', crosses_below('close', 'BBU_20_2.0_2.0'), -1),
+        Rule('Stochastic UP', crosses_above('STOCHk_14_3_3', 'STOCHd_14_3_3') & (col('STOCHk_14_3_3') < 20), 1),
+        Rule('Stochastic DOWN', crosses_below('STOCHk_14_3_3', 'STOCHd_14_3_3') & (col('STOCHk_14_3_3') > 80), -1),
+        Rule('Williams %R UP', crosses_above('WILLR_14', -80), 1),
+        Rule('CCI UP', crosses_above('CCI_14_0.015', -100), 1),
+        Rule('MFI UP', crosses_above('MFI_14', 20), 1),
+        Rule('MFI DOWN', crosses_below('MFI_14', 80), -1),
+    ]
+
+
+RULES = {rule.name: rule for rule in default_rules() + pack_rules()}
+
+
+def register_rule(rule: Rule):
+    """Make a rule available by name in the events"""
+    RULES[rule.name] = rule
+
+
+def parse_expr(spec) -> Expr:
+    """
+    JSON form of a condition: a string is a column, a number a constant, a dict has one operator:
+        {"crosses_above": ["histogram", 0]}, {"turned": ["SUPERTd_10_1.0", 1, -1]},
+        {"gt": ["close", "sma20"]}, {"all_of": [...]}, {"any_of": [...]}, {"not": ...},
+        {"shift": ["rsi", 1]}, {"min_of": [...]}
+    """
+    if isinstance(spec, str):
+        return col(spec)
+    if isinstance(spec, (int, float)):
+        return Const(spec)
+    if not isinstance(spec, dict) or len(spec) != 1:
+        raise ValueError(f"Wrong alert condition {spec}")
+    (op, args), = spec.items()
+    if op in ('crosses_above', 'crosses_below'):
+        expr, level = args
+        helper = crosses_above if op == 'crosses_above' else crosses_below
+        return helper(parse_expr(expr), parse_expr(level))
+    if op == 'turned':
+        expr, to, was = args
+        return turned(parse_expr(expr), to, was)
+    if op in Compare.OPS:
+        left, right = args
+        return Compare(op, parse_expr(left), parse_expr(right))
+    if op in ('all_of', 'any_of', 'min_of'):
+        return {'all_of': all_of, 'any_of': any_of, 'min_of': min_of}[op](*(parse_expr(arg) for arg in args))
+    if op == 'not':
+        return ~parse_expr(args)
+    if op == 'shift':
+        expr, periods = args
+        return parse_expr(expr).shift(periods)
+    raise ValueError(f"Unknown alert operator {op}")
+
+
+def rules_from_event(specs: list | None) -> list | None:
+    """
+    event['alert_rules']: names from RULES and/or {"name": ..., "when": <condition>, "direction": 1}
+    None keeps the defaults.
+    """
+    if not specs:
+        return None
+    rules = []
+    for spec in specs:
+        if isinstance(spec, str):
+            if spec not in RULES:
+                raise ValueError(f"Unknown alert rule {spec}")
+            rules.append(RULES[spec])
+        else:
+            rules.append(Rule(spec['name'], parse_expr(spec['when']), spec.get('direction', 0)))
+    return rules
+
+
+class EvalContext:
+    """One evaluation: the input columns and the memo of the computed nodes"""
+
+    def __init__(self, data):
+        self.data = data
+        self.memo = {}
+
+    def column(self, name: str):
+        return np.asarray(self.data[name], dtype='float64')
+
+    def evaluate(self, expr: Expr):
+        try:
+            return self.memo[expr.key]
+        except KeyError:
+            value = self.memo[expr.key] = expr.compute(self)
+            return value
+
+
+class AlertPlan:
+    """
+    The compiled rules: evaluated together so the shared parts (shifted columns, comparisons, ...) are computed once.
+    Rules whose columns are missing are skipped, like the `if column in df` checks of add_alerts.
+    """
+
+    def __init__(self, rules: list | None = None):
+        self.rules = list(default_rules() if rules is None else rules)
+        self.names = [rule.name for rule in self.rules]
+        self.columns = set().union(*(rule.columns for rule in self.rules)) if self.rules else set()
+        self.lookback = max((rule.condition.lookback() for rule in self.rules), default=0)
+
+    def evaluate(self, data, available=None) -> dict:
+        """
+        :param data: {column: array} or a DataFrame, time on the last axis
+        :return: {rule name: boolean mask}, only for the rules that could run
+        """
+        available = set(data.keys() if available is None else available)
+        ctx = EvalContext(data)
+        return {rule.name: np.asarray(ctx.evaluate(rule.condition), dtype=bool)
+                for rule in self.rules if rule.columns <= available}
+
+    def codes(self, masks: dict, shape: tuple) -> np.ndarray:
+        """Index+1 in self.names of the last matching rule (0 no alert), the old last-writer-wins alert_type"""
+        codes = np.zeros(shape, dtype=np.int16)
+        for code, name in enumerate(self.names, start=1):
+            if name in masks:
+                codes[masks[name]] = code
+        return codes
+
+    def apply(self, df):
+        """
+        Write alert_type (the last matching rule, as before) and alert_types (all the matching rules) in df
+        """
+        masks = self.evaluate(df, available=df.columns)
+        labels = np.array([''] + self.names, dtype=object)
+        df['alert_type'] = labels[self.codes(masks, (len(df),))]
+        alert_types = np.full(len(df), '', dtype=object)
+        for name, mask in masks.items():
+            if mask.any():
+                alert_types[mask] = np.where(alert_types[mask] == '', name, alert_types[mask] + ', ' + name)
+        df['alert_types'] = alert_types
+        return df
@@ -0,0 +1,169 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from .alerts import AlertPlan
+from .panel import Panel, compute_panel
+
+nan = np.nan
+TRADE_COLUMNS = ['stock', 'rule', 'direction', 'signal_date', 'entry_date', 'exit_date', 'entry', 'exit', 'bars',
+                 'ret']
+
+
+def stock_indicators(panel: Panel, rules: list | None = None) -> dict:
+    """
+    The indicators of the Stock class (calculate_all) stacked like compute_panel, slower but the exact Stock code
+    :param rules: The rules of the Stocks, their indicator pack columns are computed too
+    """
+    from .stocks import Stock
+
+    length = panel.close.shape[1]
+    out = {}
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):
+        for i, ticker in enumerate(panel.tickers):
+            start = int(np.argmax(~np.isnat(panel.dates[i])))  # the panel is NaN padded at the start
+            df = pd.DataFrame({'Date': panel.dates[i, start:], 'Open': panel.open[i, start:],
+                               'High': panel.high[i, start:], 'Low': panel.low[i, start:],
+                               'Close': panel.close[i, start:], 'Volume': panel.volume[i, start:]})
+            stock = Stock(ticker, df, rules=rules)
+            for column in stock.df.columns:
+                if column in ('date', 'stock', 'alert_type', 'alert_types', 'open', 'high', 'low', 'close', 'volume'):
+                    continue
+                if column not in out:
+                    out[column] = np.full(panel.close.shape, nan)
+                out[column][i, length - len(stock.df):] = stock.df[column].to_numpy(dtype='float64')
+    return out
+
+
+def _next_signal(signals: np.ndarray) -> np.ndarray:
+    """For every bar the index of the first signal after it (length when there is none), per row"""
+    length = signals.shape[1]
+    positions = np.where(signals, np.arange(length), length)
+    at_or_after = np.minimum.accumulate(positions[:, ::-1], axis=1)[:, ::-1]
+    return np.concatenate([at_or_after[:, 1:], np.full((len(signals), 1), length)], axis=1)
+
+
+def simulate(panel: Panel, plan: AlertPlan | None = None, indicators: dict | None = None, horizon: int = 10,
+             fees: float = 0.0, exit_on_opposite: bool = True) -> pd.DataFrame:
+    """
+    One trade per alert of every rule, all the tickers at once with numpy:
+    entry at the open of the bar after the alert, long for the buy rules (direction 1 and the watch ones, 0), short
+    for the sell rules (-1); exit at the close `horizon` bars after the alert, or at the close of the first alert of
+    the other direction when exit_on_opposite (the last bar for the trades still open).
+    Only the bars with all the indicators count, like add_alerts().dropna().
+    :param fees: Round trip cost as a fraction of the price, taken from every trade
+    :return: the trades, ret is direction * (exit / entry - 1) - fees
+    """
+    plan = plan or AlertPlan()
+    indicators = compute_panel(panel, columns=plan.columns) if indicators is None else indicators
+    masks = plan.evaluate({**indicators, 'open': panel.open, 'high': panel.high, 'low': panel.low,
+                           'close': panel.close, 'volume': panel.volume})
+    complete = ~np.isnan(panel.close) & ~np.isnan(panel.volume)
+    for values in indicators.values():
+        complete &= ~np.isnan(values)
+
+    length = panel.close.shape[1]
+    directions = {rule.name: rule.direction for rule in plan.rules}
+    signals = {name: mask & complete for name, mask in masks.items()}
+    buys = np.zeros(panel.close.shape, dtype=bool)
+    sells = np.zeros(panel.close.shape, dtype=bool)
+    for name, mask in signals.items():
+        if directions[name] > 0:
+            buys |= mask
+        elif directions[name] < 0:
+            sells |= mask
+    next_buy, next_sell = (_next_signal(buys), _next_signal(sells)) if exit_on_opposite else (None, None)
+
+    tickers = np.asarray(panel.tickers, dtype=object)
+    trades = []
+    for name, mask in signals.items():
+        mask = mask.copy()
+        mask[:, -1] = False  # no bar to enter
+        rows, cols = np.nonzero(mask)
+        if not len(rows):
+            continue
+        direction = directions[name]
+        exits = np.minimum(cols + horizon, length - 1)
+        if exit_on_opposite and direction:
+            opposite = next_sell if direction > 0 else next_buy
+            exits = np.minimum(exits, opposite[rows, cols])
+        entry = panel.open[rows, cols + 1]
+        exit_ = panel.close[rows, exits]
+        side = direction or 1
+        with np.errstate(invalid='ignore', divide='ignore'):
+            ret = side * (exit_ / entry - 1) - fees
+        trades.append(pd.DataFrame({
+            'stock': tickers[rows], 'rule': name, 'direction': direction, 'signal_date': panel.dates[rows, cols],
+            'entry_date': panel.dates[rows, cols + 1], 'exit_date': panel.dates[rows, exits], 'entry': entry,
+            'exit': exit_, 'bars': exits - cols, 'ret': ret}))
+    if not trades:
+        return pd.DataFrame(columns=TRADE_COLUMNS)
+    return pd.concat(trades, ignore_index=True).dropna(subset=['ret'])
+
+
+def _simulate_chunk(frames: dict, rules: list | None, engine: str, options: dict) -> pd.DataFrame:
+    panel = Panel.from_frames(frames)
+    indicators = stock_indicators(panel, rules) if engine == "stock" else None
+    return simulate(panel, AlertPlan(rules), indicators, **options)
+
+
+def backtest(frames: dict, rules: list | None = None, horizon: int = 10, fees: float = 0.0,
+             exit_on_opposite: bool = True, engine: str = "panel", max_workers: int = 1,
+             chunk_size: int = 250) -> pd.DataFrame:
+    """
+    simulate() over many tickers, in chunks of chunk_size tickers (the panel of a chunk is what is in memory),
+    in a process pool when max_workers > 1.
+    :param frames: {ticker: DataFrame} as yfinance/stooq or OHLCVStore give them
+    :param engine: panel (numpy, all the tickers of a chunk together) or stock (the Stock class per ticker)
+    :return: the trades of all the tickers
+    """
+    frames = {ticker: df for ticker, df in frames.items() if df is not None and len(df) > 0}
+    tickers = list(frames)
+    chunks = [{ticker: frames[ticker] for ticker in tickers[i:i + chunk_size]}
+              for i in range(0, len(tickers), chunk_size)]
+    options = {'horizon': horizon, 'fees': fees, 'exit_on_opposite': exit_on_opposite}
+    if max_workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            results = list(executor.map(_simulate_chunk, chunks, [rules] * len(chunks), [engine] * len(chunks),
+                                        [options] * len(chunks)))
+    else:
+        results = [_simulate_chunk(chunk, rules, engine, options) for chunk in chunks]
+    results = [result for result in results if len(result)]
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame(columns=TRADE_COLUMNS)
+
+
+def report(trades: pd.DataFrame, by: tuple | list = ('rule',)) -> pd.DataFrame:
+    """
+    Per group (rule, or rule and stock, ...): trades, hit_rate (share of winning trades), pnl (sum of the trade
+    returns, one unit per trade), mean, worst and max_drawdown (largest fall of the cumulative pnl, trades in exit
+    order).
+    """
+    by = list(by)
+    if trades.empty:
+        return pd.DataFrame(columns=['trades', 'hit_rate', 'pnl', 'mean', 'worst', 'max_drawdown'])
+    trades = trades.sort_values(['exit_date', 'entry_date'], kind='stable')
+    keys = [trades[column] for column in by]
+    groups = trades.groupby(keys, sort=True)
+    equity = groups['ret'].cumsum()
+    peak = equity.groupby(keys).cummax().clip(lower=0)
+    summary = groups['ret'].agg(trades='count', pnl='sum', mean='mean', worst='min')
+    summary.insert(1, 'hit_rate', (trades['ret'] > 0).groupby(keys).mean())
+    summary['max_drawdown'] = (peak - equity).groupby(keys).max()
+    return summary
+
+
+def load_frames(store, tickers: list) -> dict:
+    """The stored history (OHLCVStore) of the tickers, the missing ones are skipped"""
+    frames = {}
+    for ticker in tickers:
+        df = store.load(ticker)
+        if df is None:
+            print(f"No stored history for {ticker}")
+            continue
+        frames[ticker] = df
+    return frames
@@ -0,0 +1,147 @@
+from __future__ import annotations
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import redirect_stdout
+from multiprocessing import shared_memory
+
+import numpy as np
+import pandas as pd
+
+from ..storage.ohlcv import naive_dates
+from .stocks import Stock
+
+PRICE_COLUMNS = ["Open", "High", "Low", "Close", "Volume"]
+BATCH_SIZE = 16
+
+
+class SharedOHLCV:
+    """
+    The OHLCV of many tickers packed in one shared memory block, the workers read them without pickling frames:
+        prices (rows x 5) float64 | dates (rows) int64 ns
+    Ticker i is rows offsets[i]:offsets[i + 1]. Only the name, the tickers and the offsets go to the workers.
+    """
+
+    def __init__(self, name: str, tickers: list, offsets: list, shm: shared_memory.SharedMemory | None = None):
+        self.name = name
+        self.tickers = tickers
+        self.offsets = offsets
+        self._shm = shm
+
+    @classmethod
+    def from_frames(cls, frames: dict) -> SharedOHLCV:
+        """:param frames: {ticker: DataFrame} as returned by yfinance/stooq (Date, Open, ...)"""
+        frames = {ticker: df for ticker, df in frames.items() if df is not None and len(df) > 0}
+        offsets = np.concatenate([[0], np.cumsum([len(df) for df in frames.values()])]).tolist()
+        rows = offsets[-1]
+        shm = shared_memory.SharedMemory(create=True, size=max(rows * 6 * 8, 1))
+        prices, dates = _views(shm, rows)
+        for (ticker, df), start, end in zip(frames.items(), offsets, offsets[1:]):
+            df = df.rename(columns={"Datetime": "Date", "date": "Date", "open": "Open", "high": "High", "low": "Low",
+                                    "close": "Close", "volume": "Volume"})
+            prices[start:end] = df[PRICE_COLUMNS].to_numpy(dtype="float64")
+            # yfinance is in the exchange timezone, the same naive dates as Stock and the cache
+            dates[start:end] = naive_dates(df["Date"]).to_numpy(dtype="datetime64[ns]").view("int64")
+        return cls(shm.name, list(frames), offsets, shm)
+
+    def frame(self, i: int) -> pd.DataFrame:
+        """The DataFrame of the i-th ticker, copied out of the shared block"""
+        prices, dates = _views(self._attach(), self.offsets[-1])
+        start, end = self.offsets[i], self.offsets[i + 1]
+        df = pd.DataFrame(prices[start:end], columns=PRICE_COLUMNS)
+        df.insert(0, "Date", dates[start:end].view("datetime64[ns]"))
+        return df
+
+    def _attach(self) -> shared_memory.SharedMemory:
+        if self._shm is None:
+            try:  # python 3.13+, the creator unlinks it
+                self._shm = shared_memory.SharedMemory(name=self.name, track=False)
+            except TypeError:
+                self._shm = shared_memory.SharedMemory(name=self.name)
+        return self._shm
+
+    def __getstate__(self):
+        return {"name": self.name, "tickers": self.tickers, "offsets": self.offsets, "_shm": None}
+
+    def close(self):
+        if self._shm is not None:
+            self._shm.close()
+            self._shm = None
+
+    def unlink(self):
+        self._attach().unlink()
+        self.close()
+
+
+def _views(shm: shared_memory.SharedMemory, rows: int) -> tuple:
+    prices = np.ndarray((rows, 5), dtype="float64", buffer=shm.buf)
+    dates = np.ndarray((rows,), dtype="int64", buffer=shm.buf, offset=rows * 5 * 8)
+    return prices, dates
+
+
+_shared = None  # the SharedOHLCV of the worker process, attached once
+
+
+def _init_worker(shared: SharedOHLCV):
+    global _shared
+    _shared = shared
+
+
+def check_one(name: str, df: pd.DataFrame, **options) -> dict | None:
+    """
+    Stock + check_alerts for one ticker, only the compact result leaves the process:
+    {'stock', 'alert_types', 'row': the last bar with its indicators} or None when there is no alert
+    :param options: Stock parameters (rules, tail_alerts, lazy, compact, granularity, offset, params)
+    """
+    try:
+        stock = Stock(name, df, **options)
+        if not stock.check_alerts(stock):
+            return None
+        last = stock.export_frame().iloc[-1]
+        return {"stock": name, "alert_types": last['alert_types'], "row": last.to_dict()}
+    except Exception as e:
+        print(f"ERROR checking {name} due to {e}")
+        return None
+
+
+def _check_batch(indexes: list, options: dict, params: dict) -> list:
+    with open(os.devnull, "w") as devnull, redirect_stdout(devnull):  # no "Computing ..." for every ticker
+        return [check_one(_shared.tickers[i], _shared.frame(i), params=params.get(_shared.tickers[i]), **options)
+                for i in indexes]
+
+
+def check_stocks(frames: dict, max_workers: int | None = None, batch_size: int = BATCH_SIZE,
+                 params: dict | None = None, **options) -> list:
+    """
+    Stock construction and check_alerts of all the tickers in a process pool.
+    The OHLCV goes through shared memory, the tickers are sent in batches and only the alerts come back.
+    Where there is no /dev/shm (AWS Lambda has none, so no multiprocessing either) it runs in this process.
+    :param params: {ticker: indicator settings} (e.g. sweep.best_params), the Stock params of each ticker
+    :param options: Stock parameters (rules, tail_alerts, lazy, compact, granularity, offset)
+    :return: [check_one result, ...] of the alerted tickers, in the frames order
+    """
+    params = params or {}
+    try:
+        shared = SharedOHLCV.from_frames(frames)
+    except OSError as e:
+        print(f"ERROR no shared memory ({e}), checking the stocks sequentially")
+        return [result for result in (check_one(name, df, params=params.get(name), **options)
+                                      for name, df in frames.items() if df is not None and len(df) > 0) if result]
+    try:
+        batches = [list(range(i, min(i + batch_size, len(shared.tickers))))
+                   for i in range(0, len(shared.tickers), batch_size)]
+        with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_worker, initargs=(shared,)) as executor:
+            # only the settings of its tickers go with a batch
+            futures = [executor.submit(_check_batch, batch, options,
+                                       {shared.tickers[i]: params[shared.tickers[i]] for i in batch
+                                        if shared.tickers[i] in params})
+                       for batch in batches]
+            results = []
+            for batch, future in zip(batches, futures):
+                try:
+                    results.extend(result for result in future.result() if result is not None)
+                except Exception as e:
+                    print(f"ERROR checking {[shared.tickers[i] for i in batch]} due to {e}")
+            return results
+    finally:
+        shared.unlink()
@@ -0,0 +1,103 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+nan = np.nan
+
+
+def _rolling_extreme(values: np.ndarray, window: int, accumulate, combine) -> np.ndarray:
+    """
+    van Herk/Gil-Werman along the last axis: the series is cut in blocks of `window`, a window [i, i + window - 1]
+    is the end of a block (suffix extreme at i) plus the start of the next one (prefix extreme at i + window - 1),
+    so it costs 3 passes whatever the window instead of `window` comparisons per value.
+    The NaN propagate like pandas rolling(window) (min_periods=window): a window with a NaN is NaN.
+    """
+    values = np.asarray(values, dtype='float64')
+    n = values.shape[-1]
+    out = np.full(values.shape, nan)
+    if n < window:
+        return out
+    if window == 1:
+        out[...] = values
+        return out
+    blocks = -(-n // window)
+    padded = np.full(values.shape[:-1] + (blocks * window,), nan)  # the padding is never in a full window
+    padded[..., :n] = values
+    shaped = padded.reshape(values.shape[:-1] + (blocks, window))
+    prefix = accumulate(shaped, axis=-1).reshape(padded.shape)
+    suffix = accumulate(shaped[..., ::-1], axis=-1)[..., ::-1].reshape(padded.shape)
+    out[..., window - 1:] = combine(suffix[..., :n - window + 1], prefix[..., window - 1:n])
+    return out
+
+
+def rolling_max(values: np.ndarray, window: int) -> np.ndarray:
+    """rolling(window).max() along the last axis (1-D series or ticker x time panels), O(n) for any window"""
+    return _rolling_extreme(values, window, np.maximum.accumulate, np.maximum)
+
+
+def rolling_min(values: np.ndarray, window: int) -> np.ndarray:
+    return _rolling_extreme(values, window, np.minimum.accumulate, np.minimum)
+
+
+def rolling_extrema(high: np.ndarray, low: np.ndarray, windows) -> dict:
+    """
+    {window: (highest high, lowest low)} for all the windows, the highs and the negated lows go through one max
+    kernel per window (the ichimoku, donchian channels, stochastic, williams %R ... use the same windows)
+    """
+    both = np.stack([np.asarray(high, dtype='float64'), -np.asarray(low, dtype='float64')])
+    out = {}
+    for window in sorted(set(windows)):
+        extremes = rolling_max(both, window)
+        out[window] = (extremes[0], -extremes[1])
+    return out
+
+
+def midprice(highest: np.ndarray, lowest: np.ndarray) -> np.ndarray:
+    """pandas_ta midprice from the rolling extremes"""
+    return 0.5 * (lowest + highest)
+
+
+def ichimoku(high: np.ndarray, low: np.ndarray, tenkan: int = 9, kijun: int = 26, senkou: int = 52,
+             forward: bool = False) -> tuple:
+    """
+    The ichimoku spans like pandas_ta: ({f'ISA_{tenkan}', f'ISB_{kijun}'} shifted kijun - 1 bars, forward) along the
+    last axis, forward is None unless asked: {ISA, ISB} of the next kijun bars (the last unshifted spans, the
+    pandas_ta span frame). The 3 windows come from one rolling_extrema call.
+    """
+    extremes = rolling_extrema(high, low, (tenkan, kijun, senkou))
+    tenkan_sen = midprice(*extremes[tenkan])
+    kijun_sen = midprice(*extremes[kijun])
+    span_a = 0.5 * (tenkan_sen + kijun_sen)
+    span_b = midprice(*extremes[senkou])
+
+    names = (f"ISA_{tenkan}", f"ISB_{kijun}")
+    spans = {}
+    for name, span in zip(names, (span_a, span_b)):
+        shifted = np.full_like(span, nan)
+        if kijun > 1:
+            shifted[..., kijun - 1:] = span[..., :span.shape[-1] - kijun + 1]
+        else:
+            shifted[...] = span
+        spans[name] = shifted
+    if not forward:
+        return spans, None
+    ahead = {}
+    for name, span in zip(names, (span_a, span_b)):
+        last = span[..., -kijun:]
+        values = np.full(last.shape[:-1] + (kijun,), nan)
+        values[..., kijun - last.shape[-1]:kijun - 1] = last[..., 1:]  # shift(-1) of the last kijun, like pandas_ta
+        ahead[name] = values
+    return spans, ahead
+
+
+def prediction_frame(index: pd.Index, ahead: dict, kijun: int = 26) -> pd.DataFrame:
+    """The pandas_ta ichimoku span frame of one ticker: the next kijun positions (a RangeIndex) or business days"""
+    if len(index) == 0:
+        return pd.DataFrame(columns=list(ahead))
+    last = index[-1]
+    if isinstance(index, pd.DatetimeIndex):
+        new_index = pd.date_range(start=last + pd.Timedelta(1, unit="d"), periods=kijun, freq="B")
+    else:
+        new_index = pd.RangeIndex(start=last + 1, stop=last + kijun + 1)
+    return pd.DataFrame({name: values for name, values in ahead.items()}, index=new_index)
@@ -0,0 +1,239 @@
+from __future__ import annotations
+
+import re
+import time
+
+import numpy as np
+import pandas as pd
+
+from ..storage.ohlcv import normalize_ohlcv
+
+DAY = 24 * 3600
+# bar size in seconds of the yfinance intervals, 1d and longer are the daily logic (market hours cutoff)
+GRANULARITIES = {"1m": 60, "2m": 120, "5m": 300, "15m": 900, "30m": 1800, "60m": 3600, "1h": 3600, "90m": 5400,
+                 "1d": DAY, "5d": 5 * DAY, "1wk": 7 * DAY, "1mo": 30 * DAY, "3mo": 91 * DAY}
+ALIASES = {"D": "1d", "1D": "1d", "d": "1d", "H": "1h", "1H": "1h", "W": "1wk", "M": "1mo"}
+# how far back yfinance serves each interval
+YFINANCE_PERIODS = {"1m": "7d", "2m": "60d", "5m": "60d", "15m": "60d", "30m": "60d", "60m": "730d", "1h": "730d",
+                    "90m": "60d"}
+MAX_BARS = 1000  # bars kept per ticker and timeframe, the indicators need ~250 (ema 200) to warm up
+
+
+def normalize_granularity(granularity: str | None) -> str:
+    """The yfinance name of the interval ("D", "1D" -> "1d"), ValueError when it is unknown"""
+    name = ALIASES.get(granularity or "1d", granularity or "1d")
+    if name not in GRANULARITIES:
+        raise ValueError(f"Unknown granularity {granularity}, use one of {list(GRANULARITIES)}")
+    return name
+
+
+def bar_seconds(granularity: str | None) -> int:
+    return GRANULARITIES[normalize_granularity(granularity)]
+
+
+def is_intraday(granularity: str | None) -> bool:
+    return bar_seconds(granularity) < DAY
+
+
+def history_period(granularity: str | None) -> str:
+    """The yfinance period to download, as much as it serves for the intraday intervals"""
+    return YFINANCE_PERIODS.get(normalize_granularity(granularity), "2y")
+
+
+def history_days(granularity: str | None) -> int:
+    """Days of history kept in the OHLCV cache"""
+    number, unit = re.fullmatch(r"(\d+)([dy])", history_period(granularity)).groups()
+    return int(number) * (365 if unit == "y" else 1)
+
+
+def cutoff(granularity: str | None, now: float | None = None, offset: int = 0) -> float:
+    """
+    Timestamp after which the bars are new for the intraday alerts: the last closed bar and the one still forming.
+    The bar timestamps are their start times in UTC seconds (the daily bars use Stock._find_time), the offset is the
+    one of resample.
+    """
+    seconds = bar_seconds(granularity)
+    now = time.time() if now is None else now
+    return ((now - offset) // seconds - 1) * seconds + offset - 1
+
+
+def _epoch_seconds(dates: pd.Series) -> np.ndarray:
+    return pd.to_datetime(dates).to_numpy(dtype="datetime64[s]").astype("int64")
+
+
+def resample(df: pd.DataFrame, granularity: str, offset: int = 0) -> pd.DataFrame:
+    """
+    Coarser bars from sorted finer ones (Date, Open, High, Low, Close, Volume): first open, max high, min low, last
+    close, summed volume. The buckets start every bar size from the epoch (+ offset seconds, e.g. 1800 for 1h bars
+    of a market opening at :30), so 1d buckets are UTC days.
+    """
+    seconds = bar_seconds(granularity)
+    times = _epoch_seconds(df["Date"])
+    if not len(times):
+        return df.iloc[0:0]
+    buckets = (times - offset) // seconds * seconds + offset
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(times)] - 1
+    return pd.DataFrame({"Date": buckets[starts].astype("datetime64[s]").astype("datetime64[ns]"),
+                         "Open": df["Open"].to_numpy(dtype="float64")[starts],
+                         "High": np.maximum.reduceat(df["High"].to_numpy(dtype="float64"), starts),
+                         "Low": np.minimum.reduceat(df["Low"].to_numpy(dtype="float64"), starts),
+                         "Close": df["Close"].to_numpy(dtype="float64")[ends],
+                         "Volume": np.add.reduceat(df["Volume"].to_numpy(dtype="float64"), starts)})
+
+
+class BarBuffer:
+    """
+    The last `capacity` bars of one ticker in preallocated numpy arrays used as a ring: adding a bar never
+    reallocates and the memory per ticker is the same however long it runs.
+    A bar in the same bucket as the last one replaces it (the source updates the unfinished bar).
+    """
+
+    def __init__(self, granularity: str, capacity: int = MAX_BARS, offset: int = 0):
+        self.granularity = normalize_granularity(granularity)
+        self.seconds = GRANULARITIES[self.granularity]
+        self.capacity = capacity
+        self.offset = offset
+        self.times = np.zeros(capacity, dtype="int64")
+        self.bars = np.zeros((capacity, 5), dtype="float64")  # open, high, low, close, volume
+        self.start = 0  # position of the oldest bar
+        self.size = 0
+
+    def __len__(self):
+        return self.size
+
+    def bucket(self, timestamp: float) -> int:
+        """Start time of the bar that contains timestamp"""
+        return int((timestamp - self.offset) // self.seconds * self.seconds + self.offset)
+
+    @property
+    def last_time(self) -> int | None:
+        return int(self.times[(self.start + self.size - 1) % self.capacity]) if self.size else None
+
+    def add(self, timestamp: float, open_: float, high: float, low: float, close: float, volume: float) -> bool:
+        """
+        Add a bar (timestamp in seconds), False when it is older than the last one and was ignored
+        """
+        bucket = self.bucket(timestamp)
+        last = self.last_time
+        if last is not None and bucket < last:
+            return False
+        if last is None or bucket > last:
+            if self.size < self.capacity:
+                self.size += 1
+            else:  # the oldest bar is overwritten
+                self.start = (self.start + 1) % self.capacity
+        position = (self.start + self.size - 1) % self.capacity
+        self.times[position] = bucket
+        self.bars[position] = (open_, high, low, close, volume)
+        return True
+
+    def extend(self, df: pd.DataFrame):
+        """Add the bars of a downloaded frame (Date, Open, ... sorted), only the last capacity ones are kept"""
+        df = normalize_ohlcv(df)
+        if self.size:
+            for row in zip(_epoch_seconds(df["Date"]), df["Open"], df["High"], df["Low"], df["Close"],
+                           df["Volume"]):
+                self.add(*row)
+            return
+        # empty buffer: one copy of the tail, the same bucket twice keeps the last bar
+        times = _epoch_seconds(df["Date"])
+        times = (times - self.offset) // self.seconds * self.seconds + self.offset
+        keep = np.r_[times[1:] != times[:-1], True] if len(times) else np.zeros(0, dtype=bool)
+        times = times[keep][-self.capacity:]
+        bars = df[["Open", "High", "Low", "Close", "Volume"]].to_numpy(dtype="float64")[keep][-self.capacity:]
+        self.times[:len(times)] = times
+        self.bars[:len(times)] = bars
+        self.start, self.size = 0, len(times)
+
+    def _positions(self, count: int | None = None) -> np.ndarray:
+        """Ring positions of the last count bars (all by default), oldest first"""
+        count = self.size if count is None else count
+        return (self.start + np.arange(self.size - count, self.size)) % self.capacity
+
+    def since(self, timestamp: int) -> np.ndarray:
+        """The bars (rows of open, high, low, close, volume) that start at timestamp or later"""
+        count = 0
+        while count < self.size and self.times[(self.start + self.size - 1 - count) % self.capacity] >= timestamp:
+            count += 1
+        return self.bars[self._positions(count)]
+
+    def frame(self) -> pd.DataFrame:
+        """The bars as a yfinance like frame, Date is naive UTC"""
+        positions = self._positions()
+        bars = self.bars[positions]
+        return pd.DataFrame({"Date": self.times[positions].astype("datetime64[s]").astype("datetime64[ns]"),
+                             "Open": bars[:, 0], "High": bars[:, 1], "Low": bars[:, 2], "Close": bars[:, 3],
+                             "Volume": bars[:, 4]})
+
+    def to_json(self) -> dict:
+        """The bars in the Stock json/dict format (t, o, h, l, c, v), the Stock index is the timestamp"""
+        positions = self._positions()
+        bars = self.bars[positions]
+        return {'t': self.times[positions].tolist(), 'o': bars[:, 0].tolist(), 'h': bars[:, 1].tolist(),
+                'l': bars[:, 2].tolist(), 'c': bars[:, 3].tolist(), 'v': bars[:, 4].tolist()}
+
+    def __repr__(self):
+        return f"BarBuffer({self.granularity}, {self.size}/{self.capacity} bars)"
+
+
+class MultiTimeframe:
+    """
+    One stream of fine bars feeding the buffers of coarser timeframes, e.g. 5m -> 15m and 1h, so one download serves
+    all of them. A new fine bar rebuilds only the last bar of each coarse buffer from the fine bars of its bucket.
+    """
+
+    def __init__(self, granularity: str, timeframes: tuple | list = (), capacity: int = MAX_BARS, offset: int = 0):
+        self.base = BarBuffer(granularity, capacity, offset)
+        self.buffers = {self.base.granularity: self.base}
+        for timeframe in timeframes:
+            buffer = BarBuffer(timeframe, capacity, offset)
+            if buffer.seconds % self.base.seconds or buffer.seconds > DAY:
+                raise ValueError(f"{timeframe} bars can't be built from {self.base.granularity} bars")
+            if buffer.seconds // self.base.seconds > capacity:
+                raise ValueError(f"A {timeframe} bar needs more than the {capacity} buffered {granularity} bars")
+            self.buffers.setdefault(buffer.granularity, buffer)
+
+    def extend(self, df: pd.DataFrame):
+        """Bulk load a downloaded history, the coarse buffers are resampled from all of it in one numpy pass"""
+        df = normalize_ohlcv(df)
+        self.base.extend(df)
+        for buffer in self.buffers.values():
+            if buffer is not self.base:
+                buffer.extend(resample(df, buffer.granularity, buffer.offset))
+
+    def add(self, timestamp: float, open_: float, high: float, low: float, close: float, volume: float) -> bool:
+        """Add a fine bar, False when it was older than the last one"""
+        if not self.base.add(timestamp, open_, high, low, close, volume):
+            return False
+        for buffer in self.buffers.values():
+            if buffer is not self.base:
+                start = buffer.bucket(timestamp)
+                bars = self.base.since(start)
+                buffer.add(start, bars[0, 0], bars[:, 1].max(), bars[:, 2].min(), bars[-1, 3], bars[:, 4].sum())
+        return True
+
+    def __getitem__(self, granularity: str) -> BarBuffer:
+        return self.buffers[normalize_granularity(granularity)]
+
+
+def expand_timeframes(downloads, granularity: str, timeframes: tuple | list = (), capacity: int = MAX_BARS,
+                      as_json: bool = True, offset: int = 0):
+    """
+    (name, data) downloads -> (name, granularity, data) for each timeframe. The intraday bars go through a
+    MultiTimeframe: the Stocks get at most `capacity` bars and the coarser timeframes come from the same download
+    (named "<name>@<timeframe>"). With as_json the data is the Stock json/dict format, else a yfinance like frame.
+    Daily bars pass as they are.
+    """
+    if not is_intraday(granularity):
+        for name, data in downloads:
+            yield name, granularity, data
+        return
+    for name, data in downloads:
+        if data is None or len(data) == 0:
+            continue
+        frames = MultiTimeframe(granularity, timeframes, capacity, offset)
+        frames.extend(data)
+        for timeframe, buffer in frames.buffers.items():
+            label = name if buffer is frames.base else f"{name}@{timeframe}"
+            yield label, timeframe, buffer.to_json() if as_json else buffer.frame()
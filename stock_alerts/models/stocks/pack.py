@@ -0,0 +1,301 @@
+from __future__ import annotations
+
+import math
+import re
+from sys import float_info
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from .extrema import rolling_max, rolling_min
+
+nan = np.nan
+EPSILON = float_info.epsilon
+# the settings of each indicator of the pack, the column names carry them (ADX_14, BBL_20_2.0_2.0, ...) like pandas_ta
+DEFAULTS = {'adx': 14, 'aroon': 14, 'bbands': (20, 2.0), 'stoch': (14, 3, 3), 'willr': 14, 'cci': (14, 0.015),
+            'mfi': 14, 'obv': (), 'roc': 10, 'stdev': 20}
+_COLUMN = re.compile(r"^(ADX|ADXR|DMP|DMN|AROOND|AROONU|AROONOSC|BBL|BBM|BBU|BBB|BBP|STOCHk|STOCHd|STOCHh|WILLR|CCI|MFI|"
+                     r"OBV|ROC|STDEV)((?:_[0-9.]+)*)$")
+_KEYS = {'ADX': 'adx', 'ADXR': 'adx', 'DMP': 'adx', 'DMN': 'adx', 'AROOND': 'aroon', 'AROONU': 'aroon',
+         'AROONOSC': 'aroon', 'BBL': 'bbands', 'BBM': 'bbands', 'BBU': 'bbands', 'BBB': 'bbands', 'BBP': 'bbands',
+         'STOCHk': 'stoch', 'STOCHd': 'stoch', 'STOCHh': 'stoch', 'WILLR': 'willr', 'CCI': 'cci', 'MFI': 'mfi',
+         'OBV': 'obv', 'ROC': 'roc', 'STDEV': 'stdev'}
+
+
+def parse_column(column: str) -> tuple | None:
+    """'ADX_20' -> ('adx', 20), 'BBL_20_2.0_2.0' -> ('bbands', (20, 2.0)), None when it is not a pack column"""
+    match = _COLUMN.match(column)
+    if match is None:
+        return None
+    key = _KEYS[match.group(1)]
+    values = [float(v) if '.' in v else int(v) for v in match.group(2).split('_')[1:]]
+    if key == 'adx':
+        return key, values[0] if values else DEFAULTS['adx']  # ADXR_14_2 has the adxr length too, always 2
+    if key == 'bbands' and len(values) == 3:
+        return key, (values[0], values[1])  # lower and upper std, the pack uses the same for both
+    if not values:
+        return key, DEFAULTS[key]
+    return key, values[0] if len(values) == 1 else tuple(values)
+
+
+def settings_for(columns) -> dict:
+    """{key: [settings, ...]} that give these columns, the other columns are ignored"""
+    settings = {}
+    for column in columns:
+        parsed = parse_column(column)
+        if parsed and parsed[1] not in settings.setdefault(parsed[0], []):
+            settings[parsed[0]].append(parsed[1])
+    return settings
+
+
+def _as_list(value) -> list:
+    return value if isinstance(value, list) else [value]
+
+
+def shift(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    out = np.full_like(values, nan)
+    if periods > 0:
+        out[..., periods:] = values[..., :-periods]
+    else:
+        out[...] = values
+    return out
+
+
+def rma(values: np.ndarray, length: int) -> np.ndarray:
+    """
+    x.ewm(alpha=1 / length, adjust=False).mean() (pandas_ta rma) along the last axis, a plain float loop per row
+    like the supertrend kernel
+    """
+    alpha = 1.0 / length
+    factor = 1.0 - alpha
+    out = np.empty_like(values)
+    for index in np.ndindex(values.shape[:-1]):
+        result = []
+        weighted = nan
+        old_wt = 1.0
+        for x in values[index].tolist():
+            if weighted != weighted:  # not started
+                weighted = x
+            else:
+                old_wt *= factor
+                if x == x:
+                    weighted = (old_wt * weighted + alpha * x) / (old_wt + alpha)
+                    old_wt = 1.0
+            result.append(weighted)
+        out[index] = result
+    return out
+
+
+def _rolling(values: np.ndarray, window: int, reduce) -> np.ndarray:
+    """reduce(windows) for the full windows, NaN before (and where a window has a NaN, like pandas rolling)"""
+    out = np.full_like(values, nan)
+    if values.shape[-1] >= window:
+        with np.errstate(invalid='ignore'):
+            out[..., window - 1:] = reduce(sliding_window_view(values, window, axis=-1))
+    return out
+
+
+class IndicatorPack:
+    """
+    The indicators of the TODO list computed together on the arrays of one ticker (1-D) or of a panel (ticker x time):
+    ADX, Aroon, Bollinger bands, Stochastic, Williams %R, CCI, MFI, OBV, ROC and the standard deviation, same values
+    and column names as pandas_ta. The intermediates are computed once and shared: the previous close and the true
+    range, the rolling high/low windows (Stochastic and Williams %R), the typical price (CCI and MFI), the rolling
+    means and standard deviations (Bollinger and STDEV) and the price diffs.
+    """
+
+    def __init__(self, high, low, close, volume):
+        self.high, self.low, self.close, self.volume = (np.asarray(x, dtype='float64') for x in
+                                                        (high, low, close, volume))
+        self._memo = {}
+
+    def _get(self, key: tuple, build):
+        try:
+            return self._memo[key]
+        except KeyError:
+            value = self._memo[key] = build()
+            return value
+
+    # the shared intermediates
+    def prev_close(self) -> np.ndarray:
+        return self._get(('prev_close',), lambda: shift(self.close))
+
+    def true_range(self) -> np.ndarray:
+        """pandas_ta.true_range(prenan=True), NaN on the first bar (no previous close)"""
+        def build():
+            prev_close = self.prev_close()
+            with np.errstate(invalid='ignore'):
+                tr = np.fmax(np.fmax(self._non_zero(self.high - self.low), np.abs(self.high - prev_close)),
+                             np.abs(prev_close - self.low))
+            return np.where(np.isnan(prev_close), nan, tr)
+        return self._get(('tr',), build)
+
+    def first_bar(self) -> np.ndarray:
+        """Index of the first bar of every row, the panel rows are NaN padded at the start"""
+        return self._get(('first',), lambda: np.argmax(~np.isnan(self.close), axis=-1))
+
+    def highest(self, window: int) -> np.ndarray:
+        return self._get(('highest', window), lambda: rolling_max(self.high, window))
+
+    def lowest(self, window: int) -> np.ndarray:
+        return self._get(('lowest', window), lambda: rolling_min(self.low, window))
+
+    def typical_price(self) -> np.ndarray:
+        return self._get(('hlc3',), lambda: (self.high + self.low + self.close) / 3.0)
+
+    def mean(self, name: str, window: int) -> np.ndarray:
+        values = self.typical_price() if name == 'hlc3' else self.close
+        return self._get(('mean', name, window), lambda: _rolling(values, window, lambda w: w.mean(axis=-1)))
+
+    def std(self, window: int) -> np.ndarray:
+        return self._get(('std', window), lambda: _rolling(self.close, window, lambda w: w.std(axis=-1, ddof=1)))
+
+    @staticmethod
+    def _non_zero(diff: np.ndarray) -> np.ndarray:
+        """pandas_ta non_zero_range: epsilon added to the rows (tickers) with a difference of exactly 0"""
+        return diff + EPSILON * (diff == 0).any(axis=-1, keepdims=True)
+
+    # the indicators
+    def adx(self, length: int = 14) -> dict:
+        """pandas_ta.adx: DM+/DM- and DX smoothed with RMA, the ATR seeded with the mean of the first true ranges"""
+        def build():
+            # the first length true ranges of each row (the first one is NaN) averaged on the length-th bar
+            tr = self.true_range().copy()
+            rows, firsts = tr.reshape(-1, tr.shape[-1]), np.atleast_1d(self.first_bar())
+            for row, first in zip(rows, firsts):
+                seeded = first + length - 1
+                if seeded < len(row):
+                    row[seeded] = np.nanmean(row[first:seeded + 1])
+                row[:min(seeded, len(row))] = nan
+            atr = rma(tr, length)
+            up = self.high - shift(self.high)
+            down = shift(self.low) - self.low
+            with np.errstate(invalid='ignore', divide='ignore'):
+                pos = np.where(np.isnan(up), nan, np.where((up > down) & (up > 0), up, 0.0))
+                neg = np.where(np.isnan(down), nan, np.where((down > up) & (down > 0), down, 0.0))
+                k = 100 / atr
+                dmp = k * rma(pos, length)
+                dmn = k * rma(neg, length)
+                dx = 100 * np.abs(dmp - dmn) / (dmp + dmn)
+            adx = rma(dx, length)
+            return {f"ADX_{length}": adx, f"ADXR_{length}_2": 0.5 * (adx + shift(adx, 2)), f"DMP_{length}": dmp,
+                    f"DMN_{length}": dmn}
+        return self._get(('adx', length), build)
+
+    def aroon(self, length: int = 14) -> dict:
+        """Bars since the highest high/lowest low of the last length + 1 bars (the most recent one on ties)"""
+        def since(values, pick):
+            return _rolling(values, length + 1, lambda w: np.where(np.isnan(w).any(axis=-1), nan,
+                                                                   pick(w[..., ::-1], axis=-1)))
+
+        def build():
+            up = 100 * (1 - since(self.high, np.argmax) / length)
+            down = 100 * (1 - since(self.low, np.argmin) / length)
+            return {f"AROOND_{length}": down, f"AROONU_{length}": up, f"AROONOSC_{length}": up - down}
+        return self._get(('aroon', length), build)
+
+    def bbands(self, length: int = 20, std: float = 2.0) -> dict:
+        def build():
+            mid = self.mean('close', length)
+            deviations = float(std) * self.std(length)
+            lower, upper = mid - deviations, mid + deviations
+            width = self._non_zero(upper - lower)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                bandwidth = 100 * width / mid
+                percent = self._non_zero(self.close - lower) / width
+            props = f"_{length}_{float(std)}_{float(std)}"
+            return {f"BBL{props}": lower, f"BBM{props}": mid, f"BBU{props}": upper, f"BBB{props}": bandwidth,
+                    f"BBP{props}": percent}
+        return self._get(('bbands', length, float(std)), build)
+
+    def stoch(self, k: int = 14, d: int = 3, smooth_k: int = 3) -> dict:
+        def build():
+            lowest = self.lowest(k)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                stoch = 100 * (self.close - lowest) / self._non_zero(self.highest(k) - lowest)
+            stoch_k = stoch if smooth_k == 1 else _rolling(stoch, smooth_k, lambda w: w.mean(axis=-1))
+            stoch_d = _rolling(stoch_k, d, lambda w: w.mean(axis=-1))
+            props = f"_{k}_{d}_{smooth_k}"
+            return {f"STOCHk{props}": stoch_k, f"STOCHd{props}": stoch_d, f"STOCHh{props}": stoch_k - stoch_d}
+        return self._get(('stoch', k, d, smooth_k), build)
+
+    def willr(self, length: int = 14) -> dict:
+        lowest = self.lowest(length)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return {f"WILLR_{length}": 100 * ((self.close - lowest) / (self.highest(length) - lowest) - 1)}
+
+    def cci(self, length: int = 14, c: float = 0.015) -> dict:
+        """(typical price - its SMA) / (c * its mean absolute deviation)"""
+        def build():
+            tp = self.typical_price()
+            mean = self.mean('hlc3', length)
+            mad = _rolling(tp, length, lambda w: np.abs(w - w.mean(axis=-1, keepdims=True)).mean(axis=-1))
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return {f"CCI_{length}_{c}": (tp - mean) / (c * mad)}
+        return self._get(('cci', length, c), build)
+
+    def mfi(self, length: int = 14) -> dict:
+        def build():
+            tp = self.typical_price()
+            previous = shift(tp)
+            with np.errstate(invalid='ignore'):
+                # the first bar has no previous price, its flow is not counted
+                flow = np.where(np.isnan(previous), nan, tp * self.volume * np.where(tp > previous, 1, -1))
+                gain = _rolling(np.maximum(flow, 0), length, lambda w: w.sum(axis=-1))
+                loss = _rolling(np.maximum(-flow, 0), length, lambda w: w.sum(axis=-1))
+                return {f"MFI_{length}": 100.0 * gain / (gain + loss + EPSILON)}
+        return self._get(('mfi', length), build)
+
+    def obv(self) -> dict:
+        def build():
+            with np.errstate(invalid='ignore'):
+                signed = np.sign(self.close - self.prev_close()) * self.volume
+            obv = np.nancumsum(signed, axis=-1)
+            obv[np.isnan(signed)] = nan
+            return {"OBV": obv}
+        return self._get(('obv',), build)
+
+    def roc(self, length: int = 10) -> dict:
+        previous = shift(self.close, length)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return {f"ROC_{length}": 100 * (self.close - previous) / previous}
+
+    def stdev(self, length: int = 20) -> dict:
+        return {f"STDEV_{length}": self.std(length)}
+
+    def compute(self, settings: dict | None = None) -> dict:
+        """
+        {column: array} of the asked indicators.
+        :param settings: {key: settings or [settings, ...]} with the keys of DEFAULTS, None for all the defaults
+        """
+        out = {}
+        for key, values in (DEFAULTS if settings is None else settings).items():
+            for value in _as_list(values):
+                args = value if isinstance(value, (tuple, list)) else (value,)
+                out.update(getattr(self, key)(*args))
+        return out
+
+
+def indicator_pack(high, low, close, volume, settings: dict | None = None) -> dict:
+    """IndicatorPack(...).compute(settings), see IndicatorPack"""
+    return IndicatorPack(high, low, close, volume).compute(settings)
+
+
+def for_columns(high, low, close, volume, columns) -> dict:
+    """Only the pack columns among columns (e.g. the columns of an AlertPlan), {} when there is none"""
+    settings = settings_for(columns)
+    if not settings:
+        return {}
+    values = indicator_pack(high, low, close, volume, settings)
+    wanted = set(columns)
+    return {column: array for column, array in values.items() if column in wanted}
+
+
+def is_pack_column(column: str) -> bool:
+    return parse_column(column) is not None
+
+
+def columns(settings: dict | None = None) -> list:
+    """The column names the settings give (all the defaults by default), without computing them"""
+    empty = np.full(1, math.nan)
+    return list(indicator_pack(empty, empty, empty, empty, settings))
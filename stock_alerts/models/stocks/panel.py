@@ -0,0 +1,284 @@
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+from . import extrema, pack
+from .alerts import AlertPlan
+
+nan = np.nan
+
+OHLCV_COLUMNS = {'Date': 'date', 'Datetime': 'date', 'Open': 'open', 'High': 'high', 'Low': 'low', 'Close': 'close',
+                 'Volume': 'volume'}
+SUPERTRENDS = ((10, 1.0), (11, 2.0), (12, 3.0))
+DEFAULT_PLAN = AlertPlan()
+
+
+class Panel:
+    """
+    OHLCV of many tickers as aligned (ticker x time) NumPy arrays.
+    Every ticker is right aligned on its own last `length` bars (shorter histories are NaN padded at the start), so
+    each row gives the same indicators as a Stock built from that ticker alone.
+    """
+
+    def __init__(self, tickers: list, dates: np.ndarray, open_: np.ndarray, high: np.ndarray, low: np.ndarray,
+                 close: np.ndarray, volume: np.ndarray):
+        self.tickers = list(tickers)
+        self.dates = dates  # datetime64[ns], NaT for padding
+        self.open, self.high, self.low, self.close, self.volume = open_, high, low, close, volume
+
+    @classmethod
+    def from_frames(cls, frames: dict, length: int | None = None) -> Panel:
+        """
+        :param frames: {ticker: DataFrame} as returned by yfinance/stooq (Date, Open, ...) or lower case columns
+        :param length: How many bars to keep per ticker, defaults to the longest history
+        """
+        frames = {ticker: df for ticker, df in frames.items() if df is not None and len(df) > 0}
+        length = length or max(len(df) for df in frames.values())
+        shape = (len(frames), length)
+        arrays = {col: np.full(shape, nan) for col in ('open', 'high', 'low', 'close', 'volume')}
+        dates = np.full(shape, np.datetime64('NaT'), dtype='datetime64[ns]')
+        for i, df in enumerate(frames.values()):
+            n = min(len(df), length)
+            names = {OHLCV_COLUMNS.get(col, col): col for col in df.columns}  # no rename, it copies the frame
+            for col, array in arrays.items():
+                if col in names:
+                    array[i, length - n:] = df[names[col]].to_numpy(dtype='float64')[-n:]
+            date = df[names['date']]
+            if not isinstance(date.dtype, np.dtype):  # tz aware (yfinance), keep the market local time
+                date = date.dt.tz_localize(None)
+            elif date.dtype.kind != 'M':
+                date = pd.to_datetime(date)
+            dates[i, length - n:] = date.to_numpy(dtype='datetime64[ns]')[-n:]
+        return cls(list(frames), dates, arrays['open'], arrays['high'], arrays['low'], arrays['close'],
+                   arrays['volume'])
+
+
+def shift(values: np.ndarray, periods: int = 1) -> np.ndarray:
+    """pd.Series.shift along the time axis"""
+    out = np.full_like(values, nan)
+    if periods > 0:
+        out[:, periods:] = values[:, :-periods]
+    elif periods < 0:
+        out[:, :periods] = values[:, -periods:]
+    else:
+        out[:] = values
+    return out
+
+
+def ewm(values: np.ndarray, alpha: float, adjust: bool = True, min_periods: int = 0) -> np.ndarray:
+    """
+    pd.Series.ewm(alpha=..., adjust=..., min_periods=...).mean() for every row at once (ignore_na=False).
+    """
+    n, t = values.shape
+    out = np.full((n, t), nan)
+    weighted = np.full(n, nan)
+    old_wt = np.ones(n)
+    nobs = np.zeros(n)
+    factor = 1.0 - alpha
+    new_wt = 1.0 if adjust else alpha
+    min_periods = max(min_periods, 1)
+    for j in range(t):
+        x = values[:, j]
+        observed = ~np.isnan(x)
+        started = ~np.isnan(weighted)
+        nobs += observed
+        old_wt = np.where(started, old_wt * factor, old_wt)
+        update = started & observed
+        weighted = np.where(update, (old_wt * weighted + new_wt * x) / (old_wt + new_wt), weighted)
+        if adjust:
+            old_wt = np.where(update, old_wt + new_wt, old_wt)
+        else:
+            old_wt = np.where(update, 1.0, old_wt)
+        weighted = np.where(~started & observed, x, weighted)
+        out[:, j] = np.where(nobs >= min_periods, weighted, nan)
+    return out
+
+
+def rolling_mean(values: np.ndarray, window: int) -> np.ndarray:
+    """rolling(window).mean(), NaN when the window is not full"""
+    out = np.full_like(values, nan)
+    if values.shape[1] >= window:
+        out[:, window - 1:] = sliding_window_view(values, window, axis=1).mean(axis=-1)
+    return out
+
+
+def true_range(high: np.ndarray, low: np.ndarray, close: np.ndarray) -> np.ndarray:
+    prev_close = shift(close)
+    ranges = np.stack([high - low, np.abs(high - prev_close), np.abs(prev_close - low)])
+    with np.errstate(all='ignore'):
+        tr = np.fmax(np.fmax(ranges[0], ranges[1]), ranges[2])
+    return tr
+
+
+def average_true_range(tr: np.ndarray, valid: np.ndarray, length) -> np.ndarray:
+    """
+    The ATR of pandas_ta.supertrend: the first `length` true ranges averaged, then RMA(length); rows can start with
+    NaN padding (valid False). `length` is one int or one per row.
+    """
+    n, t = tr.shape
+    length = np.broadcast_to(np.asarray(length), (n,))[:, None]
+    seen = np.cumsum(valid, axis=1)  # valid bars so far, this one included
+    first = np.where(valid & (seen <= length), tr, 0.0).sum(axis=1, keepdims=True) / length
+    alpha = 1.0 / length
+    steps = valid & (seen > length)
+    seeds = valid & (seen == length)
+    # atr = atr * factor + term: the first average at the seed, the RMA steps after, the other bars keep it
+    factor = np.ascontiguousarray(np.where(steps, 1 - alpha, np.where(seeds, 0.0, 1.0)).T)
+    term = np.ascontiguousarray(np.where(steps, alpha * tr, np.where(seeds, first, 0.0)).T)
+    out = np.empty((t, n))
+    atr = np.zeros(n)
+    for j in range(t):
+        atr = atr * factor[j] + term[j]
+        out[j] = atr
+    return np.where(seen >= length, out.T, nan)
+
+
+def supertrend(high: np.ndarray, low: np.ndarray, close: np.ndarray, length, multiplier,
+               atr: np.ndarray | None = None) -> tuple:
+    """
+    pandas_ta.supertrend for every row at once, the rows can start with NaN padding.
+    `length` and `multiplier` are one value or one per row (see supertrend_columns).
+    :param atr: average_true_range(...) when it is already computed (the same for all the multipliers of a length)
+    Returns (trend, direction)
+    """
+    n, t = close.shape
+    valid = ~np.isnan(close)
+    if atr is None:
+        atr = average_true_range(true_range(high, low, close), valid, length)
+    length = np.broadcast_to(np.asarray(length), (n,))[:, None]
+    band = np.broadcast_to(np.asarray(multiplier, dtype='float64'), (n,))[:, None] * atr
+    hl2 = 0.5 * (high + low)
+    # the loop reads one bar of every row: time major, with the valid bars of each row first (a NaN close is skipped)
+    order = np.argsort(~valid, axis=1, kind='stable')
+    lower_band, upper_band, closes = (np.ascontiguousarray(np.take_along_axis(x, order, axis=1).T)
+                                      for x in (hl2 - band, hl2 + band, close))
+
+    trends = np.empty((t, n))
+    directions = np.empty((t, n))
+    lower = np.full(n, nan)
+    upper = np.full(n, nan)
+    direction = np.ones(n)
+    for j in range(t):
+        up = closes[j] > upper
+        down = closes[j] < lower
+        np.copyto(direction, -1.0, where=down)
+        np.copyto(direction, 1.0, where=up)
+        rising = direction > 0
+        # a band only ratchets while the direction holds
+        lower = np.where(rising & ~up & (lower_band[j] < lower), lower, lower_band[j])
+        upper = np.where(~rising & ~down & (upper_band[j] > upper), upper, upper_band[j])
+        trends[j] = np.where(rising, lower, upper)
+        directions[j] = direction
+
+    trend = np.empty((n, t))
+    direction = np.empty((n, t))
+    np.put_along_axis(trend, order, trends.T, axis=1)
+    np.put_along_axis(direction, order, directions.T, axis=1)
+    seen = np.cumsum(valid, axis=1)  # valid bars so far, this one included
+    return np.where(valid & (seen > 1), trend, nan), np.where(valid & (seen > length), direction, nan)
+
+
+def supertrend_columns(high: np.ndarray, low: np.ndarray, close: np.ndarray, params: tuple = SUPERTRENDS) -> dict:
+    """
+    All the (length, multiplier) supertrends of every row in one walk, the pairs are stacked as rows and the true
+    range is computed once.
+    Returns {'SUPERT_<length>_<multiplier>': (ticker x time) array, 'SUPERTd_<length>_<multiplier>': ..., ...}
+    """
+    if not params:
+        return {}
+    n = close.shape[0]
+    k = len(params)
+    lengths = np.repeat([length for length, _ in params], n)
+    multipliers = np.repeat([float(multiplier) for _, multiplier in params], n)
+    stacked = [np.tile(x, (k, 1)) for x in (high, low, close)]
+    atr = average_true_range(np.tile(true_range(high, low, close), (k, 1)), ~np.isnan(stacked[2]), lengths)
+    trend, direction = supertrend(*stacked, lengths, multipliers, atr)
+
+    out = {}
+    for i, (length, multiplier) in enumerate(params):
+        props = f"_{length}_{float(multiplier)}"
+        out[f"SUPERT{props}"], out[f"SUPERTd{props}"] = trend[i * n:(i + 1) * n], direction[i * n:(i + 1) * n]
+    return out
+
+
+def compute_panel(panel: Panel, supertrends: tuple = SUPERTRENDS, columns=()) -> dict:
+    """
+    All Stock indicators for every ticker in one vectorized pass.
+    :param columns: e.g. the AlertPlan columns, the indicator pack ones among them are added (ADX_14, ...)
+    Returns {column: (ticker x time) array} with the same column names as Stock.df
+    """
+    high, low, close = panel.high, panel.low, panel.close
+    out = {}
+
+    # MACD (12, 26, 9)
+    ema_fast = ewm(close, 2 / 13, min_periods=26)
+    ema_slow = ewm(close, 2 / 27, min_periods=26)
+    out['macd'] = ema_fast - ema_slow
+    out['signal'] = ewm(out['macd'], 2 / 10, min_periods=9)
+    out['histogram'] = out['macd'] - out['signal']
+
+    # RSI 14
+    delta = close - shift(close)
+    with np.errstate(invalid='ignore'):
+        ema_up = ewm(np.where(np.isnan(delta), nan, np.clip(delta, 0, None)), 1 / 14, adjust=False)
+        ema_down = ewm(np.where(np.isnan(delta), nan, -np.clip(delta, None, 0)), 1 / 14, adjust=False)
+        out['rsi'] = ema_up / (ema_up + ema_down) * 100
+
+    # Ichimoku (9, 26, 52), spans shifted kijun - 1 bars like pandas_ta, the 3 windows in one rolling extrema call
+    out.update(extrema.ichimoku(high, low)[0])
+
+    out['ema'] = ewm(close, 2 / 201, min_periods=200)
+    out['sma20'] = rolling_mean(close, 20)
+    out['sma50'] = rolling_mean(close, 50)
+
+    out.update(supertrend_columns(high, low, close, supertrends))
+    out.update(pack.for_columns(high, low, close, panel.volume, columns))
+    return out
+
+
+def panel_alerts(panel: Panel, indicators: dict, plan: AlertPlan | None = None) -> np.ndarray:
+    """
+    Stock.add_alerts over the whole panel: same rules in the same order, the last matching rule wins.
+    Returns (ticker x time) codes, 0 no alert, else the rule is plan.names[code - 1].
+    """
+    plan = plan or DEFAULT_PLAN
+    masks = plan.evaluate({**indicators, 'close': panel.close})
+    return plan.codes(masks, panel.close.shape)
+
+
+def alert_rows(panel: Panel, indicators: dict | None = None, since: float | None = None,
+               plan: AlertPlan | None = None) -> pd.DataFrame:
+    """
+    One row per ticker with its last alert (only bars where all indicators exist, like add_alerts().dropna()).
+    :param since: Optional timestamp in seconds, older alerts are dropped (Stock._find_time())
+    """
+    plan = plan or DEFAULT_PLAN
+    indicators = compute_panel(panel, columns=plan.columns) if indicators is None else indicators
+    masks = plan.evaluate({**indicators, 'close': panel.close})
+    codes = plan.codes(masks, panel.close.shape)
+    complete = ~np.isnan(panel.close) & ~np.isnan(panel.volume)
+    for values in indicators.values():
+        complete &= ~np.isnan(values)
+    alerted = (codes > 0) & complete
+
+    t = codes.shape[1]
+    has_alert = alerted.any(axis=1)
+    last = t - 1 - np.argmax(alerted[:, ::-1], axis=1)
+    rows = np.flatnonzero(has_alert)
+    cols = last[rows]
+
+    result = pd.DataFrame({
+        'stock': np.asarray(panel.tickers, dtype=object)[rows],
+        'date': panel.dates[rows, cols],
+        'close': panel.close[rows, cols],
+        'alert_type': np.asarray([''] + plan.names, dtype=object)[codes[rows, cols]],
+        'alert_types': [', '.join(name for name, mask in masks.items() if mask[row, col])
+                        for row, col in zip(rows, cols)],
+    })
+    for name, values in indicators.items():
+        result[name] = values[rows, cols]
+    if since is not None:
+        result = result[result['date'].astype('int64') / 1e9 > since]
+    return result.reset_index(drop=True)
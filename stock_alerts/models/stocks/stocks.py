@@ -1,15 +1,37 @@
 from __future__ import annotations
 
-import io
 import time
 from datetime import datetime
 
-import boto3
+import numpy as np
 import pandas as pd
-import pandas_ta as ta
 import pytz
 
-pd.set_option('display.max_columns', None)
+from ..metrics.stages import stage
+from ..storage.backends import S3Backend
+from ..storage.export import CHUNK_ROWS, write_frame
+from ..storage.ohlcv import naive_dates
+from . import extrema, intraday, pack
+from .alerts import AlertPlan, default_rules
+from .streaming import IndicatorStream
+from .supertrend import supertrend
+
+# which _calculate_* adds each indicator column, used by the lazy mode to compute only what is asked
+INDICATORS = {
+    'macd': '_calculate_macd', 'signal': '_calculate_macd', 'histogram': '_calculate_macd',
+    'rsi': '_calculate_rsi',
+    'ISA_9': '_calculate_ichimoku', 'ISB_26': '_calculate_ichimoku',
+    'ema': '_calculate_ema',
+    'sma20': '_calculate_sma', 'sma50': '_calculate_sma',
+    **{f"SUPERT{kind}_{length}_{float(multiplier)}": '_calculate_supertrend'
+       for length, multiplier in ((10, 1), (11, 2), (12, 3)) for kind in ('', 'd')},
+}
+PRICE_COLUMNS = ('open', 'high', 'low', 'close', 'volume')  # kept float64 in compact mode
+CALCULATORS = ('_calculate_macd', '_calculate_rsi', '_calculate_ichimoku', '_calculate_ema', '_calculate_sma',
+               '_calculate_supertrend')
+# the params keys (same names as the IndicatorStream arguments) of each _calculate_*
+PARAMS = {'_calculate_macd': 'macd', '_calculate_rsi': 'rsi', '_calculate_ema': 'ema',
+          '_calculate_supertrend': 'supertrends'}
 
 class Stock:
     """
@@ -22,31 +44,62 @@ class Stock:
         - _calculate_ema: Calculate the exponential moving average indicator for the stock (default add 200, can be changed)
         - _calculate_sma: Calculate the simple moving average indicator for the stock (default 20, 50, can be added one more)
         - _calculate_supertrend: Calculate the supertrends indicators (default (10,1), (11,2), (12,3), can be added one more)
+        - _calculate_pack: ADX, Aroon, Bollinger, Stochastic, Williams %R, CCI, MFI, OBV, ROC, STDEV in one pass (only
+          the ones the alert rules use, or asked with ensure/indicator, e.g. 'ADX_14', 'BBL_20_2.0_2.0')
+        - update: Add a new closed bar and advance all the indicators incrementally (after enable_streaming)
         
     Variables:
         - stock: Name of the stock
         - df: Dataframe with the stock data
-        - granularity: Granularity of the stock data
-        - there is an ichimoku_prediction df generated when you run the function
+        - granularity: Granularity of the stock data, the yfinance intervals ("1d", "1h", "5m", ...), it sets the
+          alerts cutoff (see cutoff_time)
+        - ichimoku_prediction: the ichimoku spans of the next 26 bars (pandas_ta span frame), computed when read
         - there is an alerts df that keeps only the changes from the original df
+        - stream: IndicatorStream with the indicators state, None until enable_streaming is called
     """
 
     def __init__(self, stock_name: str, input_data: pd.DataFrame | str | dict, granularity: str = "D",
-                 data_format: str = "json"):
+                 data_format: str = "json", rules: list | None = None, tail_alerts: bool = False,
+                 lazy: bool = False, compact: bool = False, params: dict | None = None, offset: int = 0):
         """
         Constructor for the Stock class
         Parameters:
             - stock_name:
+            - rules: list of alerts.Rule, default the alerts.default_rules()
+            - tail_alerts: Don't compute the alerts over all the history, check_alerts looks only at the last bars
+            - lazy: Nothing is computed here, the indicators are computed when they are needed (indicator(), the
+              columns of the alert rules for add_alerts/check_alerts), e.g. a MACD only scan computes only the MACD
+            - compact: Less memory per ticker, the indicators are float32, SUPERTd_* Int8, stock/alert_type/alert_types
+              categorical and the date column (same as the timestamp index) is not kept, export_frame() adds it back
+            - params: Indicator settings instead of the defaults, e.g. the best ones of a sweep:
+              {'macd': (12, 26, 9), 'rsi': 14, 'ema': 200, 'supertrends': ((10, 1), (11, 2), (12, 3))}, with other
+              supertrends the default rules use their columns
+            - offset: Seconds the intraday bars start after the UTC bar size grid (intraday.resample), e.g. 1800 for
+              1h bars at :30, for the cutoff_time
         """
         self.stock_name = stock_name
         self.df = pd.DataFrame()
         self.input_data = input_data
         self.granularity = granularity  # this should be optional, but anyway...
+        self.offset = offset
         self.data_format = data_format
-        self.ichimoku_prediction = pd.DataFrame()
-
-        self._rename()
-        self.calculate_all()
+        self._prediction = None  # (df version, ichimoku span frame), see ichimoku_prediction
+        self.stream = None
+        self.params = dict(params or {})
+        if rules is None and 'supertrends' in self.params:
+            rules = default_rules(tuple(tuple(params) for params in self.params['supertrends']))
+        self.alert_plan = AlertPlan(rules)
+        self.tail_alerts = tail_alerts
+        self._alerts_cache = None  # (df version, alerted rows)
+        self._recent_cache = None  # (df version, bars after the cutoff, alerted rows)
+        self.lazy = lazy
+        self.compact = compact
+        self._computed = set()  # the _calculate_* already run on this df
+
+        with stage('rename', stock=stock_name):
+            self._rename()
+        if not lazy:
+            self.calculate_all()
 
     def _rename(self):
         """Convert data to df"""
@@ -62,9 +115,12 @@ class Stock:
         if isinstance(self.input_data, pd.DataFrame):
             self.df = self.input_data
             self.df['stock'] = self.stock_name
-            self.df.rename(columns={'Date': 'date', "Open": "open", "High": "high", "Low": "low", "Volume": "volume",
-                                    "Close": "close"}, inplace=True)
+            self.df.rename(columns={'Date': 'date', 'Datetime': 'date', "Open": "open", "High": "high", "Low": "low",
+                                    "Volume": "volume", "Close": "close"}, inplace=True)
             self.df.drop_duplicates(subset=['date', 'stock'], inplace=True, keep='last')
+            if 'date' in self.df.columns and self.df.index.name != 'timestamp':
+                # epoch seconds of the (naive market) dates like the json input, check_alerts compares with the cutoff
+                self.df.index = pd.Index(intraday._epoch_seconds(naive_dates(self.df['date'])), name='timestamp')
             return
         print(f"ERROR, data not in right format {type(self.input_data)} {self.input_data}")
 
@@ -89,24 +145,19 @@ class Stock:
         self.df['rsi'] = rsi
         return rsi
 
-    def _calculate_supertrend(self, other: tuple | None = None) -> pd.DataFrame:
+    def _calculate_supertrend(self, other: tuple | None = None, supertrends: tuple | None = None) -> pd.DataFrame:
         """
-        Based on pandas_ta this: https://github.com/twopirllc/pandas-ta/blob/main/pandas_ta/overlap/supertrend.py
+        Same values as pandas_ta this: https://github.com/twopirllc/pandas-ta/blob/main/pandas_ta/overlap/supertrend.py
+        but the true range is computed once for all of them, and only SUPERT_* and SUPERTd_* are added
         * 10, 11, 12 are on plus buy, 1st on minus sell?
+        supertrends replaces the default (length, multiplier) pairs
         """
-        sti_10_1 = ta.supertrend(self.df['high'], self.df['low'], self.df['close'], length=10, multiplier=1).drop(
-            ['SUPERTl_10_1.0', 'SUPERTs_10_1.0'], axis=1)
-        sti_11_2 = ta.supertrend(self.df['high'], self.df['low'], self.df['close'], length=11, multiplier=2).drop(
-            ['SUPERTl_11_2.0', 'SUPERTs_11_2.0'], axis=1)
-        sti_12_3 = ta.supertrend(self.df['high'], self.df['low'], self.df['close'], length=12, multiplier=3).drop(
-            ['SUPERTl_12_3.0', 'SUPERTs_12_3.0'], axis=1)
-
+        params = [tuple(params) for params in supertrends] if supertrends else [(10, 1), (11, 2), (12, 3)]
         if other and len(other) == 2:
-            other = ta.supertrend(self.df['high'], self.df['low'], self.df['close'], length=other[0],
-                                  multiplier=other[1])
-            self.df = pd.concat([self.df, other], axis=1)
+            params.append(tuple(other))
 
-        self.df = pd.concat([self.df, sti_10_1, sti_11_2, sti_12_3], axis=1)
+        for name, values in supertrend(self.df['high'], self.df['low'], self.df['close'], params).items():
+            self.df[name] = values
         return self.df
 
     def _calculate_ema(self, n=200):
@@ -127,23 +178,56 @@ class Stock:
 
         sma20['sma20'] = self.df['close'].rolling(window=20).mean()
         sma50['sma50'] = self.df['close'].rolling(window=50).mean()
-        self.df = pd.concat([self.df, sma20, sma50], axis=1)
+        # new columns in place, a concat copies the whole frame every time
+        self.df['sma20'] = sma20['sma20']
+        self.df['sma50'] = sma50['sma50']
 
         if other and other > 0:
+            import pandas_ta as ta
             sma = ta.sma(self.df['close'], length=other)
-            self.df = pd.concat([self.df, sma], axis=1)
+            self.df[sma.name] = sma
             return sma20, sma50, sma
 
         return sma20, sma50
 
-    def _calculate_ichimoku(self):
+    def _calculate_ichimoku(self, tenkan=9, kijun=26, senkou=52):
+        """
+        * ichimoku, only the spans of the alerts (ISA_9, ISB_26, pandas_ta values), the 3 windows come from one
+          rolling extrema pass. The prediction frame is computed when ichimoku_prediction is read.
+        """
+        spans, _ = extrema.ichimoku(self.df['high'].to_numpy(dtype='float64', na_value=np.nan),
+                                    self.df['low'].to_numpy(dtype='float64', na_value=np.nan), tenkan, kijun, senkou)
+        for name, values in spans.items():
+            self.df[name] = values
+        self._prediction = None
+        return self.df[list(spans)]
+
+    @property
+    def ichimoku_prediction(self) -> pd.DataFrame:
+        """The ichimoku spans of the next 26 bars like the pandas_ta span frame, computed on first read per df"""
+        version = self._df_version()
+        if self._prediction is None or self._prediction[0] != version:
+            if self.df.empty or 'high' not in self.df.columns:
+                return pd.DataFrame()
+            _, ahead = extrema.ichimoku(self.df['high'].to_numpy(dtype='float64', na_value=np.nan),
+                                        self.df['low'].to_numpy(dtype='float64', na_value=np.nan), forward=True)
+            self._prediction = (version, extrema.prediction_frame(self.df.index, ahead))
+        return self._prediction[1]
+
+    def _calculate_pack(self, columns=None) -> list:
         """
-        * ichimoku
+        The indicator pack columns among `columns` (default the ones of the alert rules), their settings are in the
+        names (pandas_ta names). Returns the added columns.
         """
-        ichimoku_curent, self.ichimoku_prediction = ta.ichimoku(self.df['high'], self.df['low'], self.df['close'])
-        # print(ichimoku_curent[['ISA_9', 'ISB_26']])
-        self.df = pd.concat([self.df, ichimoku_curent[['ISA_9', 'ISB_26']]], axis=1)
-        return ichimoku_curent, self.ichimoku_prediction
+        columns = self.alert_plan.columns if columns is None else columns
+        wanted = [column for column in columns if pack.is_pack_column(column) and column not in self.df.columns]
+        if not wanted:
+            return []
+        with stage('calculate_pack', stock=self.stock_name):
+            values = pack.for_columns(self.df['high'], self.df['low'], self.df['close'], self.df['volume'], wanted)
+            for column, array in values.items():
+                self.df[column] = array
+        return list(values)
 
     def add_alerts(self) -> pd.DataFrame:
         """
@@ -155,97 +239,71 @@ class Stock:
         5. Supertrend + Ichimoku - when all directions are 1 and is over Ichimoku, BUY, when one supertrend goes -1, SELL
         6. EMA200 + curent - when is over EMA200, BUY, when is under, SELL
         7. SMA20 or SMA50 + curent - when is over SMA20 or SMA50, BUY, when is under, SELL (slower can be better for profit)
+        The rules are in alerts.default_rules (or the ones given to the constructor), alert_type keeps the last matching
+        rule and alert_types all of them.
         """
-        self.df['alert_type'] = ''
-        # MACD
-        if 'histogram' in self.df.columns:
-            # Check if the histogram is in the correct direction:
-            mask_up = ((self.df['histogram'] > 0) & (self.df['histogram'].shift(1) < 0))
-            mask_down = ((self.df['histogram'] < 0) & (self.df['histogram'].shift(1) > 0))
-            self.df.loc[mask_up, 'alert_type'] = 'MACD UP'
-            self.df.loc[mask_down, 'alert_type'] = 'MACD DOWN'
-
-        # RSI
-        if 'rsi' in self.df.columns:
-            rsi_up = ((self.df['rsi'] > 30) & (self.df['rsi'].shift(1) < 30))
-            self.df.loc[rsi_up, 'alert_type'] = 'RSI UP'
-
-            rsi_watch = ((self.df['rsi'] > 70) & (self.df['rsi'].shift(1) < 70))
-            self.df.loc[rsi_watch, 'alert_type'] = 'RSI WATCH'
-
-            rsi_down = ((self.df['rsi'] < 70) & (self.df['rsi'].shift(1) > 70))
-            self.df.loc[rsi_down, 'alert_type'] = 'RSI SECURE'
-
-        #  Supertrend watch
-        if all(col in self.df.columns for col in ['SUPERTd_10_1.0', 'SUPERTd_11_2.0', 'SUPERTd_12_3.0']):
-            st_alert = (
-                    (self.df['SUPERTd_10_1.0'] == 1) & (self.df['SUPERTd_10_1.0'].shift(1) == -1)
-                    |
-                    (self.df['SUPERTd_11_2.0'] == 1) & (self.df['SUPERTd_11_2.0'].shift(1) == -1)
-                    |
-                    (self.df['SUPERTd_12_3.0'] == 1) & (self.df['SUPERTd_12_3.0'].shift(1) == -1)
-            )
-            self.df.loc[st_alert, 'alert_type'] = 'Supertrend WATCH'
-
-        # Supertrend
-        if all(col in self.df.columns for col in ['SUPERTd_10_1.0', 'SUPERTd_11_2.0', 'SUPERTd_12_3.0']):
-            # Check if the supertrend is in the correct direction:
-            st_up = (
-                    ((self.df['SUPERTd_10_1.0'] == 1) & (self.df['SUPERTd_11_2.0'] == 1) & (
-                            self.df['SUPERTd_12_3.0'] == 1))
-                    &
-                    ((self.df['SUPERTd_10_1.0'].shift(1) == -1) | (self.df['SUPERTd_11_2.0'].shift(1) == -1) | (
-                            self.df['SUPERTd_12_3.0'].shift(1) == -1))
-            )
-            self.df.loc[st_up, 'alert_type'] = 'Supertrend UP'
-
-            st_down = (
-                    ((self.df['SUPERTd_10_1.0'] == -1) & (self.df['SUPERTd_11_2.0'] == -1) & (
-                            self.df['SUPERTd_12_3.0'] == -1))
-                    &
-                    ((self.df['SUPERTd_10_1.0'].shift(1) == 1) | (self.df['SUPERTd_11_2.0'].shift(1) == 1) | (
-                            self.df['SUPERTd_12_3.0'].shift(1) == 1))
-            )
-            self.df.loc[st_down, 'alert_type'] = 'Supertrend DOWN'
-
-        # Supertrend + Ichimoku
-        if all(col in self.df.columns for col in
-               ['ISA_9', 'ISB_26', 'SUPERT_10_1.0', 'SUPERT_11_2.0', 'SUPERT_12_3.0']):
-            # Take the smallest value of supertrends from one row and keep it:
-
-            st_value = self.df[['SUPERT_10_1.0', 'SUPERT_11_2.0', 'SUPERT_12_3.0']].min(axis=1)
-            st_ichimoku = (
-                    (self.df['ISA_9'] < st_value) &
-                    (self.df['ISB_26'] < st_value) &
-                    ((self.df['ISA_9'].shift(1) > st_value.shift(1)) | (self.df['ISB_26'].shift(1) > st_value.shift(1)))
-            )
-            self.df.loc[st_ichimoku, 'alert_type'] = 'Supertrend + Ichimoku UP'
-            # Alert if is down (optional)
-            # self.df.loc[st_up, 'alert_type'] = 'ichimoku_up'
-            # st_down = (
-            #     ((self.df['ISA_9'] > st_value) | (self.df['ISB_26'] > st_value)) &
-            #     ((self.df['ISA_9'].shift(1) < st_value.shift(1)) & (self.df['ISB_26'].shift(1) < st_value.shift(1)))
-            #            )
-            # self.df.loc[st_down, 'alert_type'] = 'ichimoku_down'
-
-        # Supertrend + sma20, we can also have a look on the long range sma50, ema200 ...
-        if all(col in self.df.columns for col in ['ema', 'SUPERTd_10_1.0', 'SUPERTd_11_2.0', 'SUPERTd_12_3.0']):
-            # Check if any of the supertrend moved in the correct direction:
-            st_sma20 = (
-                    (
-                            (self.df['SUPERTd_10_1.0'] == 1) & (self.df['SUPERTd_10_1.0'].shift(1) == -1)
-                            |
-                            (self.df['SUPERTd_11_2.0'] == 1) & (self.df['SUPERTd_11_2.0'].shift(1) == -1)
-                            |
-                            (self.df['SUPERTd_12_3.0'] == 1) & (self.df['SUPERTd_12_3.0'].shift(1) == -1)
-                    )
-                    &
-                    (self.df['close'] > self.df['sma20'])
-            )
-            self.df.loc[st_sma20, 'alert_type'] = 'supertrend + sma20 UP'
+        if self.lazy:
+            self.ensure(self.alert_plan.columns)
+        version = self._df_version()
+        if self._alerts_cache is not None and self._alerts_cache[0] == version:
+            return self._alerts_cache[1]
+
+        with stage('add_alerts', stock=self.stock_name):
+            self.alert_plan.apply(self.df)
+            if self.compact:
+                self._compact()
 
         # Return only the alerted rows:
-        return self.df[self.df['alert_type'] != ''].dropna()
+        alerted = self.df[self.df['alert_type'] != ''].dropna()
+        self._alerts_cache = (self._df_version(), alerted)
+        return alerted
+
+    def _df_version(self) -> tuple:
+        """Changes when df is replaced or gets new bars, used to know if the cached alerts are still good"""
+        return id(self.df), len(self.df), self.df.index[-1] if len(self.df) else None, len(self.df.columns)
+
+    def recent_alerts(self, start_time: float) -> pd.DataFrame:
+        """
+        The alerted rows (as add_alerts) with the index after start_time, but the rules are evaluated only on these
+        bars plus the previous ones they look at (shift). The alert columns are written only for these bars and only
+        when one of them has an alert.
+        """
+        if self.lazy:
+            self.ensure(self.alert_plan.columns)
+        version = self._df_version()
+        if self._alerts_cache is not None and self._alerts_cache[0] == version:  # everything is already computed
+            alerted = self._alerts_cache[1]
+            return alerted[alerted.index.astype(int) > start_time]
+
+        index_as_int = np.asarray(self.df.index.astype(int))
+        recent = len(index_as_int) - int(np.searchsorted(index_as_int, start_time, side='right'))
+        if self._recent_cache is not None and self._recent_cache[:2] == (version, recent):
+            return self._recent_cache[2]
+
+        plan = self.alert_plan
+        start = max(len(self.df) - recent - plan.lookback, 0)
+        # plain numpy slices of the needed columns, pandas costs more than the rules on a few bars
+        masks = plan.evaluate({column: self.df[column].to_numpy(dtype='float64', na_value=np.nan)[start:]
+                               for column in plan.columns
+                               if column in self.df.columns}) if recent else {}
+        codes = plan.codes(masks, (len(self.df) - start,))[len(self.df) - start - recent:]
+        if not codes.any():
+            alerted = self.df.iloc[0:0]
+        else:
+            labels = np.array([''] + plan.names, dtype=object)
+            alert_types = [', '.join(name for name, mask in masks.items() if mask[i])
+                           for i in range(len(self.df) - start - recent, len(self.df) - start)]
+            for column, values in (('alert_type', labels[codes]), ('alert_types', alert_types)):
+                if column not in self.df.columns:
+                    self.df[column] = ''
+                elif isinstance(self.df[column].dtype, pd.CategoricalDtype):  # compact, new labels may come
+                    self.df[column] = self.df[column].astype(object)
+                self.df.iloc[-recent:, self.df.columns.get_loc(column)] = values
+            if self.compact:
+                self._compact()
+            alerted = self.df.iloc[-recent:][codes > 0].dropna()
+        self._recent_cache = (self._df_version(), recent, alerted)
+        return alerted
 
     def calculate_all(self):
         """
@@ -253,20 +311,131 @@ class Stock:
         """
         print(f'Computing {self.stock_name} signals')
         try:
-            self._calculate_macd()
-            self._calculate_rsi()
-            self._calculate_ichimoku()
-            self._calculate_ema()
-            self._calculate_sma()
-            self._calculate_supertrend()
+            for name in CALCULATORS:
+                self._calculate(name)
+            self._calculate_pack()
         except Exception as e:
             print(f"For {self.stock_name} {self.df} got error {e}")
-        self.add_alerts()
+        self._computed = set(CALCULATORS)
+        if self.compact:
+            self._compact()
+        self._alerts_cache = self._recent_cache = None
+        if not self.tail_alerts:
+            self.add_alerts()
         self.df.dropna()
         # print(f"{self.df.iloc[-15:][['date', 'close', 'histogram', 'rsi', 'ISA_9', 'ISB_26', 'ema', 'sma20', 'sma50',
         #  'SUPERT_10_1.0', 'SUPERTd_10_1.0', 'SUPERT_11_2.0', 'SUPERTd_11_2.0', 'SUPERT_12_3.0', 'SUPERTd_12_3.0']]}")
         return self.df
 
+    def _calculate(self, name: str):
+        """Run one _calculate_* with its params, if they were given, timed as the calculate_* stage"""
+        with stage(name.lstrip('_'), stock=self.stock_name):
+            return self._run_calculator(name)
+
+    def _run_calculator(self, name: str):
+        key = PARAMS.get(name)
+        if key not in self.params:
+            return getattr(self, name)()
+        value = self.params[key]
+        if key == 'supertrends':
+            return self._calculate_supertrend(supertrends=value)
+        return getattr(self, name)(*value) if isinstance(value, (list, tuple)) else getattr(self, name)(value)
+
+    def _compact(self):
+        """Switch the columns that are not compact yet to the compact dtypes (see the constructor)"""
+        df = self.df
+        if 'date' in df.columns and df.index.name == 'timestamp':
+            df.drop(columns='date', inplace=True)
+        for column in df.columns:
+            dtype = df[column].dtype
+            if isinstance(dtype, pd.CategoricalDtype):
+                continue
+            if column.startswith('SUPERTd_'):
+                if dtype != 'Int8':
+                    df[column] = df[column].astype('Int8')
+            elif column == 'alert_type':
+                df[column] = pd.Categorical(df[column], categories=[''] + self.alert_plan.names)
+            elif column in ('stock', 'alert_types'):
+                df[column] = df[column].astype('category')
+            elif dtype == 'float64' and column not in PRICE_COLUMNS:
+                df[column] = df[column].astype('float32')
+
+    def export_frame(self) -> pd.DataFrame:
+        """df with the plain date column, also in compact mode (for the exports and notifications)"""
+        if 'date' in self.df.columns or self.df.index.name != 'timestamp':
+            return self.df
+        df = self.df.copy()
+        df.insert(0, 'date', pd.to_datetime(df.index, unit='s'))
+        return df
+
+    def ensure(self, columns) -> set:
+        """
+        Compute the indicators needed for these columns if they are not in df yet (each _calculate_* runs once).
+        Columns that are not indicators (close, ...) are ignored. Returns the _calculate_* that were run.
+        """
+        needed = {INDICATORS.get(column, '_calculate_supertrend' if column.startswith('SUPERT') else None)
+                  for column in columns if column not in self.df.columns} - self._computed - {None}
+        for name in CALCULATORS:  # always in the calculate_all order
+            if name in needed:
+                try:
+                    self._calculate(name)
+                except Exception as e:
+                    print(f"For {self.stock_name} {name} got error {e}")
+                self._computed.add(name)
+        try:  # the pack columns are computed per column, their settings are in the names
+            if self._calculate_pack(columns):
+                needed.add('_calculate_pack')
+        except Exception as e:
+            print(f"For {self.stock_name} _calculate_pack got error {e}")
+        if needed and self.compact:
+            self._compact()
+        return needed
+
+    def indicator(self, column: str) -> pd.Series:
+        """One indicator column, computed on the first access"""
+        self.ensure([column])
+        return self.df[column]
+
+    def enable_streaming(self, state: bytes | None = None, **kwargs) -> IndicatorStream:
+        """
+        Switch to incremental mode, the indicators state is built from the current df (or restored from `state`,
+        saved with self.stream.to_bytes()) and then every update() costs O(1) for the indicators.
+        kwargs are the IndicatorStream parameters.
+        """
+        kwargs = {**self.params, **kwargs}
+        self.stream = IndicatorStream.from_bytes(state) if state else IndicatorStream.from_frame(self.df, **kwargs)
+        return self.stream
+
+    def update(self, new_bar: dict, append: bool = True) -> dict:
+        """
+        Advance all indicators with a new closed bar {'open', 'high', 'low', 'close', 'volume'} and optional
+        'timestamp'/'date'. With append the row is also added to self.df.
+        Returns the new row.
+        """
+        if self.stream is None:
+            self.enable_streaming()
+        row = {**new_bar, 'stock': self.stock_name, **self.stream.update(new_bar)}
+        if append:
+            if 'timestamp' in row or 'date' in row and self.df.index.name == 'timestamp':
+                index = row.pop('timestamp') if 'timestamp' in row else \
+                    int(intraday._epoch_seconds(naive_dates(pd.Series([row['date']])))[0])
+                if 'date' in self.df.columns or not self.compact:
+                    row.setdefault('date', pd.to_datetime(index, unit='s'))
+                else:
+                    row.pop('date', None)
+            else:
+                index = self.df.index[-1] + 1 if len(self.df) else 0
+            if 'alert_type' in self.df.columns:
+                row['alert_type'] = ''
+            self.df.loc[index] = pd.Series(row)
+            pack_columns = [column for column in self.df.columns if pack.is_pack_column(column)]
+            if pack_columns:  # not incremental, the pack is computed again on the history (O(n) per bar)
+                values = pack.for_columns(self.df['high'], self.df['low'], self.df['close'], self.df['volume'],
+                                          pack_columns)
+                for column, array in values.items():
+                    row[column] = self.df.loc[index, column] = array[-1]
+        return row
+
     def save_to_pickle(self, storage: str | None = None, time_see: str | None = None, **kwargs) -> str:
         """
         Local saves the dataframe to a pickle file.
@@ -314,14 +483,24 @@ class Stock:
 
         return start_time
 
+    def cutoff_time(self) -> float:
+        """
+        Timestamp after which an alert is new: by the market hours for the daily bars (_find_time), by the bar size
+        for the intraday ones (the last closed bar and the one still forming)
+        """
+        if intraday.is_intraday(self.granularity):
+            return intraday.cutoff(self.granularity, offset=self.offset)
+        return self._find_time()
+
     def check_alerts(self, obj: Stock) -> bool:
         """
-        Check if the alerts are in the dataframe.
-        # this is made for the daily granularity
+        Check if the alerts are in the dataframe, only the bars after obj.cutoff_time() count.
+        With tail_alerts only the bars after the start time are evaluated.
         """
         # # timestamp now
-        start_time = self._find_time()
-        df = obj.add_alerts()
+        with stage('check_alerts', stock=obj.stock_name):
+            start_time = obj.cutoff_time()
+            df = obj.recent_alerts(start_time) if obj.tail_alerts else obj.add_alerts()
         df_index_as_int = df.index.astype(int)
         try:
             return bool(df_index_as_int[-1] > start_time)  # to catch when issue with dataframe
@@ -332,45 +511,24 @@ class Stock:
 
 def save_stocks_to_s3(stock_objects: list, bucket: str, key: str, file_type: str = "csv"):
     """
-    Take a list of Stock objects concatenate all dataframes from it and save it to pickle(or csv) in a s3 bucket
+    Take a list of Stock objects and save all their dataframes to pickle(or csv) in a s3 bucket, one after the other
+    (no concat of all of them for the csv)
     # TODO Add more saving options
     """
-    df = pd.concat([obj.df for obj in stock_objects])
-    s3_resource = boto3.resource('s3')
-    if file_type == "csv":
-        key += ".csv"
-        file_buffer = df.to_csv().encode("utf-8")
-    else:
-        key = key + ".pkl"
-        pickle_buffer = io.BytesIO()
-        df.to_pickle(pickle_buffer)
-        pickle_buffer.seek(0)
-        file_buffer = pickle_buffer.getvalue()
-        pickle_buffer.close()
-
-    file_stream = io.BytesIO(file_buffer)
+    save_df_to_s3([obj.df for obj in stock_objects], bucket, key, file_type,
+                  names=[stock.stock_name for stock in stock_objects])
 
+
+def save_df_to_s3(df: pd.DataFrame | list, bucket: str, key: str, file_type: str = "csv", names: list | None = None,
+                  chunk_rows: int = CHUNK_ROWS):
+    """
+    Save one dataframe (or a list of them, written as their concat) to pickle(or csv) in a s3 bucket.
+    It is streamed with a multipart upload, chunk_rows rows at a time, the whole file is never in memory.
+    """
+    key += ".csv" if file_type == "csv" else ".pkl"
     try:
-        s3_resource.Object(bucket, key).put(Body=file_stream.getvalue())
+        with S3Backend(bucket).open_write(key) as stream:
+            write_frame(df, stream, file_type, chunk_rows)
         print(f"Saved file {key} to {bucket}")
     except Exception as e:
-        print(f"ERROR: Failed to save {[stock.stock_name for stock in stock_objects]} {bucket}/{key} to s3: {e}")
-    finally:
-        file_stream.close()
-
-
-# TODO: New computations, actually I'm looking for "Trend Strength Index"
-"""
-        - calculate_stochastic_oscillator: Calculate the stochastic oscillator indicator for the stock
-        - calculate_williams_r: Calculate the williams r indicator for the stock
-        - calculate_adx: Calculate the adx indicator for the stock
-        - calculate_aroon: Calculate the aroon indicator for the stock
-        - calculate_cci: Calculate the cci indicator for the stock
-        - calculate_mfi: Calculate the mfi indicator for the stock
-        - calculate_obv: Calculate the obv indicator for the stock
-        - calculate_roc: Calculate the roc indicator for the stock
-        - calculate_stdev: Calculate
-        - calculate_stochastic: Calculate the stochastic indicator for the stock (defaults 14
-        - calculate_bollinger_bands: Calculate the bollinger bands indicator for the stock
-
-"""
+        print(f"ERROR: Failed to save {names} {bucket}/{key} to s3: {e}")
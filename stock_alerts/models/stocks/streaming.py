@@ -0,0 +1,250 @@
+from __future__ import annotations
+
+import math
+import pickle
+from collections import deque
+
+import pandas as pd
+
+nan = math.nan
+
+
+class EWM:
+    """
+    One value at a time version of pd.Series.ewm(...).mean(), same weights and NaN handling (ignore_na=False).
+    """
+
+    def __init__(self, span: float | None = None, com: float | None = None, alpha: float | None = None,
+                 adjust: bool = True, min_periods: int = 0):
+        if span is not None:
+            alpha = 2.0 / (span + 1.0)
+        elif com is not None:
+            alpha = 1.0 / (1.0 + com)
+        self.adjust = adjust
+        self.min_periods = max(min_periods, 1)
+        self.old_wt_factor = 1.0 - alpha
+        self.new_wt = 1.0 if adjust else alpha
+        self.old_wt = 1.0
+        self.weighted = nan
+        self.nobs = 0
+
+    def update(self, value: float) -> float:
+        is_observation = value == value
+        self.nobs += is_observation
+        if self.weighted == self.weighted:
+            self.old_wt *= self.old_wt_factor
+            if is_observation:
+                if self.weighted != value:
+                    self.weighted = (self.old_wt * self.weighted + self.new_wt * value) / (self.old_wt + self.new_wt)
+                if self.adjust:
+                    self.old_wt += self.new_wt
+                else:
+                    self.old_wt = 1.0
+        elif is_observation:
+            self.weighted = value
+        return self.weighted if self.nobs >= self.min_periods else nan
+
+
+class RollingMean:
+    """
+    Running sum over the last `window` values, NaN until the window is full or while a NaN is in it (like
+    rolling(window).mean()). The NaN are counted, not summed, so the mean comes back once they leave the window.
+    """
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque()
+        self.total = 0.0
+        self.nans = 0
+
+    def update(self, value: float) -> float:
+        self.values.append(value)
+        if value == value:
+            self.total += value
+        else:
+            self.nans += 1
+        if len(self.values) > self.window:
+            old = self.values.popleft()
+            if old == old:
+                self.total -= old
+            else:
+                self.nans -= 1
+        return self.total / self.window if len(self.values) == self.window and not self.nans else nan
+
+    def __setstate__(self, state):
+        # the sum and the NaN count again from the window, a state saved with a NaN total is repaired
+        self.__dict__.update(state)
+        self.total = sum(value for value in self.values if value == value)
+        self.nans = sum(value != value for value in self.values)
+
+
+class RollingExtrema:
+    """
+    Rolling max (or min) over the last `window` values with a monotonic deque, amortized O(1) per value.
+    """
+
+    def __init__(self, window: int, mode: str = "max"):
+        self.window = window
+        self.is_max = mode == "max"
+        self.candidates = deque()  # (position, value), values are monotonic
+        self.position = 0
+
+    def update(self, value: float) -> float:
+        candidates = self.candidates
+        if self.is_max:
+            while candidates and candidates[-1][1] <= value:
+                candidates.pop()
+        else:
+            while candidates and candidates[-1][1] >= value:
+                candidates.pop()
+        candidates.append((self.position, value))
+        if candidates[0][0] <= self.position - self.window:
+            candidates.popleft()
+        self.position += 1
+        return candidates[0][1] if self.position >= self.window else nan
+
+
+class MidPrice:
+    """0.5 * (highest high + lowest low) of the last `window` bars"""
+
+    def __init__(self, window: int):
+        self.highest = RollingExtrema(window, "max")
+        self.lowest = RollingExtrema(window, "min")
+
+    def update(self, high: float, low: float) -> float:
+        return 0.5 * (self.highest.update(high) + self.lowest.update(low))
+
+
+class SupertrendState:
+    """
+    Same computation as pandas_ta.supertrend (ATR as RMA seeded with the SMA of the first `length` true ranges),
+    one bar at a time.
+    """
+
+    def __init__(self, length: int = 10, multiplier: float = 1.0):
+        self.length = length
+        self.multiplier = float(multiplier)
+        self.atr = EWM(alpha=1.0 / length, adjust=False)
+        self.first_ranges = []
+        self.count = 0
+        self.prev_close = nan
+        self.prev_lower = nan
+        self.prev_upper = nan
+        self.direction = 1
+
+    @property
+    def names(self) -> tuple:
+        props = f"_{self.length}_{self.multiplier}"
+        return f"SUPERT{props}", f"SUPERTd{props}"
+
+    def update(self, high: float, low: float, close: float) -> tuple:
+        true_range = high - low
+        if self.prev_close == self.prev_close:
+            true_range = max(true_range, abs(high - self.prev_close), abs(self.prev_close - low))
+
+        if self.count < self.length:  # seed the RMA with the SMA of the first ranges
+            self.first_ranges.append(true_range)
+            atr = self.atr.update(sum(self.first_ranges) / self.length) if self.count == self.length - 1 else nan
+        else:
+            atr = self.atr.update(true_range)
+
+        hl2 = 0.5 * (high + low)
+        lower = hl2 - self.multiplier * atr
+        upper = hl2 + self.multiplier * atr
+
+        if self.count > 0:
+            if close > self.prev_upper:
+                self.direction = 1
+            elif close < self.prev_lower:
+                self.direction = -1
+            else:
+                if self.direction > 0 and lower < self.prev_lower:
+                    lower = self.prev_lower
+                if self.direction < 0 and upper > self.prev_upper:
+                    upper = self.prev_upper
+
+        trend = lower if self.direction > 0 else upper
+        direction = self.direction if self.count >= self.length else nan
+        if self.count == 0:
+            trend = nan
+
+        self.count += 1
+        self.prev_close, self.prev_lower, self.prev_upper = close, lower, upper
+        return trend, direction
+
+
+class IndicatorStream:
+    """
+    Keeps the state of all the Stock indicators and advances them one bar at a time, O(1) per bar.
+    The values match Stock._calculate_* (batch) up to float rounding and use the same column names.
+    """
+
+    def __init__(self, macd: tuple = (12, 26, 9), rsi: int = 14, ema: int = 200, sma: tuple = (20, 50),
+                 ichimoku: tuple = (9, 26, 52), supertrends: tuple = ((10, 1), (11, 2), (12, 3))):
+        n_fast, n_slow, n_signal = macd
+        self.ema_fast = EWM(span=n_fast, min_periods=n_slow)
+        self.ema_slow = EWM(span=n_slow, min_periods=n_slow)
+        self.macd_signal = EWM(span=n_signal, min_periods=n_signal)
+        self.rsi_up = EWM(com=rsi - 1, adjust=False)
+        self.rsi_down = EWM(com=rsi - 1, adjust=False)
+        self.ema = EWM(span=ema, min_periods=ema)
+        self.sma = {f"sma{n}": RollingMean(n) for n in sma}
+        tenkan, kijun, senkou = ichimoku
+        self.ichimoku_names = (f"ISA_{tenkan}", f"ISB_{kijun}")
+        self.tenkan = MidPrice(tenkan)
+        self.kijun = MidPrice(kijun)
+        self.senkou = MidPrice(senkou)
+        self.spans = deque([(nan, nan)] * (kijun - 1), maxlen=kijun)  # spans are shown kijun - 1 bars later
+        self.supertrends = [SupertrendState(length, multiplier) for length, multiplier in supertrends]
+        self.prev_close = nan
+        self.last = {}
+
+    def update(self, bar: dict) -> dict:
+        """
+        Advance all indicators with a closed bar ({'open', 'high', 'low', 'close', ...}).
+        Returns the indicator values of the bar.
+        """
+        high, low, close = float(bar['high']), float(bar['low']), float(bar['close'])
+        row = {}
+
+        macd = self.ema_fast.update(close) - self.ema_slow.update(close)
+        signal = self.macd_signal.update(macd)
+        row['macd'], row['signal'], row['histogram'] = macd, signal, macd - signal
+
+        delta = close - self.prev_close
+        ema_up = self.rsi_up.update(max(delta, 0.0) if delta == delta else nan)
+        ema_down = self.rsi_down.update(-min(delta, 0.0) if delta == delta else nan)
+        total = ema_up + ema_down
+        row['rsi'] = ema_up / total * 100 if total else nan
+
+        tenkan = self.tenkan.update(high, low)
+        kijun = self.kijun.update(high, low)
+        self.spans.append((0.5 * (tenkan + kijun), self.senkou.update(high, low)))
+        row[self.ichimoku_names[0]], row[self.ichimoku_names[1]] = self.spans[0]
+
+        row['ema'] = self.ema.update(close)
+        for name, sma in self.sma.items():
+            row[name] = sma.update(close)
+
+        for supertrend in self.supertrends:
+            trend_name, direction_name = supertrend.names
+            row[trend_name], row[direction_name] = supertrend.update(high, low, close)
+
+        self.prev_close = close
+        self.last = row
+        return row
+
+    @classmethod
+    def from_frame(cls, df: pd.DataFrame, **kwargs) -> IndicatorStream:
+        """Warm up the state from an existing Stock.df (or any frame with high/low/close)"""
+        stream = cls(**kwargs)
+        for high, low, close in zip(df['high'].tolist(), df['low'].tolist(), df['close'].tolist()):
+            stream.update({'high': high, 'low': low, 'close': close})
+        return stream
+
+    def to_bytes(self) -> bytes:
+        return pickle.dumps(self)
+
+    @staticmethod
+    def from_bytes(data: bytes) -> IndicatorStream:
+        return pickle.loads(data)
@@ -0,0 +1,15 @@
+from __future__ import annotations
+
+import numpy as np
+
+from .panel import supertrend_columns
+
+
+def supertrend(high, low, close, params: tuple = ((10, 1), (11, 2), (12, 3))) -> dict:
+    """
+    All the (length, multiplier) supertrends of one ticker, same values as pandas_ta.supertrend.
+    The ticker is a one row panel, so Stock, compute_panel and the sweep share panel.supertrend_columns.
+    Returns {'SUPERT_<length>_<multiplier>': array, 'SUPERTd_<length>_<multiplier>': array, ...}
+    """
+    rows = [np.asarray(x, dtype='float64')[None] for x in (high, low, close)]
+    return {name: values[0] for name, values in supertrend_columns(*rows, params).items()}
@@ -0,0 +1,174 @@
+from __future__ import annotations
+
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from . import extrema
+from .alerts import AlertPlan, default_rules
+from .backtest import report, simulate
+from .panel import Panel, average_true_range, ewm, rolling_mean, shift, true_range
+from .panel import supertrend as panel_supertrend
+
+nan = np.nan
+DEFAULTS = {'macd': (12, 26, 9), 'rsi': 14, 'ema': 200, 'supertrends': ((10, 1), (11, 2), (12, 3))}
+METRICS = ('pnl', 'hit_rate', 'mean', 'max_drawdown', 'trades')
+
+
+class IndicatorCache:
+    """
+    The indicators of one panel for any settings, the intermediates are computed once and shared by all the grid
+    points: the ewm of close per span (MACD fast/slow, EMA), the price diff and its RSI parts, the true range and the
+    ATR per length (all the multipliers of a length), the supertrend per (length, multiplier), the rolling
+    highs/lows of the ichimoku and the SMAs.
+    """
+
+    def __init__(self, panel: Panel):
+        self.panel = panel
+        self.observed = np.cumsum(~np.isnan(panel.close), axis=1)  # for the min_periods of the ewm
+        self._memo = {}
+
+    def _get(self, key: tuple, build):
+        try:
+            return self._memo[key]
+        except KeyError:
+            value = self._memo[key] = build()
+            return value
+
+    def _close_ewm(self, span: int, min_periods: int) -> np.ndarray:
+        # min_periods only hides the first values, the ewm itself is shared
+        values = self._get(('ewm', span), lambda: ewm(self.panel.close, 2 / (span + 1)))
+        return np.where(self.observed >= max(min_periods, 1), values, nan)
+
+    def macd(self, n_fast: int = 12, n_slow: int = 26, n_signal: int = 9) -> dict:
+        def build():
+            macd = self._close_ewm(n_fast, n_slow) - self._close_ewm(n_slow, n_slow)
+            signal = ewm(macd, 2 / (n_signal + 1), min_periods=n_signal)
+            return {'macd': macd, 'signal': signal, 'histogram': macd - signal}
+        return self._get(('macd', n_fast, n_slow, n_signal), build)
+
+    def rsi(self, n: int = 14) -> dict:
+        def parts():
+            delta = self.panel.close - shift(self.panel.close)
+            with np.errstate(invalid='ignore'):
+                return (np.where(np.isnan(delta), nan, np.clip(delta, 0, None)),
+                        np.where(np.isnan(delta), nan, -np.clip(delta, None, 0)))
+
+        def build():
+            up, down = self._get(('delta',), parts)
+            ema_up = ewm(up, 1 / n, adjust=False)
+            ema_down = ewm(down, 1 / n, adjust=False)
+            with np.errstate(invalid='ignore', divide='ignore'):
+                return {'rsi': ema_up / (ema_up + ema_down) * 100}
+        return self._get(('rsi', n), build)
+
+    def ema(self, n: int = 200) -> dict:
+        return {'ema': self._close_ewm(n, n)}
+
+    def sma(self, windows: tuple = (20, 50)) -> dict:
+        return {f"sma{n}": self._get(('sma', n), lambda n=n: rolling_mean(self.panel.close, n)) for n in windows}
+
+    def ichimoku(self) -> dict:
+        def build():
+            return extrema.ichimoku(self.panel.high, self.panel.low)[0]
+        return self._get(('ichimoku',), build)
+
+    def supertrend(self, length: int, multiplier: float) -> dict:
+        def build():
+            panel = self.panel
+            tr = self._get(('tr',), lambda: true_range(panel.high, panel.low, panel.close))
+            atr = self._get(('atr', length), lambda: average_true_range(tr, ~np.isnan(panel.close), length))
+            trend, direction = panel_supertrend(panel.high, panel.low, panel.close, length, float(multiplier), atr)
+            props = f"_{length}_{float(multiplier)}"
+            return {f"SUPERT{props}": trend, f"SUPERTd{props}": direction}
+        return self._get(('supertrend', length, float(multiplier)), build)
+
+    def indicators(self, params: dict | None = None) -> dict:
+        """All the Stock columns for these settings (missing keys are the defaults), like compute_panel"""
+        params = {**DEFAULTS, **(params or {})}
+        out = {**self.macd(*params['macd']), **self.rsi(params['rsi']), **self.ichimoku(), **self.ema(params['ema']),
+               **self.sma()}
+        for length, multiplier in params['supertrends']:
+            out.update(self.supertrend(length, multiplier))
+        return out
+
+
+def grid_points(grid: dict) -> list:
+    """{'rsi': [7, 14], 'macd': [(12, 26, 9), (8, 21, 5)]} -> [{'rsi': 7, 'macd': (12, 26, 9)}, ...]"""
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*(grid[key] for key in keys))]
+
+
+def _sweep_chunk(frames: dict, points: list, rules: list | None, options: dict) -> pd.DataFrame:
+    cache = IndicatorCache(Panel.from_frames(frames))
+    tables = []
+    for i, params in enumerate(points):
+        supertrends = tuple(tuple(pair) for pair in params.get('supertrends', DEFAULTS['supertrends']))
+        plan = AlertPlan(rules if rules is not None else default_rules(supertrends))
+        trades = simulate(cache.panel, plan, cache.indicators(params), **options)
+        table = report(trades, by=('stock',))
+        table['point'] = i
+        tables.append(table.reset_index())
+    return pd.concat(tables, ignore_index=True) if tables else pd.DataFrame()
+
+
+def sweep(frames: dict, grid: dict, rules: list | None = None, metric: str = "pnl", horizon: int = 10,
+          fees: float = 0.0, exit_on_opposite: bool = True, max_workers: int = 1, chunk_size: int = 250) -> pd.DataFrame:
+    """
+    Backtest every combination of the grid for every ticker and rank them per ticker.
+    The tickers are split in chunks (in a process pool when max_workers > 1), each chunk computes the shared
+    intermediates once (IndicatorCache) for all the grid points.
+    :param grid: {'macd': [(12, 26, 9), ...], 'rsi': [...], 'ema': [...], 'supertrends': [((10, 1), ...), ...]}
+    :param rules: The rules to backtest, default the default_rules of each supertrends setting
+    :param metric: One of METRICS, max_drawdown ranks the smallest first
+    :return: stock, rank, the params columns, trades, hit_rate, pnl, mean, worst, max_drawdown
+    """
+    if metric not in METRICS:
+        raise ValueError(f"Unknown metric {metric}, use one of {METRICS}")
+    points = grid_points(grid)
+    frames = {ticker: df for ticker, df in frames.items() if df is not None and len(df) > 0}
+    tickers = list(frames)
+    chunks = [{ticker: frames[ticker] for ticker in tickers[i:i + chunk_size]}
+              for i in range(0, len(tickers), chunk_size)]
+    options = {'horizon': horizon, 'fees': fees, 'exit_on_opposite': exit_on_opposite}
+    if max_workers > 1 and len(chunks) > 1:
+        with ProcessPoolExecutor(max_workers=max_workers) as executor:
+            tables = list(executor.map(_sweep_chunk, chunks, [points] * len(chunks), [rules] * len(chunks),
+                                       [options] * len(chunks)))
+    else:
+        tables = [_sweep_chunk(chunk, points, rules, options) for chunk in chunks]
+    tables = [table for table in tables if len(table)]
+    if not tables:
+        return pd.DataFrame(columns=['stock', 'rank', *grid, 'trades', 'hit_rate', 'pnl', 'mean', 'worst',
+                                     'max_drawdown'])
+
+    table = pd.concat(tables, ignore_index=True)
+    params = pd.DataFrame(points)
+    table = table.join(params, on='point')
+    table = table.sort_values(['stock', metric, 'point'], ascending=[True, metric == 'max_drawdown', True],
+                              kind='stable', ignore_index=True)
+    table.insert(1, 'rank', table.groupby('stock').cumcount() + 1)
+    return table[['stock', 'rank', *grid, 'trades', 'hit_rate', 'pnl', 'mean', 'worst', 'max_drawdown']]
+
+
+def best_params(table: pd.DataFrame, min_trades: int = 1) -> dict:
+    """
+    {ticker: params} of the best ranked grid point with at least min_trades trades, the Lambda event `params` /
+    Stock(params=...)
+    """
+    names = [column for column in table.columns if column in DEFAULTS]
+    best = {}
+    for row in table[table['trades'] >= min_trades].sort_values(['stock', 'rank']).itertuples(index=False):
+        if row.stock not in best:
+            row = row._asdict()
+            best[row['stock']] = {name: _plain(row[name]) for name in names}
+    return best
+
+
+def _plain(value):
+    """tuples to lists and numpy numbers to python ones, for JSON"""
+    if isinstance(value, (tuple, list)):
+        return [_plain(item) for item in value]
+    return value.item() if isinstance(value, np.generic) else value
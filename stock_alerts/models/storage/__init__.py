@@ -0,0 +1,5 @@
+from .alert_log import AlertLog, compact
+from .backends import LocalBackend, aws_client, MultipartWriter, S3Backend, backend_from_url
+from .database import StockDB
+from .export import write_csv, write_frame, write_frames, write_pickle
+from .ohlcv import OHLCVStore, normalize_ohlcv
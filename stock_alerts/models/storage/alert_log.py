@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+import io
+import json
+from datetime import datetime
+
+import pandas as pd
+
+CATEGORIES = ["stock", "alert_type", "alert_types"]
+COMPRESSIONS = ("snappy", "zstd", "gzip", "brotli", "lz4", "none")
+
+
+def compact(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Small schema for the saved rows: naive datetime `date`, float32 prices/indicators, categorical names.
+    The volume stays float64, float32 is not exact over 16M.
+    """
+    df = df.rename(columns={"Date": "date"})
+    if "date" not in df.columns and isinstance(df.index, pd.DatetimeIndex):
+        df = df.rename_axis("date").reset_index()
+    else:
+        df = df.reset_index(drop=True)
+    df["date"] = pd.to_datetime(df["date"])
+    if df["date"].dt.tz is not None:
+        df["date"] = df["date"].dt.tz_localize(None)
+    for col in df.columns:
+        if col in CATEGORIES:
+            df[col] = df[col].astype("category")
+        elif col != "volume" and pd.api.types.is_float_dtype(df[col]):
+            df[col] = df[col].astype("float32")
+    return df
+
+
+class AlertLog:
+    """
+    History of the alerted rows as parquet files in a storage backend (local folder or S3), partitioned like
+        <prefix>/month=2024-05/stock=AAPL/part-<run time>.parquet
+    Only the rows newer than the last saved one of each stock are written, the last saved dates are kept in
+    <prefix>/_watermarks.json so a run doesn't have to read the old files.
+    """
+
+    def __init__(self, backend, prefix: str = "alerts", compression: str = "snappy", partition: str = "M"):
+        """
+        :param compression: snappy, zstd, gzip, brotli, lz4 or none
+        :param partition: pandas period of the date partitions, D (one folder per day), M or Y
+        """
+        if compression not in COMPRESSIONS:
+            raise ValueError(f"Unknown compression {compression}, use one of {COMPRESSIONS}")
+        self.backend = backend
+        self.prefix = prefix.strip("/")
+        self.compression = None if compression == "none" else compression
+        self.partition = partition
+
+    @property
+    def _manifest_key(self) -> str:
+        return f"{self.prefix}/_watermarks.json"
+
+    def watermarks(self) -> dict:
+        """{stock: last saved date}"""
+        data = self.backend.read_bytes(self._manifest_key)
+        return {stock: pd.Timestamp(date) for stock, date in json.loads(data).items()} if data else {}
+
+    def new_rows(self, df: pd.DataFrame, watermarks: dict | None = None) -> pd.DataFrame:
+        """The rows after the watermark of their stock, in the compact schema"""
+        df = compact(df)
+        watermarks = self.watermarks() if watermarks is None else watermarks
+        if watermarks:
+            last = df["stock"].astype(object).map(watermarks)
+            df = df[last.isna() | (df["date"] > last)]
+        return df
+
+    def append(self, df: pd.DataFrame | list, run_time: datetime | None = None) -> list:
+        """
+        Save the new rows of df (it needs `stock` and `date` columns, e.g. panel.alert_rows) or of a list of frames
+        (e.g. the Stock.df of the alerted stocks, saved one after the other without a concat). Returns the written
+        keys.
+        """
+        watermarks = self.watermarks()
+        stamp = (run_time or datetime.now()).strftime("%Y%m%d%H%M%S%f")
+        keys = []
+        for frame in df if isinstance(df, list) else [df]:
+            frame = self.new_rows(frame, watermarks)
+            if frame.empty:
+                continue
+            periods = frame["date"].dt.to_period(self.partition).astype(str)
+            for (period, stock), part in frame.groupby([periods, frame["stock"].astype(object)], sort=True):
+                key = f"{self.prefix}/{self._period_name()}={period}/stock={stock}/part-{stamp}.parquet"
+                buffer = io.BytesIO()
+                part.sort_values("date").to_parquet(buffer, index=False, compression=self.compression)
+                self.backend.write_bytes(key, buffer.getvalue())
+                keys.append(key)
+                watermarks[stock] = max(watermarks.get(stock, part["date"].max()), part["date"].max())
+        if not keys:
+            return []
+
+        # the manifest goes last, a failed run writes its rows again instead of losing them
+        self.backend.write_bytes(self._manifest_key, json.dumps(
+            {stock: date.isoformat() for stock, date in sorted(watermarks.items())}).encode("utf-8"))
+        return keys
+
+    def _period_name(self) -> str:
+        return {"D": "day", "M": "month", "Y": "year"}.get(self.partition, "period")
+
+    def read(self, stocks: list | None = None, start: str | None = None) -> pd.DataFrame:
+        """
+        Saved rows of some stocks (all by default) from start on, only the matching partitions are read.
+        """
+        start_period = str(pd.Period(start, self.partition)) if start else None
+        frames = []
+        for key in self.backend.list_keys(f"{self.prefix}/"):
+            parts = dict(part.split("=", 1) for part in key.split("/")[:-1] if "=" in part)
+            if not key.endswith(".parquet") or "stock" not in parts:
+                continue
+            if stocks is not None and parts["stock"] not in stocks:
+                continue
+            if start_period and parts.get(self._period_name(), start_period) < start_period:
+                continue
+            frames.append(pd.read_parquet(io.BytesIO(self.backend.read_bytes(key))))
+        if not frames:
+            return pd.DataFrame()
+        df = pd.concat(frames, ignore_index=True)
+        for col in CATEGORIES:  # different categories per file come back as object
+            if col in df.columns:
+                df[col] = df[col].astype("category")
+        if start:
+            df = df[df["date"] >= pd.Timestamp(start)]
+        return df.sort_values(["stock", "date"], ignore_index=True)
+
+    def __repr__(self):
+        return f"AlertLog({self.backend}, {self.prefix})"
@@ -0,0 +1,199 @@
+from __future__ import annotations
+
+import os
+from contextlib import contextmanager
+from functools import lru_cache
+
+PART_SIZE = 8 * 1024 * 1024  # S3 wants at least 5MB for every part but the last
+MISSING_CODES = ("NoSuchKey", "404", "NotFound")  # a missing key, the code depends on the call and the permissions
+
+
+@lru_cache(maxsize=None)
+def aws_client(service: str):
+    """One boto3 client per service, created on first use and reused by the warm Lambda invocations"""
+    import boto3
+    return boto3.client(service)
+
+
+class LocalBackend:
+    """
+    Files in a local folder, used in tests and when running on a normal box.
+    Keys are paths relative to root, with '/' as separator (same as the S3 keys).
+    """
+
+    def __init__(self, root: str):
+        self.root = root
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.root, *key.split("/"))
+
+    def read_bytes(self, key: str) -> bytes | None:
+        try:
+            with open(self._path(key), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def write_bytes(self, key: str, data: bytes):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)  # readers never see half written files
+
+    @contextmanager
+    def open_write(self, key: str):
+        """Binary file for streaming writes, it replaces the key only when the block ends without errors"""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                yield f
+            os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def list_keys(self, prefix: str = "") -> list:
+        keys = []
+        for folder, _, files in os.walk(self.root):
+            for name in files:
+                key = os.path.relpath(os.path.join(folder, name), self.root).replace(os.sep, "/")
+                if key.startswith(prefix) and not key.endswith(".tmp"):
+                    keys.append(key)
+        return sorted(keys)
+
+    def __repr__(self):
+        return f"LocalBackend({self.root})"
+
+
+class S3Backend:
+    """
+    Objects in a S3 bucket, optional under a prefix. The client is created on first use.
+    """
+
+    def __init__(self, bucket: str, prefix: str = "", client=None):
+        self.bucket = bucket
+        self.prefix = prefix.strip("/")
+        self._client = client
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = aws_client("s3")
+        return self._client
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}/{key}" if self.prefix else key
+
+    def read_bytes(self, key: str) -> bytes | None:
+        """None when the key does not exist (S3 says so only with s3:ListBucket, else it is AccessDenied)"""
+        try:
+            return self.client.get_object(Bucket=self.bucket, Key=self._key(key))["Body"].read()
+        except Exception as e:  # botocore ClientError, also the modeled NoSuchKey
+            if getattr(e, "response", {}).get("Error", {}).get("Code") in MISSING_CODES:
+                return None
+            raise
+
+    def write_bytes(self, key: str, data: bytes):
+        self.client.put_object(Bucket=self.bucket, Key=self._key(key), Body=data)
+
+    @contextmanager
+    def open_write(self, key: str, part_size: int = PART_SIZE):
+        """
+        Binary file for streaming writes, uploaded with a multipart upload so only one part is kept in memory.
+        The upload is aborted when the block raises.
+        """
+        writer = MultipartWriter(self.client, self.bucket, self._key(key), part_size)
+        try:
+            yield writer
+        except BaseException:
+            writer.abort()
+            raise
+        writer.close()
+
+    def exists(self, key: str) -> bool:
+        return bool(self.list_keys(key))
+
+    def list_keys(self, prefix: str = "") -> list:
+        keys = []
+        paginator = self.client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=self.bucket, Prefix=self._key(prefix)):
+            for item in page.get("Contents", []):
+                key = item["Key"]
+                keys.append(key[len(self.prefix) + 1:] if self.prefix else key)
+        return sorted(keys)
+
+    def __repr__(self):
+        return f"S3Backend(s3://{self.bucket}/{self.prefix})"
+
+
+class MultipartWriter:
+    """
+    File like object (write/close) that uploads to S3 in parts of part_size bytes.
+    Small files (less than one part) are sent with a single put_object.
+    """
+
+    def __init__(self, client, bucket: str, key: str, part_size: int = PART_SIZE):
+        self.client = client
+        self.bucket = bucket
+        self.key = key
+        self.part_size = part_size
+        self.buffer = bytearray()
+        self.upload_id = None
+        self.parts = []
+        self.closed = False
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self.buffer += data
+        while len(self.buffer) >= self.part_size:
+            self._upload_part(self.part_size)
+        return len(data)
+
+    def _upload_part(self, size: int):
+        if self.upload_id is None:
+            self.upload_id = self.client.create_multipart_upload(Bucket=self.bucket, Key=self.key)["UploadId"]
+        number = len(self.parts) + 1
+        with memoryview(self.buffer) as view:
+            body = bytes(view[:size])  # one copy, slicing the bytearray would make two
+        del self.buffer[:size]
+        response = self.client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                           PartNumber=number, Body=body)
+        self.parts.append({"ETag": response["ETag"], "PartNumber": number})
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        if self.upload_id is None:
+            self.client.put_object(Bucket=self.bucket, Key=self.key, Body=bytes(self.buffer))
+        else:
+            if self.buffer:
+                self._upload_part(len(self.buffer))
+            self.client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                  MultipartUpload={"Parts": self.parts})
+        self.buffer = bytearray()
+
+    def abort(self):
+        self.closed = True
+        self.buffer = bytearray()
+        if self.upload_id is not None:
+            self.client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+
+
+def backend_from_url(url: str):
+    """
+    s3://bucket/prefix -> S3Backend, anything else is a local folder
+    """
+    if url.startswith("s3://"):
+        bucket, _, prefix = url[len("s3://"):].partition("/")
+        return S3Backend(bucket, prefix)
+    return LocalBackend(url)
@@ -0,0 +1,294 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from contextlib import contextmanager
+from datetime import timedelta
+from typing import Callable
+
+import numpy as np
+import pandas as pd
+
+from .ohlcv import COLUMNS, OHLCVStore, naive_dates, normalize_ohlcv
+
+KEY = ("ticker", "interval", "ts")  # ts is the bar time in epoch seconds (naive dates as UTC)
+PRICES = ("open", "high", "low", "close", "volume")
+
+
+def _epoch(dates) -> np.ndarray:
+    if isinstance(dates, pd.Series) and dates.dtype.kind == "M":  # naive datetime64, the usual Stock.df
+        return dates.to_numpy("datetime64[s]").astype("int64")
+    # tz aware dates like normalize_ohlcv: the market date for daily bars, UTC for intraday ones
+    return naive_dates(pd.Series(dates)).to_numpy("datetime64[s]").astype("int64")
+
+
+def _quote(name: str) -> str:
+    return '"' + name.replace('"', '""') + '"'
+
+
+class StockDB:
+    """
+    OHLCV bars, indicator columns and alert events in a SQL database, keyed and indexed on (ticker, interval, ts).
+    SQLite by default (a file, or :memory:), any DB-API connection with the same SQL works (e.g. Postgres with
+    placeholder="%s"), only the upsert (INSERT ... ON CONFLICT DO UPDATE) is needed.
+    Can be the OHLCV cache of the scan (fetch, same as OHLCVStore) and seeds Stock without a download (load).
+    """
+
+    def __init__(self, connection, interval: str = "1d", placeholder: str = "?", history_days: int = 2 * 365):
+        self.connection = connection
+        self.interval = interval
+        self.placeholder = placeholder
+        self.history_days = history_days
+        self._sqlite = isinstance(connection, sqlite3.Connection)
+        self._depth = 0  # nested batch() calls
+        self._lock = threading.RLock()  # one connection shared by the download threads
+        self._columns = {}  # table -> its columns, ALTER TABLE adds the new indicators
+        if self._sqlite:
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute("PRAGMA synchronous=NORMAL")
+        self._create()
+
+    @classmethod
+    def from_url(cls, url: str, **kwargs) -> StockDB:
+        """sqlite:///path/stocks.db, sqlite:///:memory: or a plain path"""
+        path = url[len("sqlite:///"):] if url.startswith("sqlite:///") else url
+        # the scan can write from the download threads, batch() keeps one writer at a time
+        return cls(sqlite3.connect(path, isolation_level=None, check_same_thread=False), **kwargs)
+
+    def _create(self):
+        options = " WITHOUT ROWID" if self._sqlite else ""
+        key = "ticker TEXT NOT NULL, interval TEXT NOT NULL, ts BIGINT NOT NULL"
+        with self.batch():
+            self._execute(f"CREATE TABLE IF NOT EXISTS bars ({key}, open REAL, high REAL, low REAL, close REAL, "
+                          f"volume REAL, PRIMARY KEY (ticker, interval, ts)){options}")
+            self._execute(f"CREATE TABLE IF NOT EXISTS indicators ({key}, PRIMARY KEY (ticker, interval, ts)){options}")
+            self._execute(f"CREATE TABLE IF NOT EXISTS alerts ({key}, alert_type TEXT, alert_types TEXT, close REAL, "
+                          f"PRIMARY KEY (ticker, interval, ts)){options}")
+            # latest alerts across all the tickers
+            self._execute("CREATE INDEX IF NOT EXISTS alerts_by_time ON alerts (interval, ts)")
+
+    def _execute(self, sql: str, params=()):
+        cursor = self.connection.cursor()
+        cursor.execute(sql, params)
+        return cursor
+
+    def _query(self, sql: str, params=()) -> pd.DataFrame:
+        with self._lock:
+            cursor = self._execute(sql, params)
+            rows = cursor.fetchall()
+        return pd.DataFrame(rows, columns=[column[0] for column in cursor.description])
+
+    @contextmanager
+    def batch(self):
+        """One transaction for all the writes in the block (a full watchlist ingest is one commit)"""
+        with self._lock:
+            if self._depth == 0 and self._sqlite:
+                self._execute("BEGIN")
+            self._depth += 1
+            try:
+                yield self
+            except BaseException:
+                self._depth -= 1
+                if self._depth == 0:
+                    self.connection.rollback()
+                raise
+            self._depth -= 1
+            if self._depth == 0:
+                self.connection.commit()
+
+    def close(self):
+        self.connection.close()
+
+    def table_columns(self, table: str) -> list:
+        with self._lock:
+            if table not in self._columns:
+                cursor = self._execute(f"SELECT * FROM {table} LIMIT 0")
+                self._columns[table] = [column[0] for column in cursor.description]
+            return self._columns[table]
+
+    def _add_columns(self, table: str, names: list):
+        for name in names:
+            if name not in self.table_columns(table):
+                self._execute(f"ALTER TABLE {table} ADD COLUMN {_quote(name)} REAL")
+                self._columns[table].append(name)
+
+    def upsert(self, table: str, ticker: str, ts: np.ndarray, columns: dict, interval: str | None = None) -> int:
+        """
+        Bulk insert or update of the rows of one ticker, NaN is stored as NULL.
+        :param columns: {column: values}, as long as ts
+        :return: the number of rows
+        """
+        if not len(ts):
+            return 0
+        names = list(columns)
+        values = []
+        for name in names:
+            column = np.asarray(columns[name])
+            values.append(np.where(pd.isna(column), None, column.astype(object)).tolist())  # python floats/str
+        rows = zip([ticker] * len(ts), [interval or self.interval] * len(ts), ts.tolist(), *values)
+
+        quoted = [*KEY, *map(_quote, names)]
+        marks = ", ".join([self.placeholder] * len(quoted))
+        update = ", ".join(f"{name} = excluded.{name}" for name in quoted[len(KEY):])
+        sql = (f"INSERT INTO {table} ({', '.join(quoted)}) VALUES ({marks}) ON CONFLICT (ticker, interval, ts) "
+               + (f"DO UPDATE SET {update}" if update else "DO NOTHING"))
+        with self.batch():
+            self.connection.cursor().executemany(sql, rows)
+        return len(ts)
+
+    def last_ts(self, ticker: str, interval: str | None = None) -> int | None:
+        """The last stored bar of ticker (the primary key answers it)"""
+        p = self.placeholder
+        with self._lock:
+            row = self._execute(f"SELECT MAX(ts) FROM bars WHERE ticker = {p} AND interval = {p}",
+                                (ticker, interval or self.interval)).fetchone()
+        return row[0] if row else None
+
+    def last_ts_all(self) -> dict:
+        """{(ticker, interval): the last stored bar} in one query"""
+        with self._lock:
+            rows = self._execute("SELECT ticker, interval, MAX(ts) FROM bars GROUP BY ticker, interval").fetchall()
+        return {(ticker, interval): ts for ticker, interval, ts in rows}
+
+    def save_ohlcv(self, ticker: str, df: pd.DataFrame, interval: str | None = None) -> int:
+        """yfinance/stooq/OHLCVStore frames (Date, Open, ...)"""
+        df = normalize_ohlcv(df)
+        return self.upsert("bars", ticker, _epoch(df["Date"]),
+                           {column.lower(): df[column].to_numpy() for column in COLUMNS[1:] if column in df.columns},
+                           interval)
+
+    def save_stock(self, stock, new_only: bool = True, last: dict | None = None) -> int:
+        """
+        Bars, indicators and alerts of a Stock. new_only writes only from the last stored bar (it is written again,
+        it could have been unfinished), the daily ingest of a watchlist is a few rows per ticker.
+        :param last: {(ticker, interval): last ts} when already known (ingest asks for all the tickers at once)
+        :return: the number of bars written
+        """
+        from ..stocks.intraday import normalize_granularity
+
+        df = stock.df
+        if not len(df):
+            return 0
+        if df.index.name == 'timestamp':  # the epoch seconds of the bars, also in compact mode (no date column)
+            ts = df.index.to_numpy().astype("int64")
+        elif 'date' in df.columns:
+            ts = _epoch(df['date'])
+        else:
+            print(f"ERROR {stock.stock_name} has no date or timestamp index, not saved")
+            return 0
+        interval = normalize_granularity(stock.granularity)
+        if new_only:
+            key = (stock.stock_name, interval)
+            last = last.get(key) if last is not None else self.last_ts(*key)
+            if last is not None:  # the bars are in time order, only the tail is written
+                start = int(np.searchsorted(ts, last))
+                df, ts = df.iloc[start:], ts[start:]
+        if not len(df):
+            return 0
+
+        dtypes = df.dtypes
+        numeric = [column for column in df.columns if column not in ('date', 'stock', 'timestamp', 'alert_type',
+                                                                     'alert_types')
+                   and pd.api.types.is_numeric_dtype(dtypes[column])]
+        # one object copy of the tail is cheaper than a Series per column (the compact Int8 columns have pd.NA)
+        table = df.to_numpy(dtype=object)
+        positions = {column: i for i, column in enumerate(df.columns)}
+        values = {column: np.where(pd.isna(table[:, positions[column]]), np.nan,
+                                   table[:, positions[column]]).astype("float64") for column in numeric}
+        indicators = [column for column in numeric if column not in PRICES]
+        with self.batch():
+            self.upsert("bars", stock.stock_name, ts, {column: values[column] for column in PRICES if column in values},
+                        interval)
+            self._add_columns("indicators", indicators)
+            self.upsert("indicators", stock.stock_name, ts, {column: values[column] for column in indicators}, interval)
+            if 'alert_type' in df.columns:
+                alert_type = table[:, positions['alert_type']]
+                alert_types = table[:, positions['alert_types']] if 'alert_types' in positions else alert_type
+                alerted = alert_type != ''
+                self.upsert("alerts", stock.stock_name, ts[alerted],
+                            {'alert_type': alert_type[alerted].astype(str),
+                             'alert_types': alert_types[alerted].astype(str), 'close': values['close'][alerted]},
+                            interval)
+        return len(df)
+
+    def ingest(self, stocks: list, new_only: bool = True) -> int:
+        """save_stock for all the stocks in one transaction"""
+        with self.batch():
+            last = self.last_ts_all() if new_only else None
+            return sum(self.save_stock(stock, new_only, last) for stock in stocks)
+
+    def _range(self, table: str, columns: str, ticker: str, start, end, interval: str | None) -> pd.DataFrame:
+        p = self.placeholder
+        sql = f"SELECT {columns} FROM {table} WHERE ticker = {p} AND interval = {p}"
+        params = [ticker, interval or self.interval]
+        if start is not None:
+            sql += f" AND ts >= {p}"
+            params.append(int(_epoch([start])[0]))
+        if end is not None:
+            sql += f" AND ts <= {p}"
+            params.append(int(_epoch([end])[0]))
+        return self._query(sql + " ORDER BY ts", params)
+
+    def load(self, ticker: str, start=None, end=None, interval: str | None = None) -> pd.DataFrame | None:
+        """
+        The stored bars of ticker between start and end (dates, both included) in the yfinance/stooq format,
+        Stock(ticker, db.load(ticker)) needs no download. None when nothing is stored.
+        """
+        df = self._range("bars", "ts, open, high, low, close, volume", ticker, start, end, interval)
+        if df.empty:
+            return None
+        df.insert(0, "Date", pd.to_datetime(df.pop("ts"), unit="s"))
+        df.columns = COLUMNS
+        return df.astype({column: "float64" for column in COLUMNS[1:]})
+
+    def load_indicators(self, ticker: str, start=None, end=None, interval: str | None = None) -> pd.DataFrame:
+        """The stored indicator columns of ticker, with the date"""
+        columns = ", ".join(map(_quote, ["ts", *self.table_columns("indicators")[len(KEY):]]))
+        df = self._range("indicators", columns, ticker, start, end, interval)
+        df.insert(0, "date", pd.to_datetime(df.pop("ts"), unit="s"))
+        return df
+
+    def latest_alerts(self, since=None, tickers: list | None = None, interval: str | None = None) -> pd.DataFrame:
+        """
+        The last alert of every ticker, or all the alerts after since (a date). Both are index lookups: the max ts per
+        ticker of the primary key, the ts range of alerts_by_time.
+        """
+        p = self.placeholder
+        params = [interval or self.interval]
+        if since is not None:
+            sql = f"SELECT ticker, ts, alert_type, alert_types, close FROM alerts WHERE interval = {p} AND ts > {p}"
+            params.append(int(_epoch([since])[0]))
+        else:
+            sql = (f"SELECT a.ticker, a.ts, a.alert_type, a.alert_types, a.close FROM alerts a JOIN "
+                   f"(SELECT ticker, MAX(ts) AS ts FROM alerts WHERE interval = {p} GROUP BY ticker) m "
+                   f"ON a.ticker = m.ticker AND a.ts = m.ts WHERE a.interval = {p}")
+            params.append(params[0])
+        if tickers:
+            sql += f" AND {'a.' if since is None else ''}ticker IN ({', '.join([p] * len(tickers))})"
+            params.extend(tickers)
+        df = self._query(sql + " ORDER BY 2 DESC, 1", params)
+        df.insert(1, "date", pd.to_datetime(df.pop("ts"), unit="s"))
+        return df.rename(columns={"ticker": "stock"})
+
+    def fetch(self, ticker: str, download: Callable) -> pd.DataFrame | None:
+        """
+        Same as OHLCVStore.fetch: download only from the last stored bars, all the history when the adjusted prices
+        changed (its bars overwrite the stored ones), the history_days before the last bar are returned.
+        """
+        cached = self.load(ticker)
+        new_data = download(ticker, OHLCVStore.missing_start(cached))
+        if new_data is None or new_data.empty:
+            print(f"No new data for {ticker}, using the cached one")
+            return cached
+        if OHLCVStore.readjusted(cached, new_data):
+            print(f"WARNING: {ticker} prices were re-adjusted (split or dividend), downloading all the history again")
+            history = download(ticker, None)
+            if history is not None and not history.empty:
+                new_data = history
+        self.save_ohlcv(ticker, new_data)
+        last = self.last_ts(ticker)
+        start = pd.Timestamp(last, unit="s") - timedelta(days=self.history_days) if self.history_days else None
+        return self.load(ticker, start=start)
+
+    def __repr__(self):
+        return f"StockDB({self.connection!r}, interval={self.interval!r})"
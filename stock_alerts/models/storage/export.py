@@ -0,0 +1,50 @@
+from __future__ import annotations
+
+import pickle
+
+import pandas as pd
+
+CHUNK_ROWS = 5000
+
+
+def write_csv(df: pd.DataFrame, stream, chunk_rows: int = CHUNK_ROWS, **kwargs) -> int:
+    """
+    Same bytes as df.to_csv(**kwargs).encode(), written to a binary stream chunk_rows rows at a time so only one
+    chunk is rendered in memory. Returns the number of bytes written.
+    """
+    written = 0
+    for start in range(0, max(len(df), 1), chunk_rows):
+        chunk = df.iloc[start:start + chunk_rows].to_csv(header=start == 0, **kwargs)
+        written += stream.write(chunk.encode("utf-8"))
+    return written
+
+
+def write_pickle(df: pd.DataFrame, stream):
+    """df.to_pickle to a stream, pickle writes the frame piece by piece without building the whole blob"""
+    pickle.dump(df, stream, protocol=pickle.HIGHEST_PROTOCOL)
+
+
+def write_frames(frames: list, stream, chunk_rows: int = CHUNK_ROWS, **kwargs) -> int:
+    """
+    Same bytes as pd.concat(frames).to_csv(**kwargs).encode() without the concat: the frames (e.g. the Stock.df of
+    the alerted stocks) are written one after the other on the columns of all of them, one chunk rendered at a time.
+    Returns the number of bytes written.
+    """
+    columns = list(dict.fromkeys(column for df in frames for column in df.columns))
+    written = 0
+    for i, df in enumerate(frames):
+        if list(df.columns) != columns:
+            df = df.reindex(columns=columns)  # the missing columns are empty, like in the concat
+        for start in range(0, max(len(df), 1 if i == 0 else 0), chunk_rows):
+            chunk = df.iloc[start:start + chunk_rows].to_csv(header=written == 0, **kwargs)
+            written += stream.write(chunk.encode("utf-8"))
+    return written
+
+
+def write_frame(df: pd.DataFrame | list, stream, file_type: str = "csv", chunk_rows: int = CHUNK_ROWS):
+    """df or a list of frames, a pickle is one object so the frames are concatenated for it"""
+    frames = df if isinstance(df, list) else [df]
+    if file_type == "csv":
+        write_frames(frames, stream, chunk_rows)
+    else:
+        write_pickle(pd.concat(frames) if len(frames) != 1 else frames[0], stream)
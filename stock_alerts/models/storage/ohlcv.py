@@ -0,0 +1,119 @@
+from __future__ import annotations
+
+import io
+from datetime import datetime, timedelta
+from typing import Callable
+
+import pandas as pd
+
+COLUMNS = ["Date", "Open", "High", "Low", "Close", "Volume"]
+ADJUST_TOLERANCE = 1e-4  # relative close difference of a stored bar that means the history was re-adjusted
+
+
+def naive_dates(dates: pd.Series) -> pd.Series:
+    """
+    yfinance dates are in the exchange timezone: the daily ones become the naive market date, the intraday ones naive
+    UTC like the clock the alerts compare with. Naive dates are returned as they are.
+    """
+    dates = pd.to_datetime(dates)
+    if dates.dt.tz is None:
+        return dates
+    if (dates == dates.dt.normalize()).all():  # daily, keep the local market date
+        return dates.dt.tz_localize(None)
+    return dates.dt.tz_convert("UTC").dt.tz_localize(None)
+
+
+def normalize_ohlcv(data: pd.DataFrame) -> pd.DataFrame:
+    """
+    Bring yfinance/stooq frames to the same shape: Date, Open, High, Low, Close, Volume with naive dates
+    (the market date for daily bars, UTC for the intraday ones).
+    """
+    df = data.rename(columns={"Datetime": "Date", "date": "Date", "open": "Open", "high": "High", "low": "Low",
+                              "close": "Close", "volume": "Volume"})
+    df = df[[col for col in COLUMNS if col in df.columns]].copy()
+    df["Date"] = naive_dates(df["Date"])
+    if "Volume" in df.columns:
+        df["Volume"] = df["Volume"].astype("float64")
+    return df
+
+
+class OHLCVStore:
+    """
+    Per ticker OHLCV history kept as parquet files in a storage backend (local folder or S3).
+    The history is fetched once, later runs download only the bars after the last stored date and merge them in, all
+    of it again when the adjusted prices changed.
+    """
+
+    def __init__(self, backend, prefix: str = "ohlcv", history_days: int = 2 * 365):
+        self.backend = backend
+        self.prefix = prefix
+        self.history_days = history_days
+
+    def _key(self, ticker: str) -> str:
+        return f"{self.prefix}/{ticker}.parquet"
+
+    def load(self, ticker: str) -> pd.DataFrame | None:
+        data = self.backend.read_bytes(self._key(ticker))
+        if data is None:
+            return None
+        return pd.read_parquet(io.BytesIO(data))
+
+    def save(self, ticker: str, df: pd.DataFrame):
+        buffer = io.BytesIO()
+        df.to_parquet(buffer, index=False)
+        self.backend.write_bytes(self._key(ticker), buffer.getvalue())
+
+    def merge(self, cached: pd.DataFrame | None, new_data: pd.DataFrame) -> pd.DataFrame:
+        """
+        Append the new bars, the last one wins for the same date (same as Stock._rename), older than the history
+        window is dropped.
+        """
+        new_data = normalize_ohlcv(new_data)
+        df = new_data if cached is None or cached.empty else pd.concat([cached, new_data], ignore_index=True)
+        df = df.drop_duplicates(subset=["Date"], keep="last").sort_values("Date", ignore_index=True)
+        if self.history_days:
+            df = df[df["Date"] >= df["Date"].iloc[-1] - timedelta(days=self.history_days)].reset_index(drop=True)
+        return df
+
+    @staticmethod
+    def missing_start(cached: pd.DataFrame | None) -> datetime | None:
+        """
+        From where we have to download. The last stored bar is asked again, it could be an unfinished day, and the
+        one before it too, a closed bar to compare with (see readjusted).
+        """
+        if cached is None or cached.empty:
+            return None
+        return cached["Date"].iloc[-min(len(cached), 2)].to_pydatetime()
+
+    @staticmethod
+    def readjusted(cached: pd.DataFrame | None, new_data: pd.DataFrame, tolerance: float = ADJUST_TOLERANCE) -> bool:
+        """
+        yfinance auto_adjust prices change all the history after a split or dividend, the appended bars would not
+        match the stored ones. True when a stored bar (not the last one, it could be unfinished) closes differently
+        in the new download.
+        """
+        if cached is None or len(cached) < 2:
+            return False
+        stored = cached.iloc[:-1].set_index("Date")["Close"]
+        fresh = normalize_ohlcv(new_data).drop_duplicates(subset=["Date"], keep="last").set_index("Date")["Close"]
+        stored, fresh = stored.align(fresh, join="inner")
+        return bool(((fresh - stored).abs() > tolerance * stored.abs()).any())
+
+    def fetch(self, ticker: str, download: Callable) -> pd.DataFrame | None:
+        """
+        Returns the full history for ticker.
+        :param download: download(ticker, start) -> pd.DataFrame, start is None when all the history is needed
+        """
+        cached = self.load(ticker)
+        new_data = download(ticker, self.missing_start(cached))
+        if new_data is None or new_data.empty:
+            print(f"No new data for {ticker}, using the cached one")
+            return cached
+        if self.readjusted(cached, new_data):
+            print(f"WARNING: {ticker} prices were re-adjusted (split or dividend), downloading all the history again")
+            history = download(ticker, None)
+            if history is not None and not history.empty:
+                cached, new_data = None, history
+        df = self.merge(cached, new_data)
+        self.save(ticker, df)
+        return df
@@ -0,0 +1 @@
+from .windows import FEATURES, WindowDataset
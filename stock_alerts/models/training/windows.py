@@ -0,0 +1,235 @@
+from __future__ import annotations
+
+import json
+import os
+from collections import OrderedDict
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+FEATURES = ('open', 'high', 'low', 'close', 'volume', 'macd', 'signal', 'histogram', 'rsi', 'ema', 'sma20', 'sma50',
+            'ISA_9', 'ISB_26')
+NORMALIZE = ('zscore', 'minmax')
+MAX_OPEN = 4096  # memmaps kept open at the same time (each is a mapping, not a file descriptor)
+
+
+def _safe_name(ticker: str) -> str:
+    return ticker.replace(os.sep, "_")
+
+
+class WindowDataset:
+    """
+    Fixed length sliding windows of the Stock indicator frames for the LSTM/GRU training, on disk:
+        root/manifest.json     the features, window, normalization and per ticker rows, last date and scaling stats
+        root/<ticker>.f32      rows x (features + raw close) float32, normalized, only appended to
+        root/<ticker>.dates    the bar dates (int64 ns)
+    A window is a strided view of the memmap (sliding_window_view), nothing is copied per window, so the RAM is the
+    batch being used whatever the number of tickers and years.
+    The scaling of a ticker (zscore or minmax per feature, like the min/max scaled closes of the notebook) is fitted on
+    its first rows and kept for the appended ones, the windows stay comparable over time.
+    """
+
+    def __init__(self, root: str, features: tuple | list = FEATURES, window: int = 60, horizon: int = 5,
+                 normalize: str = "zscore"):
+        """
+        Opens the dataset in root, or creates it with these settings (the stored ones win when it exists).
+        :param horizon: The target is the close return horizon bars after the end of a window
+        """
+        self.root = root
+        os.makedirs(root, exist_ok=True)
+        manifest = self._read_manifest()
+        if manifest is None:
+            if normalize not in NORMALIZE:
+                raise ValueError(f"Unknown normalize {normalize}, use one of {NORMALIZE}")
+            manifest = {'features': list(features), 'window': int(window), 'horizon': int(horizon),
+                        'normalize': normalize, 'tickers': {}}
+        self.manifest = manifest
+        self.features = manifest['features']
+        self.window = manifest['window']
+        self.horizon = manifest['horizon']
+        self.normalize = manifest['normalize']
+        self.width = len(self.features) + 1  # the raw close is the last column, for the targets
+        self._open = OrderedDict()  # ticker -> memmap, the last used at the end
+
+    def _manifest_path(self) -> str:
+        return os.path.join(self.root, "manifest.json")
+
+    def _read_manifest(self) -> dict | None:
+        try:
+            with open(self._manifest_path()) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return None
+
+    def save(self):
+        """Write the manifest (append(..., write_manifest=False) leaves it to the caller)"""
+        path = self._manifest_path()
+        with open(path + ".tmp", "w") as f:
+            json.dump(self.manifest, f)
+        os.replace(path + ".tmp", path)  # a reader never sees half a manifest
+
+    def _path(self, ticker: str, kind: str = "f32") -> str:
+        return os.path.join(self.root, f"{_safe_name(ticker)}.{kind}")
+
+    @property
+    def tickers(self) -> list:
+        return list(self.manifest['tickers'])
+
+    def _fit(self, values: np.ndarray) -> dict:
+        with np.errstate(invalid='ignore'):
+            if self.normalize == "minmax":
+                low, high = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+                return {'shift': low.tolist(), 'scale': np.where(high > low, high - low, 1.0).tolist()}
+            std = np.nanstd(values, axis=0)
+            return {'shift': np.nanmean(values, axis=0).tolist(), 'scale': np.where(std > 0, std, 1.0).tolist()}
+
+    def append(self, ticker: str, df: pd.DataFrame, write_manifest: bool = True) -> int:
+        """
+        Add the rows of df (a Stock.df / export_frame, with date and the feature columns) newer than the stored ones.
+        The first rows of a ticker start at its first bar with all the features (the indicator warm up is skipped).
+        :return: the number of rows appended
+        """
+        missing = [column for column in ('date', *self.features) if column not in df.columns]
+        if missing:
+            print(f"ERROR {ticker} has no {missing}, not added to the dataset")
+            return 0
+        info = self.manifest['tickers'].get(ticker)
+        dates = df['date'].to_numpy()
+        dates = (dates if dates.dtype.kind == 'M' else pd.to_datetime(dates).to_numpy()).astype('datetime64[ns]')
+        dates = dates.astype('int64')
+        # only the new tail is read, the daily append costs the same whatever the history
+        start = 0 if info is None else int(np.searchsorted(dates, info['last_date'], side='right'))
+        values = df.iloc[start:][list(self.features)].to_numpy(dtype='float64', na_value=np.nan)
+        dates = dates[start:]
+        if info is None:
+            complete = np.flatnonzero(~np.isnan(values).any(axis=1))
+            if not len(complete):
+                return 0
+            dates, values = dates[complete[0]:], values[complete[0]:]
+        if not len(dates):
+            return 0
+        if info is None:
+            info = self.manifest['tickers'][ticker] = {'rows': 0, 'last_date': None, **self._fit(values)}
+
+        scaled = (values - np.asarray(info['shift'])) / np.asarray(info['scale'])
+        rows = np.concatenate([np.nan_to_num(scaled, nan=0.0, posinf=0.0, neginf=0.0), values[:, [self.features.index(
+            'close')]] if 'close' in self.features else np.full((len(values), 1), np.nan)], axis=1).astype('float32')
+        self._open.pop(ticker, None)  # the memmap is opened again with the new size
+        # the rows after the manifest ones are from an append that never saved the manifest (e.g. an error in
+        # append_stocks), they are cut so the new rows follow the last stored ones
+        for kind, data, size in (("f32", rows, info['rows'] * self.width * 4), ("dates", dates, info['rows'] * 8)):
+            with open(self._path(ticker, kind), "ab") as f:
+                f.truncate(size)
+                f.write(data.tobytes())
+        info['rows'] += len(rows)
+        info['last_date'] = int(dates[-1])
+        if write_manifest:
+            self.save()
+        return len(rows)
+
+    def append_stocks(self, stocks) -> int:
+        """append for Stock objects (or {ticker: frame}), one manifest write at the end"""
+        items = stocks.items() if isinstance(stocks, dict) else ((stock.stock_name, stock.export_frame())
+                                                                  for stock in stocks)
+        total = sum(self.append(ticker, df, write_manifest=False) for ticker, df in items)
+        self.save()
+        return total
+
+    def append_db(self, db, tickers: list | None = None) -> int:
+        """append from a StockDB (bars + indicators), only the dates after the stored ones are read"""
+        if tickers is None:
+            tickers = sorted(ticker for ticker, interval in db.last_ts_all() if interval == db.interval)
+        total = 0
+        for ticker in tickers:
+            info = self.manifest['tickers'].get(ticker)
+            start = pd.Timestamp(info['last_date']) if info else None
+            bars = db.load(ticker, start=start)
+            if bars is None:
+                continue
+            bars.columns = ['date', *(column.lower() for column in bars.columns[1:])]
+            df = bars.merge(db.load_indicators(ticker, start=start), on='date', how='left')
+            total += self.append(ticker, df, write_manifest=False)
+        self.save()
+        return total
+
+    def _rows(self, ticker: str) -> np.ndarray:
+        """The read only memmap of a ticker, at most MAX_OPEN stay open"""
+        if ticker in self._open:
+            self._open.move_to_end(ticker)
+            return self._open[ticker]
+        rows = self.manifest['tickers'][ticker]['rows']
+        data = np.memmap(self._path(ticker), dtype='float32', mode='r', shape=(rows, self.width))
+        self._open[ticker] = data
+        if len(self._open) > MAX_OPEN:
+            self._open.popitem(last=False)
+        return data
+
+    def count(self, ticker: str) -> int:
+        return max(self.manifest['tickers'][ticker]['rows'] - self.window + 1, 0)
+
+    def __len__(self):
+        return sum(self.count(ticker) for ticker in self.tickers)
+
+    def windows(self, ticker: str) -> np.ndarray:
+        """(windows, window, features) view of the memmap, window i is rows i .. i + window - 1"""
+        rows = self._rows(ticker)
+        if len(rows) < self.window:
+            return np.empty((0, self.window, len(self.features)), dtype='float32')
+        return sliding_window_view(rows[:, :-1], self.window, axis=0).transpose(0, 2, 1)
+
+    def targets(self, ticker: str) -> np.ndarray:
+        """The close return horizon bars after the last bar of each window, NaN when it is not known yet"""
+        close = np.asarray(self._rows(ticker)[:, -1], dtype='float64')
+        end = np.arange(self.window - 1, len(close))
+        future = np.full(len(end), np.nan)
+        known = end + self.horizon < len(close)
+        future[known] = close[end[known] + self.horizon]
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return future / close[end] - 1
+
+    def dates(self, ticker: str) -> np.ndarray:
+        """The date of the last bar of each window"""
+        dates = np.memmap(self._path(ticker, "dates"), dtype='int64', mode='r')
+        return dates[self.window - 1:].astype('datetime64[ns]')
+
+    def batches(self, batch_size: int = 256, tickers: list | None = None, shuffle: bool = False, seed=None,
+                labeled: bool = True):
+        """
+        Yields (x, y, ticker) batches, x is (batch, window, features) float32.
+        In order (default) a batch is consecutive windows of one ticker: x is a view of the memmap, no copy.
+        shuffle takes random windows of all the tickers: only the batch is gathered in memory.
+        :param labeled: Skip the last windows without a target yet (their y is NaN otherwise)
+        """
+        tickers = self.tickers if tickers is None else tickers
+        if not shuffle:
+            for ticker in tickers:
+                x, y = self.windows(ticker), self.targets(ticker)
+                if labeled:
+                    known = len(y) - int(np.isnan(y[::-1]).argmin()) if len(y) and not np.isnan(y).all() else 0
+                    x, y = x[:known], y[:known]
+                for start in range(0, len(x), batch_size):
+                    yield x[start:start + batch_size], y[start:start + batch_size], ticker
+            return
+
+        counts = np.array([self.count(ticker) for ticker in tickers])
+        owners = np.repeat(np.arange(len(tickers)), counts)
+        positions = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        order = np.random.default_rng(seed).permutation(len(owners))
+        for start in range(0, len(order), batch_size):
+            picked = order[start:start + batch_size]
+            x = np.empty((len(picked), self.window, len(self.features)), dtype='float32')
+            y = np.empty(len(picked))
+            for i, (owner, position) in enumerate(zip(owners[picked], positions[picked])):
+                rows = self._rows(tickers[owner])  # slicing the memmap rows, no window view per sample
+                end = position + self.window - 1
+                x[i] = rows[position:end + 1, :-1]
+                y[i] = float(rows[end + self.horizon, -1]) / float(rows[end, -1]) - 1 \
+                    if end + self.horizon < len(rows) else np.nan
+            if labeled:
+                known = ~np.isnan(y)
+                x, y = x[known], y[known]
+            yield x, y, None
+
+    def __repr__(self):
+        return f"WindowDataset({self.root!r}, {len(self.tickers)} tickers, window={self.window})"
@@ -0,0 +1,92 @@
+import io
+import json
+import time
+
+import pandas as pd
+
+from stock_alerts.models.fanout import LambdaDispatcher, LocalDispatcher, reduce_results, shard, shard_events, \
+    worker_result
+
+SECONDS_PER_STOCK = 0.05
+
+
+def slow_worker(event: dict) -> dict:
+    """Stands in for lambda_handler in worker mode, every stock takes the same time"""
+    if "bad" in event['stock_list']:
+        raise RuntimeError("download failed")
+    time.sleep(SECONDS_PER_STOCK * len(event['stock_list']))
+    stock = event['stock_list'][0]
+    df = pd.DataFrame({"stock": [stock], "date": [pd.Timestamp("2024-01-02")], "close": [1.5]})
+    return worker_result(event, [{stock: "MACD UP"}], df)
+
+
+def test_shard_events_keep_the_options():
+    event = {"pass": "pass", "stock_list": list("abcde"), "engine": "panel"}
+    assert shard(event['stock_list'], 2) == [["a", "b"], ["c", "d"], ["e"]]
+    events = shard_events(event, 2)
+    assert [e['stock_list'] for e in events] == [["a", "b"], ["c", "d"], ["e"]]
+    assert all(e['worker'] and e['engine'] == "panel" for e in events)
+    assert [e['shard'] for e in events] == [0, 1, 2]
+
+
+def test_reduce_merges_alerts_and_rows_in_shard_order():
+    results = LocalDispatcher(slow_worker).map(shard_events({"stock_list": list("abcd")}, 1))
+    alerts, df, errors = reduce_results(results[::-1])
+    assert alerts == [{"a": "MACD UP"}, {"b": "MACD UP"}, {"c": "MACD UP"}, {"d": "MACD UP"}]
+    assert df["stock"].tolist() == list("abcd")
+    assert df["date"].iloc[0] == pd.Timestamp("2024-01-02")
+    assert errors == {}
+
+
+def test_worker_sends_the_last_alerted_row_of_each_stock():
+    # the stock engine gives the whole history of the alerted stocks
+    frames = []
+    for stock, alerted in (("a.us", 497), ("b.us", 499)):
+        alert_types = [""] * 500
+        alert_types[10] = alert_types[alerted] = "MACD UP"
+        frames.append(pd.DataFrame({"stock": stock, "date": pd.date_range("2023-01-01", periods=500),
+                                    "close": range(500), "alert_types": alert_types}))
+    result = worker_result({"shard": 0}, [{"a.us": "MACD UP"}, {"b.us": "MACD UP"}], pd.concat(frames))
+    _, df, _ = reduce_results([result])
+    assert df["stock"].tolist() == ["a.us", "b.us"] and df["close"].tolist() == [497, 499]
+
+
+def test_failed_shard_does_not_lose_the_others():
+    alerts, df, errors = reduce_results(LocalDispatcher(slow_worker).map(
+        shard_events({"stock_list": ["a", "bad", "c"]}, 1)))
+    assert alerts == [{"a": "MACD UP"}, {"c": "MACD UP"}]
+    assert list(errors) == [1]
+
+
+def test_wall_clock_does_not_grow_with_the_watchlist():
+    def run(n_stocks):
+        start = time.perf_counter()
+        LocalDispatcher(slow_worker).map(shard_events({"stock_list": [f"s{i}" for i in range(n_stocks)]}, 4))
+        return time.perf_counter() - start
+
+    run(4)  # warm up the imports of the pool
+    small, large = run(4), run(32)
+    print(f"4 stocks {small:.2f}s, 32 stocks {large:.2f}s, sequential would be {32 * SECONDS_PER_STOCK:.2f}s")
+    assert large < 32 * SECONDS_PER_STOCK / 2
+    assert large < small * 3
+
+
+class FakeLambda:
+    def __init__(self):
+        self.calls = []
+
+    def invoke(self, FunctionName, InvocationType, Payload):
+        event = json.loads(Payload)
+        self.calls.append((FunctionName, InvocationType, event['shard']))
+        if event['shard'] == 1:
+            return {"FunctionError": "Unhandled", "Payload": io.BytesIO(b'{"errorMessage": "Task timed out"}')}
+        return {"Payload": io.BytesIO(json.dumps(slow_worker(event)).encode())}
+
+
+def test_lambda_dispatcher_invokes_every_shard():
+    client = FakeLambda()
+    results = LambdaDispatcher("stock-alerts", client=client).map(shard_events({"stock_list": list("abc")}, 1))
+    alerts, df, errors = reduce_results(results)
+    assert sorted(client.calls) == [("stock-alerts", "RequestResponse", i) for i in range(3)]
+    assert alerts == [{"a": "MACD UP"}, {"c": "MACD UP"}]
+    assert errors == {1: "Task timed out"}
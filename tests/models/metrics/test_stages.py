@@ -0,0 +1,68 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_alerts.models.metrics import StageTimer, active, measure, profiled, stage
+from stock_alerts.models.stocks import Stock
+
+
+def test_no_timer_no_records():
+    assert active() is None
+    with stage("download", stock="a.us"):
+        pass
+    with measure() as timer:
+        assert active() is timer
+    assert active() is None and timer.records == []
+
+
+def test_summary_and_errors():
+    with measure() as timer:
+        with stage("download", stock="a.us", source="yfinance"):
+            pass
+        with pytest.raises(ValueError):
+            with stage("download", stock="a.us", source="stooq"):
+                raise ValueError("no data")
+        with stage("rename", stock="b.us"):
+            pass
+    summary = timer.summary()
+    assert summary["download"]["count"] == 2
+    assert summary["download:stooq"]["count"] == 1
+    assert set(timer.by_stock()) == {"a.us", "b.us"}
+    assert timer.records[1][2]["error"] == "ValueError"
+
+
+def test_emf_lines():
+    timer = StageTimer()
+    for i in range(150):
+        timer.record("calculate_macd", 0.001, stock=f"s{i}")
+    lines = [json.loads(line) for line in timer.emf(FunctionName="scan")]
+    metrics = [line for line in lines if "_aws" in line]
+    assert [len(line["Duration"]) for line in metrics if line["Stage"] == "calculate_macd"] == [100, 50]
+    for line in metrics:
+        definition = line["_aws"]["CloudWatchMetrics"][0]
+        assert definition["Dimensions"] == [["FunctionName", "Stage"]]
+        assert all(metric["Name"] in line for metric in definition["Metrics"])
+    assert sum(line.get("type") == "stock_timing" for line in lines) == 150
+
+
+def test_stock_stages():
+    close = 100 + np.cumsum(np.random.default_rng(0).normal(0, 1.5, 300))
+    df = pd.DataFrame({"Date": pd.date_range("2023-01-02", periods=300, freq="B"), "Open": close, "High": close + 1,
+                       "Low": close - 1, "Close": close, "Volume": 1000.0})
+    with measure() as timer:
+        Stock("a.us", df)
+    stages = timer.by_stock()["a.us"]
+    assert {"rename", "calculate_macd", "calculate_ichimoku", "add_alerts"} <= set(stages)
+
+
+def test_profiled():
+    with profiled("cprofile,tracemalloc", top=5) as profile:
+        np.cumsum(np.ones(10000))
+    report = profile.report()
+    assert "cumulative" in report["cprofile"]
+    assert report["tracemalloc"]["peak_mb"] > 0
+    with profiled(None) as profile:
+        pass
+    assert profile.report() == {}
@@ -0,0 +1,100 @@
+import pandas as pd
+
+from stock_alerts.models.notify import AlertState, Channel, FileChannel, Notifier, alerts_from_frame, batches
+from stock_alerts.models.storage import LocalBackend
+from stock_alerts.models.stock_requests import Backoff
+
+
+def alert_frame(day="2024-05-02"):
+    return pd.DataFrame({
+        'stock': ["a.us", "a.us", "b.us", "c.us"],
+        'date': pd.to_datetime(["2024-05-01", day, day, day]),
+        'close': [10.0, 11.0, 20.0, 30.0],
+        'alert_type': ["RSI 30", "MACD UP", "RSI 70", "Supertrend UP"],
+        'alert_types': ["RSI 30", "MACD UP, RSI 30", "RSI 70", ""],
+    })
+
+
+class Flaky(Channel):
+    name = "flaky"
+
+    def __init__(self, failures):
+        self.failures = failures
+        self.sent = []
+
+    def send(self, subject, text):
+        if self.failures:
+            self.failures -= 1
+            raise ConnectionError("down")
+        self.sent.append(text)
+
+
+def test_alerts_from_frame():
+    alerts = alerts_from_frame(alert_frame())
+    assert [alert[:2] for alert in alerts] == [("a.us", "MACD UP"), ("a.us", "RSI 30"), ("b.us", "RSI 70"),
+                                               ("c.us", "Supertrend UP")]
+    assert alerts[0][2] == int(pd.Timestamp("2024-05-02").timestamp())
+
+
+def test_alert_before_the_last_bar():
+    # the alert is on the second to last bar, the last one is quiet (a forming intraday bar, today's daily bar)
+    df = pd.DataFrame({'stock': "a.us", 'date': pd.date_range("2024-05-01", periods=3, freq="D"),
+                       'close': [10.0, 11.0, 12.0], 'alert_type': ["", "MACD UP", ""],
+                       'alert_types': ["", "MACD UP, RSI 30", ""]})
+    alerts = alerts_from_frame(df)
+    ts = int(pd.Timestamp("2024-05-02").timestamp())
+    assert alerts == [("a.us", "MACD UP", ts, "2024-05-02 00:00:00", 11.0),
+                      ("a.us", "RSI 30", ts, "2024-05-02 00:00:00", 11.0)]
+
+
+def test_batches_fit_the_size():
+    alerts = [(f"t{i}.us", "RSI 30", 0, "2024-05-02", 1.0) for i in range(100)]
+    out = batches(alerts, max_bytes=300, header="At now:")
+    assert len(out) > 1 and all(len(text.encode()) <= 300 for text, _ in out)
+    assert sum(len(members) for _, members in out) == 100
+    assert batches(alerts[:3], 10_000, "At now:")[0][0].count("\n") == 3
+
+
+def test_duplicates_are_not_sent_again(tmp_path):
+    sink = FileChannel(str(tmp_path / "alerts.jsonl"))
+    state = AlertState(LocalBackend(str(tmp_path)))
+    report = Notifier([sink], state).notify(alerts_from_frame(alert_frame()))
+    assert report['file'] == {'sent': 4, 'messages': 1, 'failed': 0, 'duplicates': 0}
+    assert "a.us 2024-05-02 00:00:00 close 11: MACD UP, RSI 30" in sink.read()[0]['text']
+
+    # the second run of the day, a new process: nothing new
+    report = Notifier([sink], AlertState(LocalBackend(str(tmp_path)))).notify(alerts_from_frame(alert_frame()))
+    assert report['file']['duplicates'] == 4 and report['file']['messages'] == 0
+    assert len(sink.read()) == 1
+
+    # the next bar is new
+    state = AlertState(LocalBackend(str(tmp_path)))
+    report = Notifier([sink], state).notify(alerts_from_frame(alert_frame("2024-05-03")))
+    assert report['file']['sent'] == 4 and len(sink.read()) == 2
+
+
+def test_retries_and_failed_channel_stays_pending(tmp_path):
+    state = AlertState(LocalBackend(str(tmp_path)))
+    alerts = alerts_from_frame(alert_frame())
+    flaky, down = Flaky(failures=2), Flaky(failures=100)
+    down.name = "down"
+    notifier = Notifier([flaky, down], state, backoff=Backoff(retries=2), sleep=lambda seconds: None)
+    report = notifier.notify(alerts)
+    assert report['flaky']['sent'] == 4 and len(flaky.sent) == 1
+    assert report['down']['failed'] == 4
+    assert state.pending(alerts, "flaky") == [] and state.pending(alerts, "down") == alerts
+
+    down.failures = 0
+    report = Notifier([flaky, down], AlertState(LocalBackend(str(tmp_path)))).notify(alerts)
+    assert report['flaky']['duplicates'] == 4 and report['down']['sent'] == 4 and len(flaky.sent) == 1
+
+
+def test_old_entries_are_dropped(tmp_path):
+    now = [1_000_000.0]
+    state = AlertState(LocalBackend(str(tmp_path)), keep_days=1, clock=lambda: now[0])
+    alerts = alerts_from_frame(alert_frame())
+    state.mark(alerts[:1], "sns")
+    now[0] += 2 * 24 * 60 * 60
+    state.mark(alerts[1:], "sns")
+    state.save()
+    assert len(AlertState(LocalBackend(str(tmp_path)))) == 3
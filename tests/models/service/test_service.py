@@ -0,0 +1,83 @@
+import asyncio
+
+import numpy as np
+import pandas as pd
+
+from stock_alerts.models.service import AlertService, FileReplayFeed, QueueFeed
+from stock_alerts.models.stocks import Stock
+
+WARM_UP = 260  # all the indicators of Stock.df are there after it, so its dropna drops nothing
+
+
+def bars(stock: str, n: int = 400, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1.5, n))
+    open_ = close + rng.normal(0, 0.5, n)
+    return pd.DataFrame({"stock": stock, "timestamp": 1_700_000_000 + 60 * np.arange(n), "open": open_,
+                         "high": np.maximum(open_, close) + rng.uniform(0, 1.5, n),
+                         "low": np.minimum(open_, close) - rng.uniform(0, 1.5, n), "close": close,
+                         "volume": rng.integers(1_000, 100_000, n).astype(float)})
+
+
+def test_replay_matches_stock_alerts(tmp_path):
+    frames = [bars(f"s{seed}.us", seed=seed) for seed in range(4)]
+    path = str(tmp_path / "bars.csv")
+    pd.concat(frames).to_csv(path, index=False)
+    received = []
+    service = AlertService(FileReplayFeed(path), notify=received.extend)
+    stats = asyncio.run(service.run())
+
+    expected = set()
+    for df in frames:
+        stock = Stock(df['stock'][0], {'t': df['timestamp'].tolist(), **{key[0]: df[key].tolist() for key in
+                                                                            ("open", "high", "low", "close", "volume")}})
+        alerted = stock.add_alerts()
+        alerted = alerted[alerted.index >= df['timestamp'][WARM_UP]]
+        expected |= {(row.stock, index, row.alert_types) for index, row in alerted.iterrows()}
+    result = {(alert['stock'], alert['timestamp'], alert['alert_types']) for alert in received
+              if alert['timestamp'] >= frames[0]['timestamp'][WARM_UP]}
+    assert expected and result == expected
+    assert stats['bars'] == 1600 and stats['batches'] == 400 and stats['alerts'] == len(received)
+
+
+def test_ticks_are_built_into_bars(tmp_path):
+    ticks = pd.DataFrame({"stock": "a.us", "timestamp": [0, 10, 50, 61, 200], "price": [1.0, 3.0, 2.0, 5.0, 4.0],
+                          "size": [1, 1, 1, 1, 1]})
+    path = str(tmp_path / "ticks.jsonl")
+    ticks.to_json(path, orient="records", lines=True)
+
+    async def collect():
+        feed = FileReplayFeed(path)
+        return [bar async for batch in feed for bar in batch]
+
+    assert asyncio.run(collect()) == [
+        {'stock': 'a.us', 'timestamp': 0, 'open': 1.0, 'high': 3.0, 'low': 1.0, 'close': 2.0, 'volume': 3},
+        {'stock': 'a.us', 'timestamp': 60, 'open': 5.0, 'high': 5.0, 'low': 5.0, 'close': 5.0, 'volume': 1},
+        {'stock': 'a.us', 'timestamp': 180, 'open': 4.0, 'high': 4.0, 'low': 4.0, 'close': 4.0, 'volume': 1},
+    ]
+
+
+def test_queue_feed_and_async_notify():
+    df = bars("a.us", n=300, seed=3)
+    notified = []
+
+    async def notify(alerts):
+        await asyncio.sleep(0.01)  # slow channel, the bars don't wait for it
+        notified.extend(alerts)
+
+    async def main():
+        feed = QueueFeed()
+        await feed.subscribe(["a.us"])
+        service = AlertService(feed, notify=notify)
+        service.warm_up("a.us", df.iloc[:250])
+        runner = asyncio.create_task(service.run())
+        for bar in df.iloc[250:].to_dict('records'):
+            await feed.put([bar, {**bar, 'stock': "other.us"}])
+        await feed.put(df.iloc[-1:].to_dict('records'))  # sent again, ignored
+        await feed.close()
+        return service, await runner
+
+    service, stats = asyncio.run(main())
+    assert list(service.tickers) == ["a.us"]
+    assert stats['bars'] == 51 and stats['alerts'] == len(notified)
+    assert stats['latency_ms']['p99'] < 50
@@ -0,0 +1,64 @@
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+CSV_BODY = b"Date,Open,High,Low,Close,Volume\n2023-01-02,100,110,90,105,10000\n2023-01-03,105,112,101,110,12000\n"
+
+
+class FakeStooqServer(ThreadingHTTPServer):
+    """Local stand-in for stooq, every answer takes `delay` seconds like a slow remote API"""
+    daemon_threads = True
+    request_queue_size = 128
+
+    def __init__(self, delay: float = 0.05):
+        super().__init__(("127.0.0.1", 0), FakeStooqHandler)
+        self.delay = delay
+        self.requests = 0
+        self.connections = 0
+        self.status = 200
+        self.fail_next = 0  # that many requests answer 503 before `status`
+        self._lock = threading.Lock()
+
+    @property
+    def url(self):
+        return f"http://127.0.0.1:{self.server_address[1]}/q/d/l/"
+
+
+class FakeStooqHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"  # keep-alive
+    disable_nagle_algorithm = True  # headers and body are two writes, no 40ms delayed ACK between them
+
+    def setup(self):
+        super().setup()
+        with self.server._lock:
+            self.server.connections += 1
+
+    def do_GET(self):
+        with self.server._lock:
+            self.server.requests += 1
+            status = self.server.status
+            if self.server.fail_next:
+                self.server.fail_next -= 1
+                status = 503
+        time.sleep(self.server.delay)
+        body = CSV_BODY if status == 200 else b"error"
+        self.send_response(status)
+        self.send_header("Content-Type", "text/csv")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture()
+def fake_stooq():
+    server = FakeStooqServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
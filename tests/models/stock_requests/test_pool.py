@@ -0,0 +1,62 @@
+import time
+from functools import partial
+
+from stock_alerts.models.stock_requests.pool import RateLimiter, download_concurrently
+from stock_alerts.models.stock_requests.stooq import download_stooq
+
+
+def _timed_run(stock_list, download, max_workers):
+    start = time.perf_counter()
+    results = list(download_concurrently(stock_list, download, max_workers=max_workers))
+    return time.perf_counter() - start, results
+
+
+def test_throughput_scales_with_concurrency(fake_stooq):
+    stock_list = [f"s{i}.us" for i in range(24)]
+    download = partial(download_stooq, base_url=fake_stooq.url)
+
+    timings = {}
+    for workers in (1, 4, 12):
+        elapsed, results = _timed_run(stock_list, download, workers)
+        timings[workers] = elapsed
+        assert sorted(stock for stock, _ in results) == sorted(stock_list)
+        assert all(len(df) == 2 for _, df in results)
+        print(f"{workers} workers: {len(stock_list) / elapsed:.1f} stocks/s")
+
+    assert timings[4] < timings[1] / 2
+    assert timings[12] < timings[4]
+
+
+def test_results_in_completion_order():
+    delays = {"slow": 0.3, "fast": 0.0, "medium": 0.1}
+
+    def download(stock):
+        time.sleep(delays[stock])
+        return stock
+
+    results = [stock for stock, _ in download_concurrently(delays, download, max_workers=3)]
+    assert results == ["fast", "medium", "slow"]
+
+
+def test_failed_downloads_are_skipped():
+    def download(stock):
+        if stock == "bad":
+            raise ValueError("no data")
+        return stock
+
+    results = dict(download_concurrently(["a", "bad", "b"], download, max_workers=2))
+    assert results == {"a": "a", "b": "b"}
+
+
+def test_rate_limiter_spaces_requests():
+    limiter = RateLimiter(rate=20)
+    calls = []
+
+    def download(stock):
+        limiter.wait()
+        calls.append(time.monotonic())
+        return stock
+
+    list(download_concurrently(range(6), download, max_workers=6))
+    calls.sort()
+    assert calls[-1] - calls[0] >= 5 / 20 * 0.9
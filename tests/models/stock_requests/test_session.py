@@ -0,0 +1,95 @@
+import time
+
+import pytest
+import requests
+
+from stock_alerts.models.stock_requests import Backoff, CircuitBreaker, HttpClient, fetch_stooq, make_session
+
+
+def _client(**kwargs) -> HttpClient:
+    return HttpClient(backoff=Backoff(retries=3, base=0.001), sleep=lambda seconds: None, **kwargs)
+
+
+def test_retries_server_errors_then_succeeds(fake_stooq):
+    fake_stooq.fail_next = 2
+    result = fetch_stooq("abc.us", base_url=fake_stooq.url, client=_client())
+    assert result.ok
+    assert result.attempts == 3
+    assert list(result.data.columns) == ["Date", "Open", "High", "Low", "Close", "Volume"]
+
+
+def test_client_errors_are_not_retried(fake_stooq):
+    fake_stooq.status = 404
+    result = fetch_stooq("nope.us", base_url=fake_stooq.url, client=_client())
+    assert (result.ok, result.error, result.status, result.attempts) == (False, "http", 404, 1)
+    assert result.data is None
+
+
+def test_timeout_is_a_typed_failure(fake_stooq):
+    fake_stooq.delay = 0.2
+    result = fetch_stooq("abc.us", base_url=fake_stooq.url, client=_client(), timeout_seconds=0.05)
+    assert (result.error, result.attempts) == ("timeout", 4)
+
+
+def test_circuit_opens_and_recovers(fake_stooq):
+    now = [0.0]
+    client = _client(breaker=CircuitBreaker(threshold=4, reset_after=10, clock=lambda: now[0]))
+    fake_stooq.status = 500
+    assert fetch_stooq("abc.us", base_url=fake_stooq.url, client=client).error == "http"
+    assert client.breaker.state == "open"
+
+    sent = fake_stooq.requests
+    result = fetch_stooq("abc.us", base_url=fake_stooq.url, client=client)
+    assert result.error == "circuit_open"
+    assert fake_stooq.requests == sent  # stooq is left alone
+
+    now[0] = 11  # one trial call goes through and closes it
+    fake_stooq.status = 200
+    assert fetch_stooq("abc.us", base_url=fake_stooq.url, client=client).ok
+    assert client.breaker.state == "closed"
+
+
+def test_open_circuit_does_not_wait_the_backoff(fake_stooq):
+    sleeps = []
+    client = HttpClient(backoff=Backoff(retries=3, base=0.001), sleep=sleeps.append,
+                        breaker=CircuitBreaker(threshold=2, reset_after=10, clock=lambda: 0.0))
+    fake_stooq.status = 500
+    result = fetch_stooq("abc.us", base_url=fake_stooq.url, client=client)
+    assert (result.error, result.attempts) == ("circuit_open", 2)
+    assert len(sleeps) == 1  # only before the second call, the circuit is open after it
+
+
+def test_backoff_has_jitter_and_cap():
+    backoff = Backoff(base=1, cap=4)
+    delays = [backoff.delay(attempt) for attempt in range(6) for _ in range(20)]
+    assert all(0 <= delay <= 4 for delay in delays)
+    assert len(set(delays)) > 100
+
+
+def test_connection_reuse_is_faster(fake_stooq):
+    fake_stooq.delay = 0
+    n = 50
+    url = f"{fake_stooq.url}?s=abc.us"
+
+    start = time.perf_counter()
+    for _ in range(n):
+        requests.get(url, timeout=5).raise_for_status()  # the old way, a new connection every time
+    fresh = time.perf_counter() - start
+    fresh_connections = fake_stooq.connections
+
+    client = HttpClient(session=make_session())
+    start = time.perf_counter()
+    for _ in range(n):
+        assert client.get(url).ok
+    pooled = time.perf_counter() - start
+
+    print(f"{n} requests: {fresh * 1000:.1f}ms new connections, {pooled * 1000:.1f}ms pooled")
+    assert fresh_connections == n
+    assert fake_stooq.connections - fresh_connections == 1
+    assert pooled < fresh
+
+
+@pytest.mark.parametrize("pool_size", [1, 8])
+def test_pool_size(pool_size):
+    adapter = make_session(pool_size=pool_size).get_adapter("https://stooq.com")
+    assert adapter._pool_maxsize == pool_size
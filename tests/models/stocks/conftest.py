@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+
+def make_ohlcv(n: int = 500, seed: int = 0, start: str = "2023-01-02") -> pd.DataFrame:
+    """Random walk bars in the yfinance/stooq format (Date, Open, High, Low, Close, Volume)"""
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1.5, n))
+    open_ = close + rng.normal(0, 0.5, n)
+    high = np.maximum(open_, close) + rng.uniform(0, 1.5, n)
+    low = np.minimum(open_, close) - rng.uniform(0, 1.5, n)
+    return pd.DataFrame({"Date": pd.date_range(start, periods=n, freq="B"), "Open": open_, "High": high,
+                         "Low": low, "Close": close, "Volume": rng.integers(1_000, 100_000, n).astype(float)})
+
+
+@pytest.fixture()
+def ohlcv():
+    return make_ohlcv
+
+
+def make_json(n: int = 500, seed: int = 0) -> dict:
+    """The same bars in the json/dict format (t, o, h, l, c, v), the index of the Stock is the timestamp"""
+    df = make_ohlcv(n, seed)
+    return {'t': (df['Date'].astype('int64') // 10 ** 9).tolist(), 'o': df['Open'].tolist(),
+            'h': df['High'].tolist(), 'l': df['Low'].tolist(), 'c': df['Close'].tolist(), 'v': df['Volume'].tolist()}
+
+
+@pytest.fixture()
+def ohlcv_json():
+    return make_json
@@ -0,0 +1,105 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_alerts.models.stocks.alerts import (AlertPlan, EvalContext, Rule, col, crosses_above, default_rules,
+                                               parse_expr, rules_from_event)
+from stock_alerts.models.stocks.stocks import Stock
+
+
+def legacy_alert_type(df: pd.DataFrame) -> pd.Series:
+    """The hand written add_alerts masks, before the rules engine"""
+    alert_type = pd.Series('', index=df.index, dtype=object)
+    d10, d11, d12 = df['SUPERTd_10_1.0'], df['SUPERTd_11_2.0'], df['SUPERTd_12_3.0']
+    alert_type[(df['histogram'] > 0) & (df['histogram'].shift(1) < 0)] = 'MACD UP'
+    alert_type[(df['histogram'] < 0) & (df['histogram'].shift(1) > 0)] = 'MACD DOWN'
+    alert_type[(df['rsi'] > 30) & (df['rsi'].shift(1) < 30)] = 'RSI UP'
+    alert_type[(df['rsi'] > 70) & (df['rsi'].shift(1) < 70)] = 'RSI WATCH'
+    alert_type[(df['rsi'] < 70) & (df['rsi'].shift(1) > 70)] = 'RSI SECURE'
+    turned_up = ((d10 == 1) & (d10.shift(1) == -1) | (d11 == 1) & (d11.shift(1) == -1) |
+                 (d12 == 1) & (d12.shift(1) == -1))
+    alert_type[turned_up] = 'Supertrend WATCH'
+    alert_type[((d10 == 1) & (d11 == 1) & (d12 == 1)) &
+               ((d10.shift(1) == -1) | (d11.shift(1) == -1) | (d12.shift(1) == -1))] = 'Supertrend UP'
+    alert_type[((d10 == -1) & (d11 == -1) & (d12 == -1)) &
+               ((d10.shift(1) == 1) | (d11.shift(1) == 1) | (d12.shift(1) == 1))] = 'Supertrend DOWN'
+    st_value = df[['SUPERT_10_1.0', 'SUPERT_11_2.0', 'SUPERT_12_3.0']].min(axis=1)
+    alert_type[(df['ISA_9'] < st_value) & (df['ISB_26'] < st_value) &
+               ((df['ISA_9'].shift(1) > st_value.shift(1)) | (df['ISB_26'].shift(1) > st_value.shift(1)))] = \
+        'Supertrend + Ichimoku UP'
+    alert_type[turned_up & (df['close'] > df['sma20'])] = 'supertrend + sma20 UP'
+    return alert_type
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_default_rules_match_legacy_add_alerts(ohlcv, seed):
+    stock = Stock("TEST.US", ohlcv(500, seed=seed))
+    assert (stock.df['alert_type'] != '').any()
+    pd.testing.assert_series_equal(stock.df['alert_type'], legacy_alert_type(stock.df), check_names=False,
+                                  check_dtype=False)
+
+
+def test_alert_types_keeps_every_match(ohlcv):
+    stock = Stock("TEST.US", ohlcv(500, seed=1))
+    masks = stock.alert_plan.evaluate(stock.df)
+    for i in range(len(stock.df)):
+        matched = [name for name, mask in masks.items() if mask[i]]
+        assert stock.df['alert_types'].iloc[i] == ', '.join(matched)
+        assert stock.df['alert_type'].iloc[i] == (matched[-1] if matched else '')
+
+
+def test_shared_subexpressions_are_computed_once():
+    data = {'SUPERTd_10_1.0': np.array([-1.0, 1.0]), 'SUPERTd_11_2.0': np.array([1.0, 1.0]),
+            'SUPERTd_12_3.0': np.array([1.0, 1.0]), 'close': np.array([1.0, 2.0]), 'sma20': np.array([0.0, 0.0])}
+    calls = []
+
+    class CountingContext(EvalContext):
+        def column(self, name):
+            calls.append(name)
+            return super().column(name)
+
+    rules = [rule for rule in default_rules() if rule.name.startswith(('Supertrend', 'supertrend'))
+             and 'Ichimoku' not in rule.name]
+    ctx = CountingContext(data)
+    results = {rule.name: ctx.evaluate(rule.condition) for rule in rules}
+    assert sorted(calls) == sorted(data)
+    assert results['Supertrend UP'].tolist() == [False, True]
+    assert results['supertrend + sma20 UP'].tolist() == [False, True]
+
+
+def test_rules_with_missing_columns_are_skipped():
+    plan = AlertPlan()
+    masks = plan.evaluate({'histogram': np.array([-1.0, 1.0])})
+    assert list(masks) == ['MACD UP', 'MACD DOWN']
+    assert masks['MACD UP'].tolist() == [False, True]
+
+
+def test_rules_on_a_panel():
+    plan = AlertPlan([Rule('cross', crosses_above('close', 'sma20'), 1)])
+    data = {'close': np.array([[1.0, 3.0], [3.0, 1.0]]), 'sma20': np.array([[2.0, 2.0], [2.0, 2.0]])}
+    assert plan.evaluate(data)['cross'].tolist() == [[False, True], [False, False]]
+
+
+def test_rules_from_event(ohlcv):
+    rules = rules_from_event([
+        'MACD UP',
+        {'name': 'close over sma50', 'when': {'crosses_above': ['close', 'sma50']}, 'direction': 1},
+        {'name': 'strong up', 'when': {'all_of': [{'eq': ['SUPERTd_10_1.0', 1]}, {'gt': ['rsi', 50]}]}},
+    ])
+    assert [rule.name for rule in rules] == ['MACD UP', 'close over sma50', 'strong up']
+    stock = Stock("TEST.US", ohlcv(400, seed=2), rules=rules)
+    expected = (stock.df['close'] > stock.df['sma50']) & (stock.df['close'].shift(1) < stock.df['sma50'].shift(1))
+    assert (stock.df['alert_types'].str.contains('close over sma50') == expected).all()
+    assert set(stock.df['alert_type']) <= {'', 'MACD UP', 'close over sma50', 'strong up'}
+
+
+def test_bad_rules_raise():
+    with pytest.raises(ValueError):
+        rules_from_event(['NOT A RULE'])
+    with pytest.raises(ValueError):
+        parse_expr({'between': ['rsi', 30, 70]})
+
+
+def test_columns_of_a_rule():
+    rule = Rule('x', crosses_above(col('macd'), col('signal')) & (col('rsi') < 30))
+    assert rule.columns == {'macd', 'signal', 'rsi'}
@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_alerts.models.stocks.alerts import AlertPlan, Rule, crosses_above, crosses_below
+from stock_alerts.models.stocks.backtest import backtest, report, simulate
+from stock_alerts.models.stocks.panel import Panel
+
+
+def _frame(close: list) -> pd.DataFrame:
+    close = np.asarray(close, dtype=float)
+    return pd.DataFrame({"Date": pd.date_range("2024-01-01", periods=len(close), freq="B"), "Open": close + 0.5,
+                         "High": close + 1, "Low": close - 1, "Close": close, "Volume": 1000.0})
+
+
+def test_trades_of_a_simple_rule():
+    panel = Panel.from_frames({"a.us": _frame([10, 12, 9, 11, 13, 14, 8, 9, 12, 12])})
+    plan = AlertPlan([Rule("up", crosses_above('close', 10.5), 1), Rule("down", crosses_below('close', 10.5), -1)])
+    trades = simulate(panel, plan, indicators={}, horizon=3)
+
+    up = trades[trades['rule'] == "up"]
+    assert up['signal_date'].dt.day.tolist() == [2, 4, 11]  # bars 1, 3 and 8
+    # bar 1: entry at the open of bar 2 (9.5), the down alert of bar 2 closes it at 9
+    assert up['entry'].tolist()[0] == 9.5 and up['exit'].tolist()[0] == 9.0
+    # bar 3: held 3 bars (no down alert before bar 6, which is the horizon too)
+    assert up['bars'].tolist()[:2] == [1, 3]
+    # bar 8: only one bar left, closed at the last bar
+    assert up['bars'].tolist()[2] == 1 and up['exit'].tolist()[2] == 12
+    down = trades[trades['rule'] == "down"]
+    np.testing.assert_allclose(down['ret'], -(down['exit'] / down['entry'] - 1))
+
+
+def test_report():
+    trades = pd.DataFrame({"rule": ["a"] * 4 + ["b"], "stock": "x", "exit_date": pd.date_range("2024-01-01", periods=5),
+                           "entry_date": pd.date_range("2023-12-01", periods=5), "ret": [0.1, -0.2, 0.05, -0.1, 0.3]})
+    summary = report(trades)
+    assert summary.loc["a", "trades"] == 4
+    assert summary.loc["a", "hit_rate"] == 0.5
+    assert summary.loc["a", "pnl"] == pytest.approx(-0.15)
+    assert summary.loc["a", "max_drawdown"] == pytest.approx(0.25)  # from 0.1 down to -0.15
+    assert summary.loc["b", "max_drawdown"] == 0
+
+
+def test_stock_engine_and_chunks_give_the_same_trades(ohlcv):
+    frames = {f"t{seed}.us": ohlcv(300, seed=seed) for seed in range(4)}
+    expected = backtest(frames)
+    assert len(expected) > 0
+    for result in (backtest(frames, engine="stock"), backtest(frames, chunk_size=1)):
+        pd.testing.assert_frame_equal(result.sort_values(['stock', 'rule', 'signal_date'], ignore_index=True),
+                                      expected.sort_values(['stock', 'rule', 'signal_date'], ignore_index=True),
+                                      check_dtype=False)
@@ -0,0 +1,37 @@
+import pandas as pd
+import pytest
+
+from stock_alerts.models.stocks import Stock
+
+
+def test_compact_dtypes(ohlcv_json):
+    stock = Stock("a.us", ohlcv_json(300), compact=True)
+    dtypes = stock.df.dtypes
+    assert 'date' not in stock.df.columns  # the timestamp index has it
+    assert dtypes['close'] == 'float64'
+    assert dtypes['rsi'] == 'float32' and dtypes['SUPERT_10_1.0'] == 'float32'
+    assert dtypes['SUPERTd_10_1.0'] == 'Int8'
+    for column in ('stock', 'alert_type', 'alert_types'):
+        assert isinstance(dtypes[column], pd.CategoricalDtype)
+    assert stock.export_frame()['date'].iloc[-1] == pd.to_datetime(stock.df.index[-1], unit='s')
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_compact_alerts_match(ohlcv_json, seed):
+    full = Stock("a.us", ohlcv_json(400, seed=seed))
+    compact = Stock("a.us", ohlcv_json(400, seed=seed), compact=True)
+    pd.testing.assert_series_equal(compact.df['alert_type'].astype(str), full.df['alert_type'].astype(str),
+                                   check_dtype=False)
+    assert compact.add_alerts().index.equals(full.add_alerts().index)
+
+    tail = Stock("a.us", ohlcv_json(400, seed=seed), compact=True, tail_alerts=True)
+    expected = full.recent_alerts(full.df.index[-30])
+    result = tail.recent_alerts(full.df.index[-30])
+    assert result.index.equals(expected.index)
+    assert result['alert_types'].astype(str).tolist() == expected['alert_types'].tolist()
+
+
+def test_compact_uses_less_memory(ohlcv_json):
+    full = Stock("a.us", ohlcv_json(500))
+    compact = Stock("a.us", ohlcv_json(500), compact=True)
+    assert compact.df.memory_usage(deep=True).sum() < 0.6 * full.df.memory_usage(deep=True).sum()
@@ -0,0 +1,82 @@
+import pandas as pd
+
+from stock_alerts.models.stocks import compute_pool, panel
+from stock_alerts.models.stocks.compute_pool import SharedOHLCV, check_one, check_stocks
+from stock_alerts.models.stocks.stocks import Stock
+
+
+def test_shared_frames_round_trip(ohlcv):
+    frames = {"a.us": ohlcv(300, seed=1), "b.us": ohlcv(120, seed=2)}
+    frames["b.us"]["Date"] = frames["b.us"]["Date"].dt.tz_localize("America/New_York")  # yfinance dates
+    shared = SharedOHLCV.from_frames(frames)
+    try:
+        assert shared.tickers == ["a.us", "b.us"]
+        pd.testing.assert_frame_equal(shared.frame(0), frames["a.us"], check_dtype=False)
+        expected = frames["b.us"].assign(Date=frames["b.us"]["Date"].dt.tz_localize(None))
+        pd.testing.assert_frame_equal(shared.frame(1), expected, check_dtype=False)
+    finally:
+        shared.unlink()
+
+
+def test_check_one_returns_only_the_last_row(ohlcv_json, monkeypatch):
+    assert check_one("a.us", ohlcv_json(300, seed=3)) is None  # the synthetic bars are older than the last days
+
+    monkeypatch.setattr(compute_pool.Stock, "_find_time", staticmethod(lambda: 0))
+    data = ohlcv_json(300, seed=3)
+    result = check_one("a.us", data)
+    assert set(result) == {"stock", "alert_types", "row"}
+    assert result["row"]["close"] == data["c"][-1]
+    assert result["row"]["alert_types"] == result["alert_types"]
+
+
+def test_pool_matches_the_sequential_loop(ohlcv, monkeypatch):
+    frames = {f"t{i}.us": ohlcv(260, seed=i) for i in range(12)}
+    # every bar counts as recent, so the tickers with an alert on the last bar come back
+    monkeypatch.setattr(compute_pool.Stock, "_find_time", staticmethod(lambda: -1))
+    expected = [check_one(name, df.copy()) for name, df in frames.items()]
+    expected = [result for result in expected if result]
+    results = check_stocks(frames, max_workers=3, batch_size=5)
+    assert [r["stock"] for r in results] == [r["stock"] for r in expected]
+    assert [r["alert_types"] for r in results] == [r["alert_types"] for r in expected]
+    assert results[0]["row"]["close"] == expected[0]["row"]["close"]
+    assert len(results) > 0
+
+
+def test_pool_uses_the_ticker_params(ohlcv, monkeypatch):
+    monkeypatch.setattr(compute_pool.Stock, "_find_time", staticmethod(lambda: -1))
+    frames = {f"t{i}.us": ohlcv(260, seed=i) for i in range(12)}
+    params = {"t1.us": {"rsi": 7}, "t7.us": {"rsi": 7, "macd": [8, 21, 5]}}
+    expected = {name: check_one(name, df.copy(), params=params.get(name)) for name, df in frames.items()}
+    results = {r["stock"]: r for r in check_stocks(frames, max_workers=2, batch_size=5, params=params)}
+    assert list(results) == [name for name, result in expected.items() if result]
+    for name, result in results.items():
+        assert result["row"]["rsi"] == expected[name]["row"]["rsi"]
+    default = check_one("t1.us", frames["t1.us"].copy())
+    assert default is None or default["row"]["rsi"] != expected["t1.us"]["row"]["rsi"]
+
+
+def test_no_shared_memory_falls_back_to_one_process(ohlcv, monkeypatch):
+    def no_shm(frames):
+        raise FileNotFoundError("/dev/shm")
+
+    monkeypatch.setattr(SharedOHLCV, "from_frames", staticmethod(no_shm))
+    monkeypatch.setattr(compute_pool.Stock, "_find_time", staticmethod(lambda: -1))
+    frames = {f"t{i}.us": ohlcv(260, seed=i) for i in range(3)}
+    expected = [r for r in (check_one(name, df.copy()) for name, df in frames.items()) if r]
+    assert [r["stock"] for r in check_stocks(frames)] == [r["stock"] for r in expected]
+
+
+def test_engines_agree_with_the_real_cutoff(ohlcv):
+    # daily bars up to today (half of them dated like yfinance, in the exchange timezone), no _find_time patch: the
+    # default stock engine, the pool and the panel find the same recent alerts, like in the Lambda
+    end = pd.Timestamp.now().normalize()
+    frames = {}
+    for i in range(30):
+        dates = pd.date_range(end=end, periods=260, freq="D")
+        frames[f"t{i}.us"] = ohlcv(260, seed=i).assign(Date=dates.tz_localize("America/New_York") if i % 2 else dates)
+
+    expected = [name for name, df in frames.items() if Stock(name, df.copy()).check_alerts(Stock(name, df.copy()))]
+    assert expected
+    assert [r["stock"] for r in check_stocks(frames, max_workers=2, batch_size=8)] == expected
+    alerted = panel.alert_rows(panel.Panel.from_frames(frames), since=Stock._find_time())
+    assert sorted(alerted["stock"]) == sorted(expected)
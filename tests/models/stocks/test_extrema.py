@@ -0,0 +1,51 @@
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+import pytest
+
+from stock_alerts.models.stocks import Stock
+from stock_alerts.models.stocks.extrema import ichimoku, rolling_extrema, rolling_max, rolling_min
+
+
+@pytest.mark.parametrize("window", [1, 2, 9, 26, 52, 99, 100, 101])
+def test_rolling_matches_pandas(window):
+    rng = np.random.default_rng(window)
+    values = rng.normal(size=(3, 100))
+    values[1, 40] = np.nan  # a NaN makes its windows NaN, like pandas
+    for row in range(3):
+        series = pd.Series(values[row])
+        np.testing.assert_array_equal(rolling_max(values, window)[row], series.rolling(window).max().to_numpy())
+        np.testing.assert_array_equal(rolling_min(values[row], window), series.rolling(window).min().to_numpy())
+
+
+def test_rolling_extrema_all_windows():
+    rng = np.random.default_rng(0)
+    high, low = rng.normal(size=200) + 1, rng.normal(size=200)
+    extremes = rolling_extrema(high, low, (26, 9, 52, 9))
+    assert list(extremes) == [9, 26, 52]
+    np.testing.assert_array_equal(extremes[26][0], rolling_max(high, 26))
+    np.testing.assert_array_equal(extremes[26][1], rolling_min(low, 26))
+
+
+def test_stock_ichimoku_matches_pandas_ta(ohlcv):
+    df = ohlcv(300, seed=7)
+    stock = Stock("a.us", df.copy())
+    # on the timestamp index of the Stock, pandas_ta continues it for the spans ahead
+    expected, expected_span = ta.ichimoku(*(df[column].set_axis(stock.df.index) for column in ('High', 'Low', 'Close')))
+    for column in ('ISA_9', 'ISB_26'):
+        np.testing.assert_allclose(stock.df[column].to_numpy(), expected[column].to_numpy(), rtol=1e-12,
+                                   equal_nan=True, err_msg=column)
+    assert stock._prediction is None  # only computed when read
+    prediction = stock.ichimoku_prediction
+    pd.testing.assert_frame_equal(prediction, expected_span.astype('float64'), check_names=False, check_freq=False)
+    assert stock.ichimoku_prediction is prediction
+
+    spans, ahead = ichimoku(df[['High', 'High']].to_numpy().T, df[['Low', 'Low']].to_numpy().T, forward=True)
+    np.testing.assert_array_equal(spans['ISA_9'][1], stock.df['ISA_9'].to_numpy())
+    assert ahead['ISB_26'].shape == (2, 26)
+
+
+def test_short_history_has_nan_spans(ohlcv):
+    stock = Stock("a.us", ohlcv(30, seed=1).copy())
+    assert stock.df[['ISA_9', 'ISB_26']].isna().all().all()  # pandas_ta gives None under 52 bars
+    assert len(stock.ichimoku_prediction) == 26
@@ -0,0 +1,98 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_alerts.models.stocks import Stock
+from stock_alerts.models.stocks.intraday import (BarBuffer, MultiTimeframe, bar_seconds, cutoff, expand_timeframes,
+                                                 history_period, resample)
+from stock_alerts.models.storage import normalize_ohlcv
+
+
+def minute_bars(n: int = 600, seed: int = 0, start: str = "2024-03-04 14:30") -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 0.1, n))
+    open_ = close + rng.normal(0, 0.05, n)
+    return pd.DataFrame({"Date": pd.date_range(start, periods=n, freq="min"), "Open": open_,
+                         "High": np.maximum(open_, close) + 0.02, "Low": np.minimum(open_, close) - 0.02,
+                         "Close": close, "Volume": rng.integers(100, 1000, n).astype(float)})
+
+
+def test_granularities():
+    assert bar_seconds("D") == bar_seconds("1D") == 86400
+    assert bar_seconds("5m") == 300
+    assert history_period("1m") == "7d" and history_period("1d") == "2y"
+    with pytest.raises(ValueError):
+        bar_seconds("7m")
+
+
+@pytest.mark.parametrize("granularity, rule", [("5m", "5min"), ("1h", "1h")])
+def test_resample_matches_pandas(granularity, rule):
+    df = minute_bars()
+    expected = df.set_index("Date").resample(rule).agg(
+        {"Open": "first", "High": "max", "Low": "min", "Close": "last", "Volume": "sum"}).dropna().reset_index()
+    pd.testing.assert_frame_equal(resample(df, granularity), expected, check_dtype=False)
+
+
+def test_ring_buffer_keeps_the_last_bars():
+    df = minute_bars(50)
+    buffer = BarBuffer("1m", capacity=20)
+    buffer.extend(df.iloc[:30])
+    for row in df.iloc[30:].itertuples():
+        buffer.add(row.Date.timestamp(), row.Open, row.High, row.Low, row.Close, row.Volume)
+    pd.testing.assert_frame_equal(buffer.frame(), df.iloc[-20:].reset_index(drop=True), check_dtype=False)
+
+    # the unfinished bar is updated, an older one is ignored
+    last = df["Date"].iloc[-1].timestamp()
+    assert buffer.add(last + 30, 1, 2, 0.5, 1.5, 10)
+    assert buffer.frame()["Close"].iloc[-1] == 1.5 and len(buffer) == 20
+    assert not buffer.add(last - 600, 1, 1, 1, 1, 1)
+
+
+def test_streamed_timeframes_match_resample():
+    df = minute_bars(300)
+    frames = MultiTimeframe("1m", ["5m", "15m"], capacity=100)
+    frames.extend(df.iloc[:137])
+    for row in df.iloc[137:].itertuples():
+        frames.add(row.Date.timestamp(), row.Open, row.High, row.Low, row.Close, row.Volume)
+    for timeframe in ("5m", "15m"):
+        expected = resample(df, timeframe).iloc[-100:].reset_index(drop=True)
+        pd.testing.assert_frame_equal(frames[timeframe].frame(), expected, check_dtype=False)
+    with pytest.raises(ValueError):
+        MultiTimeframe("5m", ["7m"])
+
+
+def test_intraday_stock_cutoff(monkeypatch):
+    data = minute_bars(400)
+    now = data["Date"].iloc[-1].timestamp() + 90  # the last bar closed, the next one is forming
+    assert cutoff("1m", now) == data["Date"].iloc[-2].timestamp() + 59
+    (name, timeframe, json_data), = expand_timeframes([("a.us", data)], "1m", capacity=300)
+    assert len(json_data['t']) == 300
+
+    stock = Stock(name, json_data, granularity=timeframe)
+    monkeypatch.setattr("stock_alerts.models.stocks.intraday.time.time", lambda: now)
+    assert stock.cutoff_time() == cutoff("1m", now)
+    alerted = stock.add_alerts()
+    assert stock.check_alerts(stock) == bool(len(alerted) and alerted.index[-1] > stock.cutoff_time())
+
+
+def test_timeframe_offset_starts_the_hours_at_the_open(monkeypatch):
+    data = minute_bars(400)  # 14:30 UTC, the 9:30 ET open
+    expanded = {name: (timeframe, frame) for name, timeframe, frame in
+                expand_timeframes([("a.us", data)], "1m", ["1h"], capacity=300, as_json=False, offset=1800)}
+    hours = expanded["a.us@1h"][1]["Date"]
+    assert (hours.dt.minute == 30).all() and hours.iloc[0] == pd.Timestamp("2024-03-04 14:30")
+
+    # 19:30 is the last closed bar, on the UTC hours it would not be new any more
+    now = pd.Timestamp("2024-03-04 21:15").timestamp()
+    assert cutoff("1h", now, offset=1800) == pd.Timestamp("2024-03-04 19:30").timestamp() - 1
+    (name, timeframe, json_data), = [item for item in expand_timeframes([("a.us", data)], "1m", ["1h"], offset=1800)
+                                     if item[1] == "1h"]
+    stock = Stock(name, json_data, granularity=timeframe, offset=1800)
+    monkeypatch.setattr("stock_alerts.models.stocks.intraday.time.time", lambda: now)
+    assert stock.cutoff_time() == cutoff("1h", now, offset=1800)
+
+
+def test_intraday_dates_are_utc():
+    df = minute_bars(3)
+    df["Date"] = df["Date"].dt.tz_localize("UTC").dt.tz_convert("America/New_York")
+    assert normalize_ohlcv(df)["Date"].iloc[0] == pd.Timestamp("2024-03-04 14:30")
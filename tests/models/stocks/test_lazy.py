@@ -0,0 +1,48 @@
+import pandas as pd
+
+from stock_alerts.models.stocks import Stock
+from stock_alerts.models.stocks.alerts import default_rules
+
+
+def _rules(*names):
+    return [rule for rule in default_rules() if rule.name in names]
+
+
+def test_nothing_is_computed_until_needed(ohlcv_json):
+    stock = Stock("a.us", ohlcv_json(300), lazy=True)
+    assert 'macd' not in stock.df.columns
+    rsi = stock.indicator('rsi')
+    assert rsi.notna().sum() > 250
+    assert stock._computed == {'_calculate_rsi'}
+
+
+def test_macd_scan_computes_only_the_macd(ohlcv_json):
+    stock = Stock("a.us", ohlcv_json(300), rules=_rules('MACD UP', 'MACD DOWN'), lazy=True)
+    stock.check_alerts(stock)
+    assert stock._computed == {'_calculate_macd'}
+    assert {'macd', 'signal', 'histogram', 'alert_type'} <= set(stock.df.columns)
+    assert not {'rsi', 'ema', 'ISA_9', 'SUPERT_10_1.0'} & set(stock.df.columns)
+
+
+def test_rule_dependencies_pull_their_indicators(ohlcv_json):
+    stock = Stock("a.us", ohlcv_json(300), rules=_rules('Supertrend + Ichimoku UP'), lazy=True)
+    stock.add_alerts()
+    assert stock._computed == {'_calculate_ichimoku', '_calculate_supertrend'}
+    assert {'ISA_9', 'ISB_26', 'SUPERTd_10_1.0', 'SUPERTd_12_3.0'} <= set(stock.df.columns)
+
+
+def test_lazy_alerts_match_eager(ohlcv_json):
+    eager = Stock("a.us", ohlcv_json(400, seed=4))
+    lazy = Stock("a.us", ohlcv_json(400, seed=4), lazy=True)
+    expected, result = eager.add_alerts(), lazy.add_alerts()
+    assert 'ema' not in lazy.df.columns  # no default rule uses it
+    # dropna() looks only at the computed columns, the early bars without ema are kept
+    assert set(expected.index) <= set(result.index)
+    columns = [column for column in expected.columns if column in result.columns]
+    pd.testing.assert_frame_equal(result.loc[expected.index, columns], expected[columns])
+
+    macd_only = _rules('MACD UP', 'MACD DOWN')
+    eager = Stock("a.us", ohlcv_json(400, seed=4), rules=macd_only)
+    lazy = Stock("a.us", ohlcv_json(400, seed=4), rules=macd_only, lazy=True, tail_alerts=True)
+    pd.testing.assert_series_equal(lazy.recent_alerts(0)['alert_type'],
+                                   eager.df['alert_type'][eager.df['alert_type'] != ''], check_dtype=False)
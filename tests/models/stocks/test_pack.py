@@ -0,0 +1,71 @@
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+
+from stock_alerts.models.stocks import Stock
+from stock_alerts.models.stocks.alerts import pack_rules
+from stock_alerts.models.stocks.backtest import backtest
+from stock_alerts.models.stocks.pack import indicator_pack, parse_column
+from stock_alerts.models.stocks.panel import Panel
+
+
+def _pandas_ta(df: pd.DataFrame) -> pd.DataFrame:
+    high, low, close, volume = df['High'], df['Low'], df['Close'], df['Volume']
+    tp = ta.hlc3(high, low, close)
+    # pandas_ta.cci divides before subtracting (tp - sma / (c * mad)), the CCI formula is built from its parts
+    cci = ((tp - ta.sma(tp, 14)) / (0.015 * ta.mad(tp, 14))).rename("CCI_14_0.015")
+    return pd.concat([ta.adx(high, low, close, length=14), ta.aroon(high, low, length=14),
+                      ta.bbands(close, length=20, lower_std=2.0, upper_std=2.0), ta.stoch(high, low, close),
+                      ta.willr(high, low, close, length=14), cci, ta.mfi(high, low, close, volume, length=14),
+                      ta.obv(close, volume), ta.roc(close, length=10), ta.stdev(close, length=20)], axis=1)
+
+
+def test_parity_with_pandas_ta(ohlcv):
+    df = ohlcv(400, seed=3)
+    result = indicator_pack(df['High'], df['Low'], df['Close'], df['Volume'])
+    expected = _pandas_ta(df)
+    assert set(result) == set(expected.columns)
+    for column in expected.columns:
+        np.testing.assert_allclose(result[column], expected[column].to_numpy(dtype='float64'), rtol=1e-8, atol=1e-8,
+                                   equal_nan=True, err_msg=column)
+
+
+def test_panel_rows_match_one_ticker(ohlcv):
+    frames = {"a.us": ohlcv(300, seed=1), "b.us": ohlcv(220, seed=2)}  # b is NaN padded in the panel
+    panel = Panel.from_frames(frames)
+    result = indicator_pack(panel.high, panel.low, panel.close, panel.volume)
+    for row, df in enumerate(frames.values()):
+        single = indicator_pack(df['High'], df['Low'], df['Close'], df['Volume'])
+        for column, values in single.items():
+            np.testing.assert_allclose(result[column][row, -len(df):], values, rtol=1e-9, equal_nan=True,
+                                       err_msg=column)
+
+
+def test_parse_column():
+    assert parse_column('ADX_20') == ('adx', 20)
+    assert parse_column('ADXR_14_2') == ('adx', 14)
+    assert parse_column('BBU_10_1.5_1.5') == ('bbands', (10, 1.5))
+    assert parse_column('STOCHd_5_3_3') == ('stoch', (5, 3, 3))
+    assert parse_column('OBV') == ('obv', ())
+    assert parse_column('SUPERT_10_1.0') is None
+
+
+def test_stock_computes_only_the_rule_columns(ohlcv):
+    rules = pack_rules()
+    stock = Stock("a.us", ohlcv(300), rules=rules)
+    assert {'ADX_14', 'STOCHk_14_3_3', 'BBL_20_2.0_2.0'} <= set(stock.df.columns)
+    assert 'OBV' not in stock.df.columns and 'DMP_14' not in stock.df.columns
+    assert set(stock.add_alerts()['alert_type']) <= {rule.name for rule in rules}
+
+    lazy = Stock("a.us", ohlcv(300), lazy=True)
+    assert lazy.indicator('WILLR_21').notna().sum() == 300 - 20
+
+
+def test_engines_agree_on_pack_rules(ohlcv):
+    frames = {f"t{seed}.us": ohlcv(250, seed=seed) for seed in range(3)}
+    expected = backtest(frames, rules=pack_rules())
+    assert len(expected) > 0
+    result = backtest(frames, rules=pack_rules(), engine="stock")
+    columns = ['stock', 'rule', 'signal_date']
+    pd.testing.assert_frame_equal(result.sort_values(columns, ignore_index=True),
+                                  expected.sort_values(columns, ignore_index=True), check_dtype=False)
@@ -0,0 +1,68 @@
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+import pytest
+
+from stock_alerts.models.stocks.panel import DEFAULT_PLAN, Panel, alert_rows, compute_panel, panel_alerts
+from stock_alerts.models.stocks.stocks import Stock
+
+INDICATORS = ['macd', 'signal', 'histogram', 'rsi', 'ISA_9', 'ISB_26', 'ema', 'sma20', 'sma50']
+
+
+@pytest.fixture()
+def frames(ohlcv):
+    # different history lengths, the short ones are padded
+    return {f"T{i}.US": ohlcv(n, seed=i) for i, n in enumerate([400, 380, 300, 250])}
+
+
+def _stock_with_supertrend(name, df):
+    stock = Stock(name, df.copy())
+    for length, multiplier in ((10, 1.0), (11, 2.0), (12, 3.0)):
+        st = ta.supertrend(stock.df['high'], stock.df['low'], stock.df['close'], length=length, multiplier=multiplier)
+        for col in (f"SUPERT_{length}_{multiplier}", f"SUPERTd_{length}_{multiplier}"):
+            stock.df[col] = st[col]
+    return stock
+
+
+def test_panel_matches_stock(frames):
+    panel = Panel.from_frames(frames)
+    indicators = compute_panel(panel)
+    codes = panel_alerts(panel, indicators)
+    for i, (name, df) in enumerate(frames.items()):
+        stock = _stock_with_supertrend(name, df)
+        stock.add_alerts()
+        n = len(df)
+        for column in INDICATORS + ['SUPERT_10_1.0', 'SUPERTd_10_1.0', 'SUPERT_12_3.0', 'SUPERTd_12_3.0']:
+            np.testing.assert_allclose(indicators[column][i, -n:], stock.df[column].astype(float), rtol=1e-9,
+                                       atol=1e-9, err_msg=f"{name} {column}")
+        assert np.isnan(panel.close[i, :-n]).all()
+        names = [''] + DEFAULT_PLAN.names
+        assert [names[c] for c in codes[i, -n:]] == stock.df['alert_type'].tolist()
+
+
+def test_alert_rows_are_the_last_complete_alert(frames):
+    panel = Panel.from_frames(frames)
+    rows = alert_rows(panel).set_index('stock')
+    for name, df in frames.items():
+        alerts = _stock_with_supertrend(name, df).add_alerts()
+        if alerts.empty:
+            assert name not in rows.index
+            continue
+        assert rows.loc[name, 'alert_type'] == alerts['alert_type'].iloc[-1]
+        assert rows.loc[name, 'date'] == alerts['date'].iloc[-1]
+
+
+def test_alert_rows_since(frames):
+    panel = Panel.from_frames(frames)
+    rows = alert_rows(panel)
+    cutoff = rows['date'].max().timestamp()
+    assert alert_rows(panel, since=cutoff).empty
+    assert len(alert_rows(panel, since=rows['date'].min().timestamp() - 1)) == len(rows)
+
+
+def test_panel_keeps_last_bars(ohlcv):
+    df = ohlcv(100)
+    panel = Panel.from_frames({"A.US": df}, length=30)
+    assert panel.close.shape == (1, 30)
+    np.testing.assert_allclose(panel.close[0], df['Close'].iloc[-30:])
+    assert panel.dates[0, -1] == np.datetime64(df['Date'].iloc[-1])
@@ -0,0 +1,83 @@
+import numpy as np
+import pandas as pd
+import pandas_ta as ta
+import pytest
+
+from stock_alerts.models.stocks.stocks import Stock
+from stock_alerts.models.stocks.streaming import EWM, IndicatorStream, RollingExtrema, RollingMean
+
+BATCH_COLUMNS = ['macd', 'signal', 'histogram', 'rsi', 'ISA_9', 'ISB_26', 'ema', 'sma20', 'sma50']
+
+
+def _stream_frame(df: pd.DataFrame, **kwargs) -> pd.DataFrame:
+    stream = IndicatorStream(**kwargs)
+    rows = [stream.update(bar) for bar in df[['high', 'low', 'close']].to_dict('records')]
+    return pd.DataFrame(rows, index=df.index)
+
+
+@pytest.mark.parametrize("kwargs", [
+    {"span": 12, "min_periods": 26}, {"span": 200, "min_periods": 200}, {"com": 13, "adjust": False},
+    {"alpha": 0.1, "adjust": False},
+])
+def test_ewm_matches_pandas(kwargs):
+    values = pd.Series(np.r_[[np.nan] * 5, np.random.default_rng(1).normal(size=300)])
+    values.iloc[50] = np.nan
+    ewm = EWM(**kwargs)
+    result = [ewm.update(value) for value in values.tolist()]
+    np.testing.assert_allclose(result, values.ewm(**kwargs).mean(), rtol=1e-12)
+
+
+def test_rolling_mean_recovers_after_a_nan():
+    values = pd.Series(np.random.default_rng(3).normal(size=120))
+    values.iloc[[30, 31, 90]] = np.nan  # bad bars
+    mean = RollingMean(20)
+    result = [mean.update(value) for value in values.tolist()]
+    np.testing.assert_allclose(result, values.rolling(20).mean(), rtol=1e-9)
+
+
+@pytest.mark.parametrize("mode", ["max", "min"])
+def test_rolling_extrema_matches_pandas(mode):
+    values = pd.Series(np.random.default_rng(2).normal(size=200))
+    extrema = RollingExtrema(9, mode)
+    result = [extrema.update(value) for value in values.tolist()]
+    np.testing.assert_allclose(result, getattr(values.rolling(9), mode)())
+
+
+def test_stream_matches_batch(ohlcv):
+    stock = Stock("TEST.US", ohlcv(600))
+    streamed = _stream_frame(stock.df)
+    for column in BATCH_COLUMNS:
+        np.testing.assert_allclose(streamed[column], stock.df[column], rtol=1e-9, atol=1e-9, err_msg=column)
+
+
+@pytest.mark.parametrize("length,multiplier", [(10, 1.0), (11, 2.0), (12, 3.0), (7, 2.5)])
+def test_stream_supertrend_matches_pandas_ta(ohlcv, length, multiplier):
+    df = ohlcv(400, seed=3).rename(columns=str.lower)
+    expected = ta.supertrend(df['high'], df['low'], df['close'], length=length, multiplier=multiplier)
+    streamed = _stream_frame(df, supertrends=((length, multiplier),))
+    for column in (f"SUPERT_{length}_{multiplier}", f"SUPERTd_{length}_{multiplier}"):
+        np.testing.assert_allclose(streamed[column], expected[column], rtol=1e-9, err_msg=column)
+
+
+def test_stock_update_appends_same_values_as_batch(ohlcv):
+    data = ohlcv(400, seed=4)
+    full = Stock("TEST.US", data.copy())
+    stock = Stock("TEST.US", data.iloc[:300].copy())
+    stock.enable_streaming()
+
+    for bar in data.iloc[300:].rename(columns=str.lower).to_dict('records'):
+        stock.update(bar)
+
+    assert len(stock.df) == 400
+    assert stock.df.index.equals(full.df.index)  # the bars are indexed by their date
+    for column in BATCH_COLUMNS:
+        np.testing.assert_allclose(stock.df[column].astype(float), full.df[column], rtol=1e-9, atol=1e-9,
+                                   err_msg=column)
+
+
+def test_state_round_trip(ohlcv):
+    df = ohlcv(300, seed=5).rename(columns=str.lower)
+    stream = IndicatorStream.from_frame(df.iloc[:250])
+    restored = IndicatorStream.from_bytes(stream.to_bytes())
+    for bar in df.iloc[250:].to_dict('records'):
+        assert restored.update(bar) == pytest.approx(stream.update(bar), nan_ok=True)
@@ -0,0 +1,40 @@
+import numpy as np
+import pandas_ta as ta
+import pytest
+
+from stock_alerts.models.stocks.stocks import Stock
+from stock_alerts.models.stocks.supertrend import supertrend
+
+PARAMS = ((10, 1), (11, 2), (12, 3), (7, 2.5))
+
+
+@pytest.mark.parametrize("seed", [0, 1, 2])
+def test_matches_pandas_ta(ohlcv, seed):
+    df = ohlcv(500, seed=seed).rename(columns=str.lower)
+    result = supertrend(df['high'], df['low'], df['close'], PARAMS)
+    assert len(result) == 2 * len(PARAMS)
+    for length, multiplier in PARAMS:
+        expected = ta.supertrend(df['high'], df['low'], df['close'], length=length, multiplier=float(multiplier))
+        for prefix in ("SUPERT", "SUPERTd"):
+            column = f"{prefix}_{length}_{float(multiplier)}"
+            np.testing.assert_allclose(result[column], expected[column], rtol=1e-9, err_msg=column)
+
+
+def test_stock_only_keeps_trend_and_direction(ohlcv):
+    stock = Stock("TEST.US", ohlcv(300))
+    supertrend_columns = [col for col in stock.df.columns if col.startswith("SUPERT")]
+    assert supertrend_columns == ['SUPERT_10_1.0', 'SUPERTd_10_1.0', 'SUPERT_11_2.0', 'SUPERTd_11_2.0',
+                                  'SUPERT_12_3.0', 'SUPERTd_12_3.0']
+
+
+def test_stock_other_supertrend(ohlcv):
+    stock = Stock("TEST.US", ohlcv(300))
+    stock._calculate_supertrend(other=(7, 2.5))
+    assert {'SUPERT_7_2.5', 'SUPERTd_7_2.5'} <= set(stock.df.columns)
+
+
+def test_short_history_is_nan(ohlcv):
+    df = ohlcv(8).rename(columns=str.lower)
+    result = supertrend(df['high'], df['low'], df['close'], ((10, 1),))
+    assert np.isnan(result['SUPERT_10_1.0']).all()
+    assert np.isnan(result['SUPERTd_10_1.0']).all()
@@ -0,0 +1,49 @@
+import numpy as np
+import pytest
+
+from stock_alerts.models.stocks import Stock
+from stock_alerts.models.stocks.panel import Panel, compute_panel
+from stock_alerts.models.stocks.sweep import IndicatorCache, best_params, grid_points, sweep
+
+PARAMS = {'macd': (8, 21, 5), 'rsi': 7, 'ema': 50, 'supertrends': ((7, 1.5), (14, 2.5))}
+
+
+def test_defaults_match_compute_panel(ohlcv):
+    panel = Panel.from_frames({"a.us": ohlcv(300, seed=1), "b.us": ohlcv(200, seed=2)})
+    expected = compute_panel(panel)
+    result = IndicatorCache(panel).indicators()
+    assert result.keys() == expected.keys()
+    for column, values in expected.items():
+        np.testing.assert_allclose(result[column], values, equal_nan=True, err_msg=column)
+
+
+def test_other_params_match_stock(ohlcv):
+    df = ohlcv(300, seed=3)
+    cache = IndicatorCache(Panel.from_frames({"a.us": df}))
+    cache.indicators()  # the defaults first, the intermediates are reused
+    result = cache.indicators(PARAMS)
+    stock = Stock("a.us", df.copy(), params=PARAMS)
+    assert 'SUPERTd_7_1.5' in stock.alert_plan.columns
+    for column, values in result.items():
+        np.testing.assert_allclose(values[0], stock.df[column].to_numpy(dtype='float64'), rtol=1e-9,
+                                   equal_nan=True, err_msg=column)
+
+
+def test_sweep_ranks_per_ticker(ohlcv):
+    frames = {f"t{seed}.us": ohlcv(300, seed=seed) for seed in range(3)}
+    grid = {'rsi': [7, 14], 'supertrends': [((10, 1), (11, 2), (12, 3)), PARAMS['supertrends']]}
+    assert len(grid_points(grid)) == 4
+    table = sweep(frames, grid)
+    assert len(table) == 12
+    assert table.groupby('stock')['rank'].apply(list).tolist() == [[1, 2, 3, 4]] * 3
+    assert (table.groupby('stock')['pnl'].diff().dropna() <= 0).all()
+    chunked = sweep(frames, grid, chunk_size=1)
+    assert chunked.equals(table)
+
+    best = best_params(table)
+    assert set(best) == set(frames)
+    assert set(best["t0.us"]) == {'rsi', 'supertrends'}
+    Stock("t0.us", frames["t0.us"].copy(), params=best["t0.us"])  # goes back into the Stock settings
+
+    with pytest.raises(ValueError):
+        sweep(frames, grid, metric="sharpe")
@@ -0,0 +1,82 @@
+import pandas as pd
+import pytest
+
+from stock_alerts.models.stocks.alerts import AlertPlan
+from stock_alerts.models.stocks.stocks import Stock
+
+
+@pytest.mark.parametrize("seed", range(4))
+@pytest.mark.parametrize("recent", [1, 5, 40])
+def test_tail_matches_full_evaluation(ohlcv_json, seed, recent):
+    data = ohlcv_json(400, seed=seed)
+    start_time = data['t'][-recent - 1]
+    full = Stock("TEST.US", data)
+    tail = Stock("TEST.US", data, tail_alerts=True)
+
+    expected = full.add_alerts()
+    expected = expected[expected.index > start_time]
+    result = tail.recent_alerts(start_time)
+    if expected.empty:
+        assert result.empty
+        return
+    pd.testing.assert_frame_equal(result, expected)
+    # the alert columns of the checked bars are there for the notifications
+    pd.testing.assert_series_equal(tail.df['alert_types'].iloc[-recent:], full.df['alert_types'].iloc[-recent:])
+
+
+def test_tail_mode_does_not_compute_full_history(ohlcv_json, mocker):
+    data = ohlcv_json(400)
+    stock = Stock("TEST.US", data, tail_alerts=True)
+    assert 'alert_type' not in stock.df.columns
+    evaluate = mocker.spy(stock.alert_plan, 'evaluate')
+    stock.recent_alerts(data['t'][-4])
+    evaluated = evaluate.call_args.args[0]
+    assert {len(values) for values in evaluated.values()} == {3 + stock.alert_plan.lookback}
+
+
+def test_repeated_calls_are_memoized(ohlcv_json, mocker):
+    data = ohlcv_json(300)
+    stock = Stock("TEST.US", data)
+    apply = mocker.spy(stock.alert_plan, 'apply')
+    first = stock.add_alerts()
+    assert stock.get_alerts() is first
+    stock.check_alerts(stock)
+    assert apply.call_count == 0  # computed once by the constructor
+
+    tail = Stock("TEST.US", data, tail_alerts=True)
+    evaluate = mocker.spy(tail.alert_plan, 'evaluate')
+    for _ in range(3):
+        tail.recent_alerts(data['t'][-3])
+    assert evaluate.call_count == 1
+
+
+def test_new_bar_invalidates_cache(ohlcv_json):
+    data = ohlcv_json(300)
+    stock = Stock("TEST.US", {key: values[:-1] for key, values in data.items()})
+    before = stock.add_alerts()
+    stock.update({'timestamp': data['t'][-1], 'open': data['o'][-1], 'high': data['h'][-1], 'low': data['l'][-1],
+                  'close': data['c'][-1], 'volume': data['v'][-1]})
+    assert stock.add_alerts() is not before
+    assert stock.df['alert_type'].iloc[-1] == Stock("TEST.US", data).df['alert_type'].iloc[-1]
+
+
+def test_lookback_of_default_rules():
+    assert AlertPlan().lookback == 1
+
+
+def test_tail_alerts_on_frames_with_the_real_cutoff(ohlcv):
+    # the daily app path: yfinance like frames dated up to today, the cutoff of check_alerts
+    start_time = Stock._find_time()
+    dates = pd.date_range(end=pd.Timestamp.now().normalize(), periods=300, freq="D").tz_localize("America/New_York")
+    found = 0
+    for seed in range(20):
+        df = ohlcv(300, seed=seed).assign(Date=dates)
+        full = Stock("TEST.US", df.copy())
+        tail = Stock("TEST.US", df.copy(), tail_alerts=True)
+        expected = full.add_alerts()
+        expected = expected[expected.index > start_time]
+        result = tail.recent_alerts(start_time)
+        assert list(result.index) == list(expected.index)
+        assert tail.check_alerts(tail) == full.check_alerts(full)
+        found += len(result)
+    assert found  # some of them alert in the last days
@@ -0,0 +1,69 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_alerts.models.storage import AlertLog, LocalBackend, compact
+
+
+def _alerted(stock: str, start: str, periods: int) -> pd.DataFrame:
+    dates = pd.date_range(start, periods=periods, freq="B")
+    close = np.linspace(100, 110, periods)
+    return pd.DataFrame({"date": dates, "close": close, "volume": [1e6] * periods, "rsi": close / 2,
+                         "stock": stock, "alert_type": "MACD UP", "alert_types": "MACD UP"})
+
+
+def test_compact_schema():
+    df = compact(_alerted("aaa", "2024-01-01", 3))
+    assert df["close"].dtype == "float32"
+    assert df["rsi"].dtype == "float32"
+    assert df["volume"].dtype == "float64"
+    assert isinstance(df["stock"].dtype, pd.CategoricalDtype)
+    assert isinstance(df["alert_type"].dtype, pd.CategoricalDtype)
+
+
+def test_partitions_and_round_trip(tmp_path):
+    log = AlertLog(LocalBackend(str(tmp_path)))
+    df = pd.concat([_alerted("aaa", "2024-01-29", 5), _alerted("bbb", "2024-01-30", 2)])
+    keys = log.append(df, run_time=datetime(2024, 2, 5, 10))
+
+    assert keys == [
+        "alerts/month=2024-01/stock=aaa/part-20240205100000000000.parquet",
+        "alerts/month=2024-01/stock=bbb/part-20240205100000000000.parquet",
+        "alerts/month=2024-02/stock=aaa/part-20240205100000000000.parquet",
+    ]
+    saved = log.read()
+    assert len(saved) == 7
+    np.testing.assert_allclose(saved[saved["stock"] == "aaa"]["close"], _alerted("aaa", "2024-01-29", 5)["close"],
+                               rtol=1e-6)
+    assert log.read(stocks=["bbb"])["stock"].tolist() == ["bbb", "bbb"]
+    assert len(log.read(start="2024-02-01")) == 2
+
+
+def test_only_new_rows_are_written(tmp_path):
+    log = AlertLog(LocalBackend(str(tmp_path)), compression="zstd")
+    log.append(_alerted("aaa", "2024-01-01", 10), run_time=datetime(2024, 1, 15))
+    assert log.watermarks() == {"aaa": pd.Timestamp("2024-01-12")}
+
+    # the next run has the same history plus two bars
+    keys = log.append(_alerted("aaa", "2024-01-01", 12), run_time=datetime(2024, 1, 17))
+    assert keys == ["alerts/month=2024-01/stock=aaa/part-20240117000000000000.parquet"]
+    assert len(pd.read_parquet(tmp_path / keys[0])) == 2
+    assert len(log.read()) == 12
+    assert log.append(_alerted("aaa", "2024-01-01", 12)) == []
+
+
+def test_list_of_stock_frames(tmp_path):
+    frames = [_alerted("aaa", "2024-01-29", 5), _alerted("bbb", "2024-01-30", 2)]
+    log = AlertLog(LocalBackend(str(tmp_path / "list")))
+    keys = log.append(frames, run_time=datetime(2024, 2, 5, 10))
+    expected = AlertLog(LocalBackend(str(tmp_path / "concat")))
+    assert sorted(keys) == expected.append(pd.concat(frames), run_time=datetime(2024, 2, 5, 10))
+    assert log.watermarks() == expected.watermarks()
+    assert log.append(frames) == []
+
+
+def test_unknown_compression():
+    with pytest.raises(ValueError):
+        AlertLog(LocalBackend("unused"), compression="zip")
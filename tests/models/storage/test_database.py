@@ -0,0 +1,85 @@
+import io
+from contextlib import redirect_stdout
+
+import numpy as np
+import pandas as pd
+
+from stock_alerts.models.storage import StockDB
+from stock_alerts.models.stocks import Stock
+
+
+def _bars(start: str, periods: int, seed: int = 0) -> pd.DataFrame:
+    close = 100 + np.cumsum(np.random.default_rng(seed).normal(0, 1.5, periods))
+    return pd.DataFrame({"Date": pd.date_range(start, periods=periods, freq="B"), "Open": close, "High": close + 1,
+                         "Low": close - 1, "Close": close, "Volume": 1000.0})
+
+
+def _stock(name: str, df: pd.DataFrame) -> Stock:
+    with redirect_stdout(io.StringIO()):
+        return Stock(name, df)
+
+
+def test_stock_round_trip(tmp_path):
+    db = StockDB.from_url(f"sqlite:///{tmp_path / 'stocks.db'}")
+    stocks = [_stock(f"t{seed}.us", _bars("2023-01-02", 300, seed)) for seed in range(3)]
+    assert db.ingest(stocks) == 900
+    assert db.ingest(stocks) == 3  # only the last bar again
+
+    loaded = db.load("t1.us")
+    pd.testing.assert_frame_equal(loaded, _bars("2023-01-02", 300, 1), check_dtype=False)
+    reseeded = _stock("t1.us", loaded)
+    np.testing.assert_allclose(reseeded.df["macd"], stocks[1].df["macd"], equal_nan=True)
+    indicators = db.load_indicators("t1.us", start="2024-01-01")
+    np.testing.assert_allclose(indicators["SUPERTd_10_1.0"], stocks[1].df["SUPERTd_10_1.0"].iloc[-len(indicators):])
+
+    latest = db.latest_alerts()
+    expected = {stock.stock_name: stock.df[stock.df["alert_type"] != ""].iloc[-1] for stock in stocks}
+    assert sorted(latest["stock"]) == sorted(expected)
+    for row in latest.itertuples():
+        assert row.date == expected[row.stock]["date"] and row.alert_types == expected[row.stock]["alert_types"]
+    assert db.latest_alerts(tickers=["t0.us"])["stock"].tolist() == ["t0.us"]
+    since = db.latest_alerts(since="2023-06-01")
+    assert (since["date"] > "2023-06-01").all() and len(since) >= len(latest)
+
+
+def test_fetch_as_cache():
+    db = StockDB.from_url("sqlite:///:memory:", history_days=0)
+    calls = []
+
+    def download(ticker, start):
+        calls.append(start)
+        return _bars("2024-01-01", 10) if start is None else _bars("2024-01-12", 3, seed=5)
+
+    assert len(db.fetch("abc.us", download)) == 10
+    df = db.fetch("abc.us", download)
+    assert calls == [None, pd.Timestamp("2024-01-11").to_pydatetime()]
+    assert len(df) == 12 and df["Date"].is_monotonic_increasing
+    assert df["Close"].iloc[-3] == _bars("2024-01-12", 3, seed=5)["Close"].iloc[0]  # the last bar was updated
+
+
+def test_fetch_overwrites_a_readjusted_history():
+    db = StockDB.from_url("sqlite:///:memory:", history_days=0)
+    db.fetch("abc.us", lambda ticker, start: _bars("2024-01-01", 10))
+    split = _bars("2024-01-01", 12).assign(Close=lambda df: df["Close"] / 2)
+    with redirect_stdout(io.StringIO()):
+        df = db.fetch("abc.us", lambda ticker, start: split if start is None else split[split["Date"] >= start])
+    pd.testing.assert_frame_equal(df, split, check_dtype=False)
+
+
+def test_compact_and_yfinance_dates_are_the_same_bars():
+    db = StockDB.from_url("sqlite:///:memory:")
+    bars = _bars("2024-01-01", 300)
+    data = {'t': bars["Date"].to_numpy("datetime64[s]").astype("int64").tolist(), 'o': bars["Open"].tolist(),
+            'h': bars["High"].tolist(), 'l': bars["Low"].tolist(), 'c': bars["Close"].tolist(),
+            'v': bars["Volume"].tolist()}
+    with redirect_stdout(io.StringIO()):
+        compact = Stock("json.us", data, compact=True)  # no date column, the timestamp index is the bar time
+    assert 'date' not in compact.df.columns
+    assert db.save_stock(compact) == 300
+
+    # yfinance daily dates are midnight in the exchange timezone, stored as the market date like save_ohlcv
+    yfinance = bars.assign(Date=bars["Date"].dt.tz_localize("America/New_York"))
+    db.save_stock(_stock("a.us", yfinance.copy()))
+    db.save_ohlcv("a.us", yfinance)
+    assert len(db.load("a.us")) == 300
+    pd.testing.assert_series_equal(db.load("a.us")["Date"], db.load("json.us")["Date"])
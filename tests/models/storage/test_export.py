@@ -0,0 +1,117 @@
+import io
+import socket
+import subprocess
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from stock_alerts.models.storage import LocalBackend, aws_client, export, write_csv, write_frames
+from stock_alerts.models.stocks.stocks import save_df_to_s3
+
+boto3 = pytest.importorskip("boto3")
+pytest.importorskip("moto")
+
+
+@pytest.fixture(scope="module")
+def s3_server():
+    """moto S3 in another process, so tracemalloc only sees our side of the upload"""
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    process = subprocess.Popen([sys.executable, "-m", "moto.server", "-p", str(port)], stdout=subprocess.DEVNULL,
+                               stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{port}"
+    for _ in range(100):
+        try:
+            socket.create_connection(("127.0.0.1", port), timeout=0.1).close()
+            break
+        except OSError:
+            time.sleep(0.1)
+    yield url
+    process.terminate()
+    process.wait()
+
+
+@pytest.fixture
+def bucket(s3_server, monkeypatch):
+    for name, value in {"AWS_ENDPOINT_URL": s3_server, "AWS_ACCESS_KEY_ID": "test", "AWS_SECRET_ACCESS_KEY": "test",
+                        "AWS_DEFAULT_REGION": "us-east-1"}.items():
+        monkeypatch.setenv(name, value)
+    aws_client.cache_clear()  # the shared client is created again with the moto endpoint
+    client = boto3.client("s3")
+    name = f"exports-{time.time_ns()}"
+    client.create_bucket(Bucket=name)
+    return client, name
+
+
+def _frame(rows: int) -> pd.DataFrame:
+    # ~1KB per row with few Python objects, tracemalloc makes to_csv of many small cells very slow
+    return pd.DataFrame({"stock": ["x" * 1000] * rows, "close": np.arange(rows, dtype="float64")})
+
+
+def test_write_csv_same_bytes_as_to_csv():
+    df = pd.DataFrame({"close": [1.5, 2.25, 3.0], "stock": ["a", "b", "c"]}, index=[10, 11, 12])
+    stream = io.BytesIO()
+    assert write_csv(df, stream, chunk_rows=2) == len(df.to_csv().encode())
+    assert stream.getvalue() == df.to_csv().encode()
+
+
+def test_write_frames_same_bytes_as_the_concat():
+    frames = [pd.DataFrame({"close": [1.5, 2.25], "stock": "a"}, index=[10, 11]),
+              pd.DataFrame({"close": [3.0], "stock": "b", "SUPERT_7_1.5": [2.5]}, index=[10]),
+              pd.DataFrame({"close": [], "stock": []})]
+    stream = io.BytesIO()
+    assert write_frames(frames, stream, chunk_rows=1) == len(pd.concat(frames).to_csv().encode())
+    assert stream.getvalue() == pd.concat(frames).to_csv().encode()
+
+
+def test_stock_frames_are_not_concatenated(monkeypatch):
+    # the frames of the alerted stocks are written one by one, the whole export is never one frame in memory
+    frames = [_frame(100).assign(stock=f"t{i}.us") for i in range(5)]
+    expected = pd.concat(frames).to_csv().encode()
+
+    def no_concat(*args, **kwargs):
+        raise AssertionError("concat")
+
+    monkeypatch.setattr(export.pd, "concat", no_concat)
+    stream = io.BytesIO()
+    export.write_frame(frames, stream, chunk_rows=30)
+    assert stream.getvalue() == expected
+
+
+def test_local_stream_replaces_only_on_success(tmp_path):
+    backend = LocalBackend(str(tmp_path))
+    with backend.open_write("out/a.csv") as stream:
+        stream.write(b"old")
+    with pytest.raises(RuntimeError):
+        with backend.open_write("out/a.csv") as stream:
+            stream.write(b"new")
+            raise RuntimeError("serialization failed")
+    assert backend.read_bytes("out/a.csv") == b"old"
+    assert backend.list_keys() == ["out/a.csv"]
+
+
+def test_export_peak_memory_is_bounded(bucket):
+    client, name = bucket
+    df = _frame(40_000)  # ~40MB of csv, the old export held 3-4 copies of it
+    tracemalloc.start()
+    save_df_to_s3(df, name, "alerts", chunk_rows=1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    head = client.head_object(Bucket=name, Key="alerts.csv")
+    assert head["ContentLength"] == len(df.to_csv().encode())
+    assert "-" in head["ETag"]  # multipart
+    assert peak < 30 * 1024 * 1024
+
+
+def test_small_export_is_a_single_put(bucket):
+    client, name = bucket
+    df = _frame(10)
+    save_df_to_s3(df, name, "small")
+    body = client.get_object(Bucket=name, Key="small.csv")["Body"].read()
+    assert body == df.to_csv().encode()
@@ -0,0 +1,107 @@
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+from stock_alerts.models.storage import LocalBackend, OHLCVStore, backend_from_url, S3Backend
+
+
+def _bars(start: str, periods: int, close_shift: float = 0.0) -> pd.DataFrame:
+    dates = pd.date_range(start, periods=periods, freq="B")
+    close = [100.0 + i + close_shift for i in range(periods)]
+    return pd.DataFrame({"Date": dates, "Open": close, "High": close, "Low": close, "Close": close,
+                         "Volume": [1000] * periods})
+
+
+def test_first_fetch_downloads_everything_and_saves(tmp_path):
+    store = OHLCVStore(LocalBackend(str(tmp_path)))
+    calls = []
+
+    def download(ticker, start):
+        calls.append(start)
+        return _bars("2024-01-01", 10)
+
+    df = store.fetch("abc.us", download)
+    assert calls == [None]
+    assert len(df) == 10
+    assert (tmp_path / "ohlcv" / "abc.us.parquet").exists()
+
+
+def test_second_fetch_only_asks_for_missing_bars(tmp_path):
+    store = OHLCVStore(LocalBackend(str(tmp_path)))
+    store.fetch("abc.us", lambda ticker, start: _bars("2024-01-01", 10))
+    calls = []
+
+    def download(ticker, start):
+        calls.append(start)
+        # last stored bar comes again with a corrected close plus two new bars
+        return _bars("2024-01-12", 3, close_shift=0.5)
+
+    df = store.fetch("abc.us", download)
+    assert calls == [datetime(2024, 1, 11)]  # the bar before the last one, to check the adjusted prices
+    assert len(df) == 12
+    assert df["Date"].is_unique
+    assert df.loc[df["Date"] == "2024-01-12", "Close"].item() == 100.5
+
+
+def test_readjusted_history_is_downloaded_again(tmp_path):
+    store = OHLCVStore(LocalBackend(str(tmp_path)))
+    store.fetch("abc.us", lambda ticker, start: _bars("2024-01-01", 10))
+    split = _bars("2024-01-01", 12).assign(Close=lambda df: df["Close"] / 2)
+    calls = []
+
+    def download(ticker, start):
+        calls.append(start)
+        return split if start is None else split[split["Date"] >= start]
+
+    df = store.fetch("abc.us", download)
+    assert calls == [datetime(2024, 1, 11), None]
+    pd.testing.assert_frame_equal(df, split, check_dtype=False)
+    assert not OHLCVStore.readjusted(df, split[split["Date"] >= "2024-01-16"])
+
+
+def test_yfinance_frames_are_normalized(tmp_path):
+    store = OHLCVStore(LocalBackend(str(tmp_path)))
+    yf = _bars("2024-01-01", 3)
+    yf["Date"] = yf["Date"].dt.tz_localize("America/New_York")
+    yf["Dividends"] = 0.0
+    df = store.fetch("abc.us", lambda ticker, start: yf)
+    assert list(df.columns) == ["Date", "Open", "High", "Low", "Close", "Volume"]
+    assert df["Date"].dt.tz is None
+    assert df["Date"].iloc[0] == pd.Timestamp("2024-01-01")
+
+
+def test_failed_download_returns_cache(tmp_path):
+    store = OHLCVStore(LocalBackend(str(tmp_path)))
+    store.fetch("abc.us", lambda ticker, start: _bars("2024-01-01", 5))
+    df = store.fetch("abc.us", lambda ticker, start: None)
+    assert len(df) == 5
+
+
+def test_history_window_is_trimmed(tmp_path):
+    store = OHLCVStore(LocalBackend(str(tmp_path)), history_days=10)
+    df = store.fetch("abc.us", lambda ticker, start: _bars("2024-01-01", 30))
+    assert df["Date"].iloc[0] >= df["Date"].iloc[-1] - pd.Timedelta(days=10)
+
+
+def test_backend_from_url(tmp_path):
+    assert isinstance(backend_from_url(str(tmp_path)), LocalBackend)
+    backend = backend_from_url("s3://bucket/some/prefix")
+    assert isinstance(backend, S3Backend)
+    assert (backend.bucket, backend.prefix) == ("bucket", "some/prefix")
+
+
+def test_s3_missing_key_is_none():
+    from botocore.exceptions import ClientError
+
+    class FakeS3:
+        def __init__(self, code):
+            self.code = code
+
+        def get_object(self, Bucket, Key):
+            raise ClientError({"Error": {"Code": self.code, "Message": "..."}}, "GetObject")
+
+    assert S3Backend("bucket", client=FakeS3("NoSuchKey")).read_bytes("a/_watermarks.json") is None
+    assert S3Backend("bucket", client=FakeS3("404")).read_bytes("a/_watermarks.json") is None
+    with pytest.raises(ClientError):  # no s3:ListBucket, a real problem
+        S3Backend("bucket", client=FakeS3("AccessDenied")).read_bytes("a/_watermarks.json")
@@ -0,0 +1,102 @@
+import numpy as np
+import pandas as pd
+
+from stock_alerts.models.training import WindowDataset
+
+FEATURES = ['close', 'volume', 'rsi']
+
+
+def frame(n, seed=0, start="2022-01-03"):
+    rng = np.random.default_rng(seed)
+    close = 100 * np.exp(np.cumsum(rng.normal(0, 0.01, n)))
+    rsi = rng.uniform(0, 100, n)
+    rsi[:14] = np.nan  # the warm up
+    return pd.DataFrame({'date': pd.bdate_range(start, periods=n), 'close': close,
+                         'volume': rng.integers(1000, 5000, n).astype(float), 'rsi': rsi})
+
+
+def test_windows_are_views_of_the_memmap(tmp_path):
+    ds = WindowDataset(str(tmp_path), features=FEATURES, window=10, horizon=2)
+    df = frame(100)
+    assert ds.append("a.us", df) == 86  # from the first row with rsi
+    x = ds.windows("a.us")
+    assert x.shape == (77, 10, 3) and len(ds) == 77
+    assert np.shares_memory(x, ds._rows("a.us"))
+    close = df['close'].to_numpy()[14:]
+    expected = (close - close.mean()) / close.std()
+    np.testing.assert_allclose(x[5, :, 0], expected[5:15], rtol=1e-5)
+    y = ds.targets("a.us")
+    np.testing.assert_allclose(y[0], close[11] / close[9] - 1, rtol=1e-4)  # the close is float32
+    assert np.isnan(y[-2:]).all() and not np.isnan(y[:-2]).any()
+    assert ds.dates("a.us")[0] == df['date'].iloc[14 + 9]
+
+
+def test_append_new_days_keeps_the_scaling(tmp_path):
+    df = frame(120, seed=1)
+    ds = WindowDataset(str(tmp_path), features=FEATURES, window=10, normalize="minmax")
+    ds.append("a.us", df.iloc[:100])
+    stats = dict(ds.manifest['tickers']["a.us"])
+    ds.windows("a.us")
+    assert ds.append("a.us", df) == 20  # the 100 first are already stored
+    assert ds.append("a.us", df) == 0
+    assert ds.manifest['tickers']["a.us"]['shift'] == stats['shift']
+
+    full = WindowDataset(str(tmp_path / "full"), features=FEATURES, window=10, normalize="minmax")
+    full.append("a.us", df.iloc[:100])
+    full.append("a.us", df.iloc[90:])
+    np.testing.assert_array_equal(ds.windows("a.us"), full.windows("a.us"))
+
+    reopened = WindowDataset(str(tmp_path))
+    assert reopened.normalize == "minmax" and reopened.manifest['tickers']["a.us"]['rows'] == 106
+    np.testing.assert_array_equal(reopened.windows("a.us"), ds.windows("a.us"))
+
+
+def test_append_after_an_unsaved_append(tmp_path):
+    df = frame(120, seed=2)
+    WindowDataset(str(tmp_path), features=FEATURES, window=10).append("a.us", df.iloc[:100])
+    WindowDataset(str(tmp_path)).append("a.us", df.iloc[:110], write_manifest=False)  # failed before the save
+    ds = WindowDataset(str(tmp_path))
+    assert ds.append("a.us", df) == 20
+    full = WindowDataset(str(tmp_path / "full"), features=FEATURES, window=10)
+    full.append("a.us", df.iloc[:100])
+    full.append("a.us", df)
+    np.testing.assert_array_equal(ds.windows("a.us"), full.windows("a.us"))
+    np.testing.assert_array_equal(ds.dates("a.us"), full.dates("a.us"))
+    assert (tmp_path / "a.us.dates").stat().st_size == 106 * 8
+
+
+def test_batches(tmp_path):
+    ds = WindowDataset(str(tmp_path), features=FEATURES, window=10, horizon=3)
+    ds.append_stocks({"a.us": frame(100, 1), "b.us": frame(60, 2), "c.us": frame(20, 3)})
+    assert ds.count("c.us") == 0
+
+    batches = list(ds.batches(batch_size=32))
+    assert [(len(x), ticker) for x, y, ticker in batches] == [(32, "a.us"), (32, "a.us"), (10, "a.us"),
+                                                                 (32, "b.us"), (2, "b.us")]
+    assert all(np.shares_memory(x, ds._rows(ticker)) for x, y, ticker in batches)
+    assert not any(np.isnan(y).any() for x, y, ticker in batches)
+
+    shuffled = list(ds.batches(batch_size=32, shuffle=True, seed=0))
+    assert sum(len(x) for x, y, _ in shuffled) == 74 + 34
+    assert np.isclose(np.sort(np.concatenate([y for _, y, _ in shuffled])),
+                      np.sort(np.concatenate([y for _, y, _ in batches]))).all()
+
+
+def test_append_db(tmp_path):
+    from stock_alerts.models.storage import StockDB
+
+    db = StockDB.from_url(f"sqlite:///{tmp_path / 'stocks.db'}")
+    df = frame(80, seed=4)
+    bars = df[['date', 'close', 'close', 'close', 'close', 'volume']].copy()
+    bars.columns = ['Date', 'Open', 'High', 'Low', 'Close', 'Volume']
+    db.save_ohlcv("a.us", bars.iloc[:60])
+    db._add_columns("indicators", ['rsi'])  # save_stock adds the indicator columns
+    db.upsert("indicators", "a.us", df['date'].to_numpy('datetime64[s]').astype('int64'), {'rsi': df['rsi'].to_numpy()})
+    ds = WindowDataset(str(tmp_path / "windows"), features=FEATURES, window=10)
+    assert ds.append_db(db) == 46
+    db.save_ohlcv("a.us", bars)
+    assert ds.append_db(db) == 20
+    direct = WindowDataset(str(tmp_path / "direct"), features=FEATURES, window=10)
+    direct.append("a.us", df.iloc[:60])
+    direct.append("a.us", df)
+    np.testing.assert_array_equal(ds.windows("a.us"), direct.windows("a.us"))